@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from .BatchContext import BatchContext
 from .DataObject import DataObject
 from .ProcessResult import ProcessResult
 
@@ -11,6 +12,8 @@ class BaseModel(ABC):
             Обработать входные данные и вернуть результат обработки
         * save_result(result: ProcessResult, destination: str, **options) -> bool
             Сохранить результат обработки в целевую систему (БД, файл и т.д.)
+        * begin(**options), consume_batch(batch: BatchContext), finish() -> ProcessResult
+            Пачечная обработка для FusedModelRunner (несколько моделей по общим пачкам строк)
     """
 
     @abstractmethod
@@ -40,4 +43,39 @@ class BaseModel(ABC):
         Returns:
             bool — True при успехе
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def begin(self, **options) -> None:
+        """
+        Начать пачечную обработку.
+
+        По умолчанию модель копит строки пачек и в finish выполняет process_data
+        над всеми данными; модели с собственным накоплением переопределяют
+        begin, consume_batch и finish вместе.
+
+        Args:
+            options: опции, которые получил бы process_data.
+        """
+        self._batch_options = options
+        self._batch_rows = []
+        self._batch_metadata = {}
+
+    def consume_batch(self, batch: BatchContext) -> None:
+        """
+        Обработать очередную пачку строк.
+
+        Args:
+            batch: BatchContext с общими для моделей сводными значениями пачки.
+        """
+        self._batch_rows.extend(batch.rows)
+        self._batch_metadata = batch.metadata
+
+    def finish(self) -> ProcessResult:
+        """
+        Завершить пачечную обработку.
+
+        Returns:
+            ProcessResult, как у process_data над всеми пачками.
+        """
+        data = DataObject(rows=self._batch_rows, metadata=self._batch_metadata)
+        return self.process_data(data, **self._batch_options)
@@ -0,0 +1,47 @@
+from itertools import repeat
+from typing import Any, Dict, List, Optional
+
+class BatchContext:
+    """
+    Пачка строк DataObject, общая для нескольких моделей.
+
+    Сводные значения пачки (число пропусков, числовые значения колонки) считаются
+    при первом обращении и кэшируются: одно и то же значение считается один раз
+    на пачку для всех моделей, которым оно нужно. Разные значения считаются
+    отдельными проходами по строкам пачки — каждое одним выражением над списком
+    строк; общий построчный цикл на Python для всех значений сразу медленнее.
+
+    Constructor args:
+        rows: строки пачки (list[dict]).
+        metadata: мета-информация исходного DataObject.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None):
+        self.rows = rows
+        self.metadata = metadata or {}
+        self._null_count: Optional[int] = None
+        self._numeric: Dict[str, List[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def null_count(self) -> int:
+        """Число значений None во всех полях пачки."""
+        if self._null_count is None:
+            self._null_count = sum(1 for row in self.rows for value in row.values() if value is None)
+        return self._null_count
+
+    def numeric(self, name: str) -> List[float]:
+        """
+        Числовые (int/float) значения колонки.
+
+        Args:
+            name: имя колонки.
+
+        Returns:
+            list значений в порядке строк.
+        """
+        if name not in self._numeric:
+            self._numeric[name] = [value for value in map(dict.get, self.rows, repeat(name))
+                                   if isinstance(value, (int, float))]
+        return self._numeric[name]
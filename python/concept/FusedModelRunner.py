@@ -0,0 +1,80 @@
+from typing import Any, Dict, List, Optional
+from .BaseModel import BaseModel
+from .BatchContext import BatchContext
+from .DataObject import DataObject
+from .ProcessResult import ProcessResult
+
+class FusedModelRunner:
+    """
+    Запуск нескольких моделей по общим пачкам строк.
+
+    Строки DataObject нарезаются на пачки; каждая пачка оборачивается в BatchContext
+    и передается всем моделям по очереди. Выполнение пачечное, а не слитое в один
+    проход: каждая модель обходит пачку сама, общими между моделями остаются только
+    сводные значения BatchContext (число пропусков, числовые значения колонок) —
+    значение, нужное нескольким моделям, считается один раз на пачку.
+    Модели без собственной пачечной обработки (см. BaseModel.consume_batch)
+    копят строки и выполняют обычный process_data в конце.
+
+    Constructor args:
+        models: список моделей BaseModel.
+        batch_size: число строк в пачке.
+    """
+
+    def __init__(self, models: List[BaseModel], batch_size: int = 10000):
+        self.models = models
+        self.batch_size = batch_size
+        print(f"[FusedModelRunner.__init__] models={[type(m).__name__ for m in models]}, batch_size={batch_size}")
+
+    def run(self, data: DataObject, options: Optional[List[Dict[str, Any]]] = None) -> List[ProcessResult]:
+        """
+        Выполнить все модели над данными.
+
+        Args:
+            data: DataObject с исходными данными.
+            options: опции process_data для каждой модели (в порядке self.models).
+
+        Returns:
+            list ProcessResult — по одному на модель в порядке self.models.
+            Если модель упала, ее результат имеет status='error', остальные модели продолжают работу.
+        """
+        options = options or [{} for _ in self.models]
+        failed: Dict[int, ProcessResult] = {}
+
+        def fail(index: int, stage: str, error: Exception):
+            model_name = type(self.models[index]).__name__
+            print(f"[FusedModelRunner.run] Ошибка модели {model_name} на этапе {stage}: {error}")
+            failed[index] = ProcessResult(status="error", payload=None,
+                                          metadata={"model": model_name, "stage": stage, "error": str(error)})
+
+        for index, (model, model_options) in enumerate(zip(self.models, options)):
+            try:
+                model.begin(**model_options)
+            except Exception as e:
+                fail(index, "begin", e)
+
+        batches = 0
+        for start in range(0, len(data.rows), self.batch_size):
+            batch = BatchContext(data.rows[start:start + self.batch_size], data.metadata)
+            for index, model in enumerate(self.models):
+                if index in failed:
+                    continue
+                try:
+                    model.consume_batch(batch)
+                except Exception as e:
+                    fail(index, "consume_batch", e)
+            batches += 1
+
+        results = []
+        for index, model in enumerate(self.models):
+            if index not in failed:
+                try:
+                    results.append(model.finish())
+                    continue
+                except Exception as e:
+                    fail(index, "finish", e)
+            results.append(failed[index])
+
+        print(f"[FusedModelRunner.run] rows={len(data.rows)}, batches={batches}, "
+              f"statuses={[result.status for result in results]}")
+        return results
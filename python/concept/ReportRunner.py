@@ -0,0 +1,136 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .DataObject import DataObject
+from .TableDataProcessor import TableDataProcessor
+
+DATA_VERSION_SQL = "select max(file_id) as data_version from usage_file_history"
+
+class ReportRunner:
+    """
+    Запуск отчетных запросов sql/query*.sql с кэшированием результатов.
+
+    Запросы выполняются через TableDataProcessor.fetch_query за указанную дату отчета
+    вместо current_date. Результат кэшируется по ключу (запрос, параметры, версия данных),
+    где версия данных — последний USAGE_FILE_HISTORY.FILE_ID: пока не загружен новый файл,
+    повторный отчет за закрытый день отдается из кэша без обращения к таблицам.
+
+    Constructor args:
+        table_processor: TableDataProcessor для выполнения запросов
+        sql_dir: каталог с файлами запросов (по умолчанию sql/ в корне репозитория)
+        cache_max_entries: максимальное число закэшированных результатов
+        cache_max_rows: суммарный лимит строк в кэше; результаты больше лимита не кэшируются
+        cache_ttl_seconds: время жизни записи кэша
+        batch_size: размер пачки при потоковой выдаче результата
+    """
+
+    def __init__(self, table_processor: TableDataProcessor, sql_dir: Optional[str] = None,
+                 cache_max_entries: int = 64, cache_max_rows: int = 1_000_000,
+                 cache_ttl_seconds: float = 3600.0, batch_size: int = 10000):
+        self.table_processor = table_processor
+        self.sql_dir = sql_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "sql")
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_rows = cache_max_rows
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.batch_size = batch_size
+        self._cache: "OrderedDict[Tuple, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._cached_rows = 0
+        self._sql: Dict[str, str] = {}
+        self.cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        print(f"[ReportRunner.__init__] sql_dir={self.sql_dir}, cache_max_entries={cache_max_entries}, "
+              f"cache_max_rows={cache_max_rows}, cache_ttl_seconds={cache_ttl_seconds}")
+
+    def load_sql(self, query_name: str) -> str:
+        """
+        Прочитать запрос и заменить current_date на параметр %(run_date)s
+
+        Args:
+            query_name: имя файла запроса без расширения (например, 'query4')
+
+        Returns:
+            Текст запроса с параметром run_date
+        """
+        if query_name not in self._sql:
+            with open(os.path.join(self.sql_dir, f"{query_name}.sql"), encoding="utf-8") as file:
+                sql = file.read().strip().rstrip(";")
+            # Литеральные % (например, like 'C%') экранируются для драйвера с параметрами %(name)s
+            sql = sql.replace("%", "%%")
+            self._sql[query_name] = re.sub(r"\bcurrent_date\b", "cast(%(run_date)s as date)", sql, flags=re.IGNORECASE)
+        return self._sql[query_name]
+
+    def data_version(self) -> Any:
+        """Текущая версия данных — последний FILE_ID в USAGE_FILE_HISTORY."""
+        for batch in self.table_processor.fetch_query(DATA_VERSION_SQL, batch_size=1):
+            if batch.rows:
+                return batch.rows[0].get("data_version")
+        return None
+
+    def run_report(self, query_name: str, report_date: date, **params) -> Iterator[DataObject]:
+        """
+        Выполнить отчет за день и выдать результат пачками
+
+        Args:
+            query_name: имя файла запроса без расширения
+            report_date: день, за который строится отчет (запросы считают его "вчера")
+            params: дополнительные параметры запроса
+
+        Returns:
+            Итератор DataObject; metadata содержит query, report_date и признак cached
+        """
+        query_params = dict(params, run_date=(report_date + timedelta(days=1)).isoformat())
+        key = (query_name, tuple(sorted(query_params.items())), self.data_version())
+        metadata = {"query": query_name, "report_date": report_date.isoformat()}
+
+        rows = self._cache_get(key)
+        if rows is not None:
+            self.cache_stats["hits"] += 1
+            print(f"[ReportRunner.run_report] {query_name} за {report_date}: результат из кэша, rows={len(rows)}")
+            for start in range(0, len(rows), self.batch_size):
+                yield DataObject(rows=rows[start:start + self.batch_size], metadata=dict(metadata, cached=True))
+            return
+
+        self.cache_stats["misses"] += 1
+        collected: Optional[List[Dict[str, Any]]] = []
+        for batch in self.table_processor.fetch_query(self.load_sql(query_name), query_params, self.batch_size):
+            if collected is not None:
+                collected.extend(batch.rows)
+                # Слишком большой результат только стримим, не вытесняя им весь кэш
+                if len(collected) > self.cache_max_rows:
+                    collected = None
+            yield DataObject(rows=batch.rows, metadata=dict(metadata, cached=False))
+
+        if collected is not None:
+            self._cache_put(key, collected)
+
+    def invalidate(self):
+        """Очистить кэш результатов"""
+        self._cache.clear()
+        self._cached_rows = 0
+
+    def _cache_get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, rows = entry
+        if time.monotonic() - stored_at > self.cache_ttl_seconds:
+            self._evict(key)
+            return None
+        self._cache.move_to_end(key)
+        return rows
+
+    def _cache_put(self, key: Tuple, rows: List[Dict[str, Any]]):
+        if key in self._cache:
+            self._evict(key)
+        self._cache[key] = (time.monotonic(), rows)
+        self._cached_rows += len(rows)
+        # Вытесняем давно не использованные записи до выполнения лимитов
+        while len(self._cache) > self.cache_max_entries or self._cached_rows > self.cache_max_rows:
+            self._evict(next(iter(self._cache)))
+
+    def _evict(self, key: Tuple):
+        _, rows = self._cache.pop(key)
+        self._cached_rows -= len(rows)
+        self.cache_stats["evictions"] += 1
@@ -1,6 +1,7 @@
 
 from typing import Optional, Dict, List
 from .BaseModel import BaseModel
+from .BatchContext import BatchContext
 from .DataObject import DataObject
 from .ProcessResult import ProcessResult
 
@@ -29,13 +30,31 @@ class StatisticsDataModel(BaseModel):
             ProcessResult: payload содержит агрегированные данные (например, dict).
         """
         print(f"[StatisticsDataModel.process_data] Сбор статистики (rows={len(data.rows)}), group_by={group_by}")
-        # Заглушка: делаем простую "агрегацию"
-        count = len(data.rows)
+        self.begin(group_by=group_by, **options)
+        self.consume_batch(BatchContext(data.rows, data.metadata))
+        return self.finish()
+
+    def begin(self, group_by: Optional[List[str]] = None, **options) -> None:
+        """Начать пачечную обработку: обнулить накопители агрегатов."""
+        self._group_by = group_by
+        self._count = 0
+        self._value_sum = 0.0
+        self._value_count = 0
+
+    def consume_batch(self, batch: BatchContext) -> None:
+        """Добавить пачку строк к агрегатам."""
+        self._count += len(batch)
         # Попробуем вычислить среднее по полю 'value' если есть
-        values = [r.get("value") for r in data.rows if isinstance(r.get("value"), (int, float))]
-        mean_value = (sum(values) / len(values)) if values else None
-        stats = {"count": count, "mean_value": mean_value}
-        metadata = {"model": "StatisticsDataModel", "group_by": group_by}
+        values = batch.numeric("value")
+        self._value_sum += sum(values)
+        self._value_count += len(values)
+
+    def finish(self) -> ProcessResult:
+        """Вернуть статистику по всем пачкам."""
+        # Заглушка: делаем простую "агрегацию"
+        mean_value = (self._value_sum / self._value_count) if self._value_count else None
+        stats = {"count": self._count, "mean_value": mean_value}
+        metadata = {"model": "StatisticsDataModel", "group_by": self._group_by}
         return ProcessResult(status="ok", payload=stats, metadata=metadata)
 
     def save_result(self, result: ProcessResult, destination: str, table_name: Optional[str] = None, **options) -> bool:
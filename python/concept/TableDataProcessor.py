@@ -1,7 +1,12 @@
-from typing import Optional
+import json
+from typing import Any, Dict, Iterator, Optional
 from .BaseProcessor import BaseProcessor
 from .DataObject import DataObject
 
+TARIFF_FIELDS = ("rate_plan_id", "monthly_fee", "call_tariff", "sms_tariff", "internet_tariff", "tariff_date")
+# После загрузки строк в эту таблицу пересчитывается USAGE_FILE_STATS загруженных файлов
+USAGE_DATA_TABLE = "usage_data_history"
+
 class TableDataProcessor(BaseProcessor):
     """
     Процессор для загрузки и выгрузки данных в табличную базу данных.
@@ -37,6 +42,28 @@ class TableDataProcessor(BaseProcessor):
         metadata = {"source": source, "table": table, "fetched_count": len(rows)}
         return DataObject(rows=rows, metadata=metadata)
 
+    def fetch_query(self, sql: str, params: Optional[Dict[str, Any]] = None, batch_size: int = 1000, **options) -> Iterator[DataObject]:
+        """
+        Выполнить произвольный SQL-запрос и вернуть результат пачками
+
+        Args:
+            sql: текст запроса с именованными параметрами в стиле %(name)s
+            params: значения параметров запроса
+            batch_size: число строк в одной пачке (fetchmany / server-side cursor)
+            options: дополнительные опции (timeout, и т.д.)
+
+        Returns:
+            Итератор DataObject, по одному на пачку строк
+        """
+        print(f"[TableDataProcessor.fetch_query] Выполнение запроса на {self.connection_string}: params={params}, batch_size={batch_size}")
+        rows = [
+            {"id": "a", "score": 0.9},
+            {"id": "b", "score": 0.75},
+        ]
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            yield DataObject(rows=batch, metadata={"source": self.connection_string, "fetched_count": len(batch)})
+
     def load_data(self, data: DataObject, destination: str, table_name: str, if_exists: str = "append", **options) -> bool:
         """
         Загрузить DataObject в таблицу базы данных
@@ -53,4 +80,60 @@ class TableDataProcessor(BaseProcessor):
         """
         print(f"[TableDataProcessor.load_data] Загрузка в таблицу '{table_name}' на {destination} (if_exists={if_exists})")
         print(f"[TableDataProcessor.load_data] rows_count={len(data.rows)}, metadata={data.metadata}")
-        return True
\ No newline at end of file
+        if table_name.lower() == USAGE_DATA_TABLE:
+            return self.refresh_file_stats(data, destination)
+        return True
+
+    def refresh_file_stats(self, data: DataObject, destination: str) -> bool:
+        """
+        Пересчитать USAGE_FILE_STATS для файлов, строки которых загружены в USAGE_DATA_HISTORY
+
+        refresh_usage_file_stats вызывается один раз на файл после загрузки всех его строк,
+        а не на каждую пачку: функция каждый раз агрегирует все строки файла.
+
+        Args:
+            data: DataObject с загруженными строками (поле file_id или metadata["file_id"])
+            destination: connection string / идентификатор БД
+
+        Returns:
+            bool — True, если статистика пересчитана для всех файлов
+        """
+        file_ids = sorted({row["file_id"] for row in data.rows if row.get("file_id") is not None})
+        if not file_ids and data.metadata.get("file_id") is not None:
+            file_ids = [data.metadata["file_id"]]
+        if not file_ids:
+            print("[TableDataProcessor.refresh_file_stats] В данных нет file_id: статистика файлов не пересчитана")
+            return False
+
+        for file_id in file_ids:
+            print(f"[TableDataProcessor.refresh_file_stats] select refresh_usage_file_stats(%s) "
+                  f"на {destination}: file_id={file_id}")
+        return True
+
+    def load_tariffs(self, data: DataObject, destination: str, batch_size: int = 10000, **options) -> bool:
+        """
+        Пакетная загрузка тарифов в REF_TARIFF через insert_tariffs_batch_with_logging
+
+        Вместо вызова insert_tariff_with_logging на каждую строку тарифы передаются
+        функции одним JSON-массивом на пачку: одна команда insert и одна запись OPERATION_LOG.
+
+        Args:
+            data: DataObject, rows — словари с полями TARIFF_FIELDS
+            destination: connection string / идентификатор БД
+            batch_size: максимальное число тарифов в одном вызове функции
+            options: дополнительные опции (transaction=True/False, и т.д.)
+
+        Returns:
+            bool — True при успешной загрузке
+        """
+        missing = [i for i, row in enumerate(data.rows) if any(field not in row for field in TARIFF_FIELDS)]
+        if missing:
+            print(f"[TableDataProcessor.load_tariffs] Строки без обязательных полей {TARIFF_FIELDS}: {missing}")
+            return False
+
+        for start in range(0, len(data.rows), batch_size):
+            batch = [{field: row[field] for field in TARIFF_FIELDS} for row in data.rows[start:start + batch_size]]
+            payload = json.dumps(batch, default=str)
+            print(f"[TableDataProcessor.load_tariffs] select insert_tariffs_batch_with_logging(%s::jsonb) "
+                  f"на {destination}: tariffs={len(batch)}, payload_bytes={len(payload)}")
+        return True
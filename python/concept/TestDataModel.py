@@ -1,6 +1,7 @@
 
 from typing import Optional, Dict, Any
 from .BaseModel import BaseModel
+from .BatchContext import BatchContext
 from .DataObject import DataObject
 from .ProcessResult import ProcessResult
 
@@ -31,15 +32,24 @@ class TestDataModel(BaseModel):
             ProcessResult где payload — отчет о тестах (например, dict с ошибками/статистикой).
         """
         print(f"[TestDataModel.process_data] Выполняем тесты над данными (rows={len(data.rows)}). verbose={verbose}")
+        self.begin(verbose=verbose, **options)
+        self.consume_batch(BatchContext(data.rows, data.metadata))
+        return self.finish()
+
+    def begin(self, verbose: bool = True, **options) -> None:
+        """Начать пачечную обработку: обнулить счетчики отчета."""
+        self._report = {"total_rows": 0, "null_values": 0, "errors": [], "passed": True}
+
+    def consume_batch(self, batch: BatchContext) -> None:
+        """Учесть пачку строк в отчете (число пропусков берется из общего BatchContext)."""
+        self._report["total_rows"] += len(batch)
+        self._report["null_values"] += batch.null_count()
+
+    def finish(self) -> ProcessResult:
+        """Вернуть отчет о тестах по всем пачкам."""
         # Заглушка: собираем фиктивный отчет
-        test_report = {
-            "total_rows": len(data.rows),
-            "null_values": sum(1 for r in data.rows for v in r.values() if v is None),
-            "errors": [],
-            "passed": True
-        }
         metadata = {"model": "TestDataModel", "rules_used": self.rules}
-        return ProcessResult(status="ok", payload=test_report, metadata=metadata)
+        return ProcessResult(status="ok", payload=self._report, metadata=metadata)
 
     def save_result(self, result: ProcessResult, destination: str, table_name: Optional[str] = None, **options) -> bool:
         """
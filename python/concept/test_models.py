@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты для моделей concept (запуск из каталога python: python -m pytest concept)
+"""
+
+import unittest
+from concept.BaseModel import BaseModel
+from concept.DataObject import DataObject
+from concept.FusedModelRunner import FusedModelRunner
+from concept.ProcessResult import ProcessResult
+from concept.StatisticsDataModel import StatisticsDataModel
+from concept.TestDataModel import TestDataModel as DataTestModel
+
+
+class RowCountModel(BaseModel):
+    """Модель без пачечных методов: проверяет обработку через process_data по умолчанию"""
+
+    def process_data(self, data: DataObject, **options) -> ProcessResult:
+        return ProcessResult(status="ok", payload=len(data.rows), metadata=options)
+
+    def save_result(self, result: ProcessResult, destination: str, **options) -> bool:
+        return True
+
+
+class TestFusedModelRunner(unittest.TestCase):
+    """Тесты для выполнения нескольких моделей за один проход"""
+
+    def setUp(self):
+        self.data = DataObject(rows=[
+            {"id": i, "value": None if i % 5 == 0 else i * 1.5, "name": None if i % 3 == 0 else "x"}
+            for i in range(1000)
+        ] + [{"id": 1000}], metadata={"source": "test"})
+
+    def test_results_match_standalone_models(self):
+        """Тест: результаты моделей совпадают с результатами отдельных process_data."""
+        test_model = DataTestModel(rules={"no_nulls": True})
+        stats_model = StatisticsDataModel()
+        expected_test = test_model.process_data(self.data)
+        expected_stats = stats_model.process_data(self.data, group_by=["id"])
+
+        runner = FusedModelRunner([test_model, stats_model, RowCountModel()], batch_size=64)
+        test_result, stats_result, count_result = runner.run(
+            self.data, options=[{}, {"group_by": ["id"]}, {"verbose": False}])
+
+        self.assertEqual(test_result, expected_test)
+        self.assertEqual(stats_result.metadata, expected_stats.metadata)
+        self.assertEqual(stats_result.payload["count"], expected_stats.payload["count"])
+        # Сумма по пачкам может отличаться от суммы целиком последними разрядами
+        self.assertAlmostEqual(stats_result.payload["mean_value"], expected_stats.payload["mean_value"], places=9)
+        self.assertEqual((count_result.payload, count_result.metadata), (1001, {"verbose": False}))
+
+    def test_failed_model_does_not_stop_others(self):
+        """Тест: ошибка одной модели не прерывает остальные."""
+        class FailingModel(RowCountModel):
+            def consume_batch(self, batch):
+                raise ValueError("сбой")
+
+        results = FusedModelRunner([FailingModel(), StatisticsDataModel()], batch_size=100).run(self.data)
+
+        self.assertEqual([result.status for result in results], ["error", "ok"])
+        self.assertEqual(results[0].metadata["stage"], "consume_batch")
+        self.assertEqual(results[1].payload["count"], 1001)
+
+
+if __name__ == '__main__':
+    unittest.main()
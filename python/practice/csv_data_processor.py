@@ -3,31 +3,88 @@ import numpy as np
 import re
 import os
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Set
+from memory_governor import MB, MemoryGovernor
+from mmap_reader import read_usage_columns
+from parse_cache import DEFAULT_MAX_BYTES, ParseCache
+from usage_rollup import ROLLUP_COLUMNS, UsageRollup
+from partitioned_writer import PARTITION_COLUMNS, shard_ids, write_partitioned, write_sharded
+from external_sort import DEFAULT_SORT_KEY, external_sort
+from csv_writer import FastCSVWriter, write_csv
+from dedup_store import IDENTITY_COLUMNS, SeenSet, record_days, record_keys
+from usage_schema import ColumnStep, load_schema
+from usage_filters import RowFilter
+from tz_transitions import convert_column, transition_table
+
+
+# Размер пачки чтения, когда строки отбираются фильтром прямо при чтении
+FILTER_CHUNK_ROWS = 100_000
+
+# Выходная колонка, по хешу которой строки раскладываются по шардам
+SHARD_KEY = 'party_msisdn'
 
 
 class CSVDataProcessor :
     
-    def __init__(self):
-        self.call_type_map = {
-            1: "Исходящий звонок",
-            2: "Входящий звонок", 
-            3: "Исходящая SMS",
-            4: "Входящая SMS",
-            5: "Интернет"
-        }
+    def __init__(self, reader: str = 'pandas', rollups: bool = False,
+                 dedup_path: Optional[str] = None, dedup_window_days: int = 30,
+                 schema_path: Optional[str] = None, shards: int = 0,
+                 target_timezone: Optional[str] = None, parse_cache_dir: Optional[str] = None,
+                 parse_cache_max_bytes: int = DEFAULT_MAX_BYTES,
+                 memory_budget_mb: Optional[float] = None, partitioned: bool = False):
+        """
+        Args:
+            reader: Способ чтения входного файла: 'pandas' или 'mmap'
+                (memory-mapping с разбором границ полей через NumPy; быстрее pandas
+                при чтении всех колонок схемы, при выборе колонок файл читает pandas)
+            rollups: Считать агрегаты по абонентам и часам в проходе трансформации
+            dedup_path: Файл SQLite с ключами уже обработанных записей; если задан,
+                повторно пришедшие записи (в том числе из других файлов) отбрасываются.
+                Ключи записей запоминаются только после успешной записи результата
+                методами save_*
+            dedup_window_days: Сколько дней хранить ключи для дедупликации
+            schema_path: JSON-файл схемы входного формата (None — стандартный формат usage_data)
+            shards: Число шардов по хешу party_msisdn (0 — без шардирования);
+                статистика дополнительно считается по каждому шарду в shard_stats
+            target_timezone: Пояс IANA (например, 'Europe/Minsk'), в который переводится
+                время всех записей с учетом перехода на летнее время; None — время
+                переводится по смещению timeZoneOffset каждой записи
+            parse_cache_dir: Каталог кеша разобранных колонок входных файлов; повторное
+                чтение того же файла загружает колонки без разбора CSV
+            parse_cache_max_bytes: Предельный размер кеша разбора
+            memory_budget_mb: Бюджет памяти процесса в МБ; если задан, файл читается
+                пачками pandas, размер которых подбирается по RSS и размеру строки.
+                Память ограничена только при записи через save_in_batches (каждая пачка
+                пишется сразу); process_data по-прежнему собирает весь результат в один
+                DataFrame, и его пик RSS может превысить бюджет (отчет MemoryGovernor
+                отмечает это полями result_in_memory и budget_exceeded).
+                С reader='mmap' и parse_cache_dir не сочетается
+            partitioned: Результат будет записан партициями (save_partitioned): при выборе
+                колонок call_date и call_type остаются в результате process_data до записи,
+                в файлы их не пишет save_partitioned, если их нет в списке колонок
+        """
+        if memory_budget_mb and (reader == 'mmap' or parse_cache_dir):
+            raise ValueError("memory_budget_mb не сочетается с reader='mmap' и parse_cache_dir: "
+                             "они разбирают файл целиком")
+        self.reader = reader
+        self.rollup = UsageRollup() if rollups else None
+        self.seen_set = SeenSet(dedup_path, dedup_window_days) if dedup_path else None
+        self.duplicates_dropped = 0
+        self.shards = shards
+        self.partitioned = partitioned
+        self.memory_budget_mb = memory_budget_mb
+        self.memory_governor = MemoryGovernor(int(memory_budget_mb * MB)) if memory_budget_mb else None
+        self.parse_cache = ParseCache(parse_cache_dir, parse_cache_max_bytes) if parse_cache_dir else None
+        self.target_timezone = target_timezone
+        if target_timezone:
+            # Таблица переходов строится один раз и кешируется на время работы процесса
+            transition_table(target_timezone)
+        # Схема компилируется один раз: шаги по колонкам и список читаемых колонок
+        self.schema = load_schema(schema_path)
+        self.call_type_map = dict(self.schema.call_type_map)
         
         # Маппинг исходных колонок на целевые
-        self.column_mapping = {
-            'partyMSISDN': 'party_msisdn',
-            'partyIMSI': 'party_imsi', 
-            'calledPartyNumber': 'called_party_number',
-            'callingPartyNumber': 'calling_party_number',
-            'callDate': 'call_date',
-            'callDuration': 'call_duration',
-            'totalVolume': 'total_volume',
-            'totalQuantity': 'total_quantity'
-        }
+        self.column_mapping = self.schema.column_mapping
         
         self.processed_records = 0
         self.error_count = 0
@@ -37,14 +94,179 @@ class CSVDataProcessor :
             'total_volume': 0,
             'total_sms': 0
         }
+        # Статистика по шардам; сумма по шардам совпадает с self.stats
+        self.shard_stats = [dict.fromkeys(self.stats, 0) for _ in range(shards)]
+
+    def reset_stats(self):
+        """Сбрасывает счетчики перед обработкой следующего файла тем же экземпляром."""
+        self.processed_records = 0
+        self.error_count = 0
+        self.duplicates_dropped = 0
+        if self.seen_set is not None:
+            self.seen_set.rollback()
+        for key in self.stats:
+            self.stats[key] = 0
+        self.shard_stats = [dict.fromkeys(self.stats, 0) for _ in range(self.shards)]
+        if self.rollup is not None:
+            self.rollup = UsageRollup()
+        if self.memory_governor is not None:
+            self.memory_governor = MemoryGovernor(int(self.memory_budget_mb * MB))
+
+    def _finish_dedup(self, saved: bool):
+        """
+        Запоминает ключи записанных записей или отбрасывает их, если запись не удалась.
+        
+        Args:
+            saved: Результат записан полностью
+        """
+        if self.seen_set is None:
+            return
+        if saved:
+            self.seen_set.commit()
+        else:
+            dropped = self.seen_set.rollback()
+            if dropped:
+                print(f"Ключи дедупликации не сохранены: {dropped} (результат не записан)")
+
+    def _detect_delimiter(self, file_path: str) -> str:
+        """Определяет разделитель колонок по схеме или по первой строке файла."""
+        if self.schema.delimiter:
+            return self.schema.delimiter
+        with open(file_path, 'r', encoding='utf-8') as file:
+            first_line = file.readline().strip()
+        return ';' if ';' in first_line else ','
+
+    def _source_columns(self, columns: Optional[List[str]], row_filter: Optional[RowFilter]) -> Optional[Set[str]]:
+        """
+        Определяет исходные колонки, которые нужно читать для выбранных выходных колонок.
+        
+        Args:
+            columns: Выходные колонки (None — все колонки схемы)
+            row_filter: Фильтр строк
+            
+        Returns:
+            Множество исходных колонок или None, если нужны все колонки схемы
+        """
+        if columns is None:
+            return None
+            
+        unknown = set(columns) - set(self.schema.output_columns)
+        if unknown:
+            raise ValueError(f"неизвестные колонки: {', '.join(sorted(unknown))}")
+        
+        outputs = set(columns)
+        if self.seen_set is not None:
+            outputs.update(IDENTITY_COLUMNS)
+        if self.shards:
+            # Номер абонента — ключ шарда, он нужен даже если не входит в выходные колонки
+            outputs.add(SHARD_KEY)
+        if self.partitioned:
+            # Дата и тип вызова — ключи партиций; тип вызова вычисляется всегда
+            outputs.add('call_date')
+        if self.rollup is not None:
+            # Агрегаты считаются по номеру, часу и объемам, даже если их нет в выходных колонках
+            outputs.update(ROLLUP_COLUMNS)
+        if row_filter is not None and row_filter.has_date_range:
+            outputs.add('call_date')
+        
+        # Колонки для типа вызова нужны всегда: по ним считается статистика
+        required = set(self.schema.call_type_sources.values())
+        for step in self.schema.steps:
+            if step.output in outputs:
+                required.add(step.source)
+                if step.offset_source:
+                    required.add(step.offset_source)
+        if row_filter is not None:
+            required.update(row_filter.source_columns(self.schema))
+        return required
 
-    def read_csv_file(self, file_path: str) -> pd.DataFrame:
+    def _prefilter_mask(self, df: pd.DataFrame, row_filter: RowFilter) -> np.ndarray:
+        """Отбор строк по сырым колонкам до трансформации."""
+        call_types = self.determine_call_type(df) if row_filter.call_types is not None else None
+        return row_filter.raw_mask(df, self.schema, call_types)
+
+    def read_csv_file(self, file_path: str, columns: Optional[Set[str]] = None,
+                      row_filter: Optional[RowFilter] = None) -> pd.DataFrame:
+        """
+        Читает входной файл в строковый DataFrame.
+        
+        Args:
+            file_path: Путь к входному файлу
+            columns: Исходные колонки для чтения (None — все колонки схемы)
+            row_filter: Фильтр строк; несовпадающие строки отбрасываются пачками при чтении
+            
+        Returns:
+            DataFrame со строковыми колонками
+        """
+        if self.parse_cache is not None:
+            return self.read_csv_file_cached(file_path, columns, row_filter)
+        return self._read_source(file_path, columns, row_filter)
+
+    def read_csv_file_cached(self, file_path: str, columns: Optional[Set[str]] = None,
+                             row_filter: Optional[RowFilter] = None) -> pd.DataFrame:
+        """
+        Читает файл через кеш разобранных колонок.
+        
+        При промахе файл читается целиком (все колонки схемы) и сохраняется в кеш,
+        выбор колонок и фильтр применяются к загруженным колонкам.
+        
+        Args:
+            file_path: Путь к входному файлу
+            columns: Исходные колонки (None — все колонки схемы)
+            row_filter: Фильтр строк
+            
+        Returns:
+            DataFrame со строковыми колонками
+        """
+        read_options = f"{self.schema.delimiter}|{','.join(sorted(self.schema.required_columns))}"
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                first_line = file.readline().strip()
-                delimiter = ';' if ';' in first_line else ','
+            df = self.parse_cache.load(file_path, read_options)
+        except OSError:
+            # Файл недоступен: ошибку сообщит обычное чтение
+            df = None
             
-            df = pd.read_csv(file_path, delimiter=delimiter, dtype=str, na_filter=False)
+        if df is None:
+            df = self._read_source(file_path)
+            if not df.empty:
+                try:
+                    self.parse_cache.store(file_path, df, read_options)
+                except Exception as e:
+                    print(f"Ошибка при сохранении в кеш разбора: {e}")
+        
+        if columns is not None:
+            df = df[[name for name in df.columns if name in columns]]
+        if row_filter is not None and not df.empty:
+            df = df[self._prefilter_mask(df, row_filter)].reset_index(drop=True)
+        return df
+
+    def _read_source(self, file_path: str, columns: Optional[Set[str]] = None,
+                     row_filter: Optional[RowFilter] = None) -> pd.DataFrame:
+        """Разбирает входной файл выбранным способом чтения (pandas или mmap)."""
+        # mmap-разбор создает строки всех полей файла, а pandas пропускает ненужные колонки,
+        # поэтому при выборе колонок быстрее pandas
+        if self.reader == 'mmap' and columns is None:
+            try:
+                return self.read_csv_file_mmap(file_path, columns, row_filter)
+            except ValueError as e:
+                print(f"mmap-чтение недоступно для {file_path} ({e}), используем pandas")
+
+        try:
+            delimiter = self._detect_delimiter(file_path)
+            usecols = self.schema.usecols if columns is None else columns.__contains__
+            
+            if row_filter is not None:
+                # Отобранные строки накапливаются по пачкам, весь файл в памяти не держится
+                frames = []
+                with pd.read_csv(file_path, delimiter=delimiter, dtype=str, na_filter=False,
+                                 usecols=usecols, chunksize=FILTER_CHUNK_ROWS) as reader:
+                    for chunk in reader:
+                        chunk = chunk.reset_index(drop=True)
+                        frames.append(chunk[self._prefilter_mask(chunk, row_filter)])
+                return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            
+            # Читаются только колонки, нужные схеме
+            df = pd.read_csv(file_path, delimiter=delimiter, dtype=str, na_filter=False,
+                             usecols=usecols)
             
             df = df.fillna('')
             
@@ -55,6 +277,34 @@ class CSVDataProcessor :
             self.error_count += 1
             return pd.DataFrame()
 
+    def read_csv_file_mmap(self, file_path: str, columns: Optional[Set[str]] = None,
+                           row_filter: Optional[RowFilter] = None) -> pd.DataFrame:
+        """
+        Читает файл через memory-mapping без построчного разбора в Python.
+        
+        Границы полей находятся NumPy по байтовому буферу, а все поля декодируются
+        одним str.split, поэтому чтение всех колонок быстрее pandas.read_csv.
+
+        Args:
+            file_path: Путь к входному файлу
+            columns: Исходные колонки для чтения (None — все колонки схемы)
+            row_filter: Фильтр строк; применяется к прочитанному DataFrame
+
+        Returns:
+            DataFrame со строковыми колонками, как у read_csv_file
+        """
+        usecols = self.schema.usecols if columns is None else columns.__contains__
+        with read_usage_columns(file_path, self.schema.delimiter) as parsed:
+            if parsed.malformed_lines:
+                print(f"Пропущено строк с неверным числом полей: {parsed.malformed_lines}")
+                self.error_count += parsed.malformed_lines
+            df = parsed.to_dataframe([name for name in parsed.columns if usecols(name)])
+            
+        if row_filter is None or df.empty:
+            return df
+        # Отбор после разбора: поштучное декодирование выбранных строк медленнее общего split
+        return df[self._prefilter_mask(df, row_filter)].reset_index(drop=True)
+
     def normalize_phone_number(self, phone_series: pd.Series) -> pd.Series:
         """
         Нормализует телефонные номера: убирает префиксы, очищает от пробелов и добавляет код 375 для белорусских номеров.
@@ -99,6 +349,9 @@ class CSVDataProcessor :
         Returns:
             Series с датами в формате ISO
         """
+        if self.target_timezone:
+            return self.convert_time_to_zone(call_date_series, self.target_timezone)
+        
         def convert_single_time(call_date, timezone_offset):
             try:
                 if pd.isna(call_date) or call_date == '' or pd.isna(timezone_offset) or timezone_offset == '':
@@ -134,6 +387,27 @@ class CSVDataProcessor :
             for call_date, timezone_offset in zip(call_date_series, timezone_offset_series)
         ])
 
+    def convert_time_to_zone(self, call_date_series: pd.Series, zone_name: str) -> pd.Series:
+        """
+        Переводит время соединения (UTC) в местное время пояса IANA векторно.
+        
+        Смещение пояса берется из таблицы переходов, поэтому записи с любыми
+        timeZoneOffset (в том числе роуминговые) переводятся одной операцией.
+        
+        Args:
+            call_date_series: Series с датами в формате "HH:MM:SS DD/MM/YYYY" (UTC)
+            zone_name: Имя пояса IANA
+            
+        Returns:
+            Series с датами в формате ISO
+        """
+        result, invalid = convert_column(call_date_series, zone_name)
+        if invalid.any():
+            print(f"Ошибка при преобразовании времени: нераспознанных значений {int(invalid.sum())}, "
+                  f"например '{call_date_series[invalid].iloc[0]}'")
+            self.error_count += int(invalid.sum())
+        return result
+
     def determine_call_type(self, df: pd.DataFrame) -> pd.Series:
         """
         Определяет тип вызова на основе заполненных полей
@@ -144,11 +418,12 @@ class CSVDataProcessor :
         Returns:
             Series с кодами типов вызова (1-5)
         """
-        has_duration = df['callDuration'].astype(str).str.strip() != ''
-        has_volume = df['totalVolume'].astype(str).str.strip() != ''
-        has_quantity = df['totalQuantity'].astype(str).str.strip() != ''
-        has_called_party = df['calledPartyNumber'].astype(str).str.strip() != ''
-        has_calling_party = df['callingPartyNumber'].astype(str).str.strip() != ''
+        sources = self.schema.call_type_sources
+        has_duration = df[sources['duration']].astype(str).str.strip() != ''
+        has_volume = df[sources['volume']].astype(str).str.strip() != ''
+        has_quantity = df[sources['quantity']].astype(str).str.strip() != ''
+        has_called_party = df[sources['called_party']].astype(str).str.strip() != ''
+        has_calling_party = df[sources['calling_party']].astype(str).str.strip() != ''
         
         call_types = pd.Series([5] * len(df), dtype=int)  # По умолчанию интернет
         
@@ -174,86 +449,148 @@ class CSVDataProcessor :
         
         return call_types
 
-    def transform_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _apply_column_step(self, step: ColumnStep, df: pd.DataFrame) -> pd.Series:
+        """Строит одну выходную колонку по шагу схемы."""
+        values = df[step.source]
+        if step.transform == 'phone':
+            values = self.normalize_phone_number(values)
+        elif step.transform == 'local_time' and step.offset_source in df.columns:
+            values = self.convert_time_to_local(values, df[step.offset_source])
+        
+        if step.type != 'str':
+            values = pd.to_numeric(values, errors='coerce')
+            if step.type == 'int':
+                values = values.astype('Int64')
+        
+        return values.reset_index(drop=True)
+
+    def transform_dataframe(self, df: pd.DataFrame, columns: Optional[List[str]] = None,
+                            row_filter: Optional[RowFilter] = None) -> pd.DataFrame:
         """
         Выполняет трансформацию DataFrame.
         
         Args:
             df: Исходный DataFrame
+            columns: Выходные колонки (None — все колонки схемы); при шардировании
+                к ним добавляется party_msisdn, при записи партициями — call_date и call_type
+            row_filter: Фильтр строк; здесь проверяется период по call_date в местном времени
+                (остальные условия проверяются при чтении)
             
         Returns:
             Трансформированный DataFrame
         """
         try:
-            transformed_df = df.copy()
-            
-            transformed_df = transformed_df.rename(columns=self.column_mapping)
+            # Выходные колонки собираются по шагам схемы, без копии и переименования всего кадра;
+            # колонки, отсутствующие во входном файле, пропускаются
+            transformed_df = pd.DataFrame({
+                step.output: self._apply_column_step(step, df)
+                for step in self.schema.steps if step.source in df.columns
+            })
             
-            for phone_field in ['party_msisdn', 'called_party_number', 'calling_party_number']:
-                if phone_field in transformed_df.columns:
-                    transformed_df[phone_field] = self.normalize_phone_number(transformed_df[phone_field])
+            if row_filter is not None:
+                in_range = row_filter.exact_mask(transformed_df)
+                if not in_range.all():
+                    df = df[in_range].reset_index(drop=True)
+                    transformed_df = transformed_df[in_range].reset_index(drop=True)
             
-            if 'call_date' in transformed_df.columns and 'timeZoneOffset' in df.columns:
-                transformed_df['call_date'] = self.convert_time_to_local(
-                    transformed_df['call_date'], 
-                    df['timeZoneOffset']
+            # Отбрасываем записи, уже обработанные в этом или предыдущих файлах
+            if self.seen_set is not None and 'party_msisdn' in transformed_df.columns \
+                    and 'call_date' in transformed_df.columns:
+                duplicates = self.seen_set.check_and_add(
+                    record_keys(transformed_df), record_days(transformed_df['call_date'])
                 )
+                if duplicates.any():
+                    df = df[~duplicates].reset_index(drop=True)
+                    transformed_df = transformed_df[~duplicates].reset_index(drop=True)
+                    self.duplicates_dropped += int(duplicates.sum())
             
             call_types = self.determine_call_type(df)
-            transformed_df['call_type'] = call_types.astype(str)
+            transformed_df[self.schema.call_type_output] = call_types.astype(str)
             
             # Обновляем статистику
-            self._update_stats(df, call_types)
+            shards = None
+            if self.shards and SHARD_KEY in transformed_df.columns:
+                shards = shard_ids(transformed_df[SHARD_KEY], self.shards)
+            self._update_stats(df, call_types, shards)
             
-            # Выбираем только нужные колонки
-            target_columns = [
-                'party_msisdn', 'party_imsi', 'called_party_number', 
-                'calling_party_number', 'call_date', 'call_duration',
-                'total_volume', 'total_quantity', 'call_type'
-            ]
+            if self.rollup is not None and 'party_msisdn' in transformed_df.columns:
+                self.rollup.update(transformed_df, call_types)
             
-            # Оставляем только существующие колонки
-            existing_columns = [col for col in target_columns if col in transformed_df.columns]
-            result_df = transformed_df[existing_columns].copy()
+            if columns is not None:
+                # Ключи шарда и партиций остаются до записи: save_sharded и save_partitioned убирают их сами
+                keep = list(columns)
+                if self.shards and SHARD_KEY not in keep:
+                    keep.append(SHARD_KEY)
+                if self.partitioned:
+                    keep.extend(key for key in PARTITION_COLUMNS if key not in keep)
+                transformed_df = transformed_df[[col for col in keep if col in transformed_df.columns]]
             
-            return result_df
+            return transformed_df
             
         except Exception as e:
             print(f"Ошибка при трансформации DataFrame: {e}")
             self.error_count += 1
             return pd.DataFrame()
 
-    def _update_stats(self, df: pd.DataFrame, call_types: pd.Series):
-        """Обновляет статистику обработки."""
+    def _add_shard_stats(self, key: str, shards: Optional[np.ndarray], mask: pd.Series, values: pd.Series):
+        """Добавляет значения строк mask к статистике их шардов."""
+        if shards is None:
+            return
+        per_shard = pd.Series(values.to_numpy()).groupby(shards[mask.to_numpy()]).sum()
+        for shard, value in per_shard.items():
+            self.shard_stats[shard][key] += value
+
+    def _update_stats(self, df: pd.DataFrame, call_types: pd.Series, shards: Optional[np.ndarray] = None):
+        """
+        Обновляет статистику обработки.
+        
+        Args:
+            df: Исходный DataFrame
+            call_types: Коды типов вызова
+            shards: Номера шардов строк (None — без статистики по шардам)
+        """
         try:
+            sources = self.schema.call_type_sources
+            
             # Статистика звонков
             call_mask = call_types.isin([1, 2])
             if call_mask.any():
-                call_durations = pd.to_numeric(df.loc[call_mask, 'callDuration'], errors='coerce').fillna(0)
+                call_durations = pd.to_numeric(df.loc[call_mask, sources['duration']], errors='coerce').fillna(0)
                 self.stats['total_calls'] += call_mask.sum()
                 self.stats['total_call_duration'] += call_durations.sum()
+                self._add_shard_stats('total_calls', shards, call_mask, pd.Series(1, index=call_durations.index))
+                self._add_shard_stats('total_call_duration', shards, call_mask, call_durations)
             
             # Статистика интернета
             internet_mask = call_types == 5
             if internet_mask.any():
-                volumes = pd.to_numeric(df.loc[internet_mask, 'totalVolume'], errors='coerce').fillna(0)
+                volumes = pd.to_numeric(df.loc[internet_mask, sources['volume']], errors='coerce').fillna(0)
                 self.stats['total_volume'] += volumes.sum()
+                self._add_shard_stats('total_volume', shards, internet_mask, volumes)
             
             # Статистика SMS
             sms_mask = call_types.isin([3, 4])
             if sms_mask.any():
-                quantities = pd.to_numeric(df.loc[sms_mask, 'totalQuantity'], errors='coerce').fillna(0)
+                quantities = pd.to_numeric(df.loc[sms_mask, sources['quantity']], errors='coerce').fillna(0)
                 self.stats['total_sms'] += quantities.sum()
+                self._add_shard_stats('total_sms', shards, sms_mask, quantities)
                 
         except Exception as e:
             print(f"Ошибка при обновлении статистики: {e}")
 
-    def process_data(self, input_file: str) -> pd.DataFrame:
+    def process_data(self, input_file: str, columns: Optional[List[str]] = None,
+                     filters: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
         """
         Основной метод обработки данных.
         
         Args:
             input_file: Путь к входному CSV файлу
+            columns: Выходные колонки (None — все); исходные колонки, не нужные
+                для них, не читаются из файла. При шардировании в результате остается
+                party_msisdn — ключ шарда, в файлы его не пишет save_sharded; при
+                partitioned остаются call_date и call_type — ключи партиций
+            filters: Условия отбора записей: call_types, msisdn_prefix,
+                date_from, date_to (YYYY-MM-DD, период полуоткрытый)
             
         Returns:
             DataFrame с обработанными данными
@@ -261,30 +598,293 @@ class CSVDataProcessor :
         print(f"Начинаем обработку файла: {input_file}")
         start_time = datetime.now()
         
+        row_filter = RowFilter.from_dict(filters)
+        if self.seen_set is not None:
+            # Ключи прошлой обработки, результат которой так и не записали, не считаются обработанными
+            self.seen_set.rollback()
+        
+        if self.memory_governor is not None:
+            return self._process_in_batches(input_file, columns, row_filter, start_time)
+        
         # Читаем данные
-        df = self.read_csv_file(input_file)
+        if columns is None and row_filter is None:
+            df = self.read_csv_file(input_file)
+        else:
+            df = self.read_csv_file(input_file, self._source_columns(columns, row_filter), row_filter)
         if df.empty:
-            print("Не удалось прочитать данные из файла")
+            if row_filter is not None and len(df.columns):
+                print("Нет записей, удовлетворяющих фильтру")
+            else:
+                print("Не удалось прочитать данные из файла")
             return pd.DataFrame()
             
         print(f"Прочитано записей: {len(df)}")
         
         # Обрабатываем данные
-        processed_df = self.transform_dataframe(df)
+        processed_df = self.transform_dataframe(df, columns, row_filter)
         
         self.processed_records = len(processed_df)
         end_time = datetime.now()
         
+        if self.seen_set is not None:
+            print(f"Отброшено дубликатов: {self.duplicates_dropped}")
+        
         print(f"Обработка завершена за {end_time - start_time}")
         return processed_df
 
-    def save_to_csv(self, df: pd.DataFrame, output_dir: str) -> str:
+    def _process_in_batches(self, input_file: str, columns: Optional[List[str]],
+                            row_filter: Optional[RowFilter], start_time: datetime) -> pd.DataFrame:
+        """
+        Обрабатывает файл пачками под бюджет памяти (вариант process_data).
+        
+        Бюджет ограничивает размер разбираемой пачки, но результат всех пачек
+        собирается в один DataFrame; чтобы память не росла с размером файла,
+        используйте save_in_batches.
+        """
+        rows_read = 0
+        frames = []
+        self.memory_governor.result_in_memory = True
+        for chunk in self._iter_raw_chunks(input_file, columns=self._source_columns(columns, row_filter),
+                                           row_filter=row_filter):
+            rows_read += len(chunk)
+            frames.append(self.transform_dataframe(chunk, columns, row_filter))
+        
+        if rows_read == 0:
+            print("Не удалось прочитать данные из файла")
+            return pd.DataFrame()
+            
+        print(f"Прочитано записей: {rows_read}")
+        processed_df = pd.concat(frames, ignore_index=True)
+        self.processed_records = len(processed_df)
+        
+        report = self.memory_governor.report()
+        print(f"Память: пачек {report['batches']}, размер пачки {report['min_batch_rows']}-"
+              f"{report['max_batch_rows']} строк, пик RSS {report['peak_rss_mb']} МБ "
+              f"из {report['budget_mb']} МБ")
+        print("Внимание: результат собран в памяти, бюджет ограничивает только пачки чтения"
+              + (" — пик RSS превысил бюджет" if report['budget_exceeded'] else "")
+              + "; для записи без накопления используйте save_in_batches")
+        if self.seen_set is not None:
+            print(f"Отброшено дубликатов: {self.duplicates_dropped}")
+        
+        print(f"Обработка завершена за {datetime.now() - start_time}")
+        return processed_df
+
+    def _iter_raw_chunks(self, input_file: str, chunk_size: int = 100_000, columns: Optional[Set[str]] = None,
+                         row_filter: Optional[RowFilter] = None) -> Iterator[pd.DataFrame]:
+        """
+        Читает файл пачками исходных строк.
+        
+        Размер пачки фиксирован (chunk_size) или, если задан бюджет памяти,
+        выбирается перед каждой пачкой MemoryGovernor.
+        
+        Args:
+            input_file: Путь к входному CSV файлу
+            chunk_size: Количество строк в пачке без бюджета памяти
+            columns: Исходные колонки (None — все колонки схемы)
+            row_filter: Фильтр строк, применяемый к каждой пачке
+            
+        Returns:
+            Итератор DataFrame с индексом от 0
+        """
+        usecols = self.schema.usecols if columns is None else columns.__contains__
+        try:
+            reader = pd.read_csv(input_file, delimiter=self._detect_delimiter(input_file),
+                                 dtype=str, na_filter=False, usecols=usecols,
+                                 chunksize=chunk_size)
+        except Exception as e:
+            print(f"Ошибка при чтении файла {input_file}: {e}")
+            self.error_count += 1
+            return
+            
+        governor = self.memory_governor
+        with reader:
+            while True:
+                try:
+                    chunk = reader.get_chunk(governor.next_batch_rows() if governor else chunk_size)
+                except StopIteration:
+                    break
+                if governor:
+                    governor.observe(chunk)
+                
+                # Индекс пачки сбрасывается: преобразования возвращают Series с индексом от 0
+                chunk = chunk.reset_index(drop=True)
+                if row_filter is not None:
+                    chunk = chunk[self._prefilter_mask(chunk, row_filter)].reset_index(drop=True)
+                yield chunk
+
+    def iter_processed_chunks(self, input_file: str, chunk_size: int = 100_000, columns: Optional[List[str]] = None,
+                              filters: Optional[Dict[str, Any]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Читает и трансформирует файл пачками, не держа весь файл в памяти.
+        
+        Args:
+            input_file: Путь к входному CSV файлу
+            chunk_size: Количество строк в пачке (при бюджете памяти подбирается автоматически)
+            columns: Выходные колонки (None — все), как в process_data
+            filters: Условия отбора записей, как в process_data
+            
+        Returns:
+            Итератор трансформированных DataFrame
+        """
+        row_filter = RowFilter.from_dict(filters)
+        for chunk in self._iter_raw_chunks(input_file, chunk_size, self._source_columns(columns, row_filter),
+                                           row_filter):
+            processed_chunk = self.transform_dataframe(chunk, columns, row_filter)
+            self.processed_records += len(processed_chunk)
+            yield processed_chunk
+
+    def save_sorted_csv(self, input_file: str, output_dir: str, run_rows: int = 500_000,
+                        chunk_size: int = 100_000, filename: Optional[str] = None,
+                        columns: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Обрабатывает файл и сохраняет результат, отсортированный по party_msisdn и call_date.
+        
+        Сортировка внешняя: в памяти одновременно находится не более run_rows строк,
+        поэтому размер входного файла не ограничен объемом памяти. Файл читается
+        пачками pandas, поэтому чтение через mmap, кеш разбора и шардирование
+        с сортировкой не сочетаются.
+        
+        Args:
+            input_file: Путь к входному CSV файлу
+            output_dir: Директория для сохранения
+            run_rows: Максимальное число строк, сортируемых в памяти за раз
+            chunk_size: Количество строк в пачке чтения
+            filename: Имя файла (если None — формируется по текущему времени)
+            columns: Выходные колонки (None — все); ключ сортировки читается
+                и в этом случае, но в файл не пишется
+            filters: Условия отбора записей, как в process_data
+            
+        Returns:
+            Путь к созданному файлу или пустая строка при ошибке
+        """
+        print(f"Начинаем обработку файла с сортировкой: {input_file}")
+        start_time = datetime.now()
+        
+        unsupported = [name for name, enabled in (("reader='mmap'", self.reader == 'mmap'),
+                                                  ("parse_cache_dir", self.parse_cache is not None),
+                                                  ("shards", bool(self.shards))) if enabled]
+        if unsupported:
+            print(f"Ошибка: сортировка не поддерживает {', '.join(unsupported)}")
+            self.error_count += 1
+            return ""
+        
+        # Ключ сортировки нужен в сериях, даже если не входит в выходные колонки
+        sort_columns = None
+        if columns is not None:
+            sort_columns = list(columns) + [key for key in DEFAULT_SORT_KEY if key not in columns]
+        
+        if filename is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"processed_usage_data_ _{timestamp}.csv"
+        filepath = os.path.join(output_dir, filename)
+        if self.seen_set is not None:
+            self.seen_set.rollback()
+        
+        try:
+            rows = external_sort(self.iter_processed_chunks(input_file, chunk_size, sort_columns, filters), filepath,
+                                 DEFAULT_SORT_KEY, run_rows, columns=columns)
+        except Exception as e:
+            print(f"Ошибка при сортировке данных: {e}")
+            self.error_count += 1
+            self._finish_dedup(False)
+            return ""
+            
+        self._finish_dedup(rows > 0)
+        if rows == 0:
+            print("Не удалось прочитать данные из файла")
+            return ""
+            
+        print(f"Обработка завершена за {datetime.now() - start_time}")
+        print(f"Данные сохранены в файл: {filepath}")
+        return filepath
+
+    def save_in_batches(self, input_file: str, output_dir: str, file_format: Optional[str] = None,
+                        columns: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None,
+                        filename: Optional[str] = None) -> List[str]:
+        """
+        Обрабатывает файл пачками и пишет каждую пачку сразу после трансформации.
+        
+        В памяти одновременно находится одна пачка, поэтому с бюджетом памяти
+        (memory_budget_mb) потребление не растет с размером файла. Без шардов и
+        формата результат пишется в один CSV через FastCSVWriter и публикуется после
+        записи всех пачек; партиции и шарды дописываются частями по каждой пачке.
+        
+        Args:
+            input_file: Путь к входному CSV файлу
+            output_dir: Директория для сохранения (корень набора данных для партиций и шардов)
+            file_format: None — один CSV файл; 'csv' или 'parquet' — партиции
+                date=/call_type= (или формат шардов, если задан shards)
+            columns: Выходные колонки, как в process_data
+            filters: Условия отбора записей, как в process_data
+            filename: Имя CSV файла (если None — формируется по текущему времени)
+            
+        Returns:
+            Список путей к созданным файлам (пустой, если данных нет или запись не удалась)
+        """
+        print(f"Начинаем обработку файла пачками: {input_file}")
+        start_time = datetime.now()
+        if self.seen_set is not None:
+            self.seen_set.rollback()
+        
+        # Ключи партиций нужны в пачках, даже если не входят в выходные колонки
+        read_columns = columns
+        if file_format and not self.shards and columns is not None:
+            read_columns = list(columns) + [key for key in PARTITION_COLUMNS if key not in columns]
+        
+        paths = []
+        writer = None
+        try:
+            for chunk in self.iter_processed_chunks(input_file, columns=read_columns, filters=filters):
+                if chunk.empty:
+                    continue
+                if self.shards:
+                    paths.extend(write_sharded(chunk, output_dir, self.shards, file_format or 'csv', columns))
+                elif file_format:
+                    paths.extend(write_partitioned(chunk, output_dir, file_format, columns))
+                else:
+                    if writer is None:
+                        if filename is None:
+                            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                            filename = f"processed_usage_data_ _{timestamp}.csv"
+                        writer = FastCSVWriter(os.path.join(output_dir, filename), sep=';', encoding='utf-8')
+                        paths.append(writer.path)
+                    writer.write(chunk)
+            if writer is not None:
+                writer.close()
+                
+        except Exception as e:
+            if writer is not None:
+                writer.abort()
+            print(f"Ошибка при сохранении пачками: {e}")
+            self.error_count += 1
+            self._finish_dedup(False)
+            return []
+        
+        self._finish_dedup(bool(paths))
+        if not paths:
+            print("Не удалось прочитать данные из файла")
+            return []
+            
+        if self.memory_governor is not None:
+            report = self.memory_governor.report()
+            print(f"Память: пачек {report['batches']}, размер пачки {report['min_batch_rows']}-"
+                  f"{report['max_batch_rows']} строк, пик RSS {report['peak_rss_mb']} МБ "
+                  f"из {report['budget_mb']} МБ")
+        if self.seen_set is not None:
+            print(f"Отброшено дубликатов: {self.duplicates_dropped}")
+        print(f"Обработка завершена за {datetime.now() - start_time}")
+        print(f"Данные сохранены в {len(paths)} файлов в директории: {output_dir}")
+        return paths
+
+    def save_to_csv(self, df: pd.DataFrame, output_dir: str, filename: Optional[str] = None) -> str:
         """
         Сохраняет обработанные данные в новый CSV файл.
         
         Args:
             df: DataFrame с обработанными данными
             output_dir: Директория для сохранения
+            filename: Имя файла (если None — формируется по текущему времени)
             
         Returns:
             Путь к созданному файлу
@@ -293,22 +893,124 @@ class CSVDataProcessor :
             return ""
             
         # Создаем имя файла с временной меткой
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"processed_usage_data_ _{timestamp}.csv"
+        if filename is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"processed_usage_data_ _{timestamp}.csv"
         filepath = os.path.join(output_dir, filename)
         
         try:
             # Сохраняем с  
-            df.to_csv(filepath, index=False, sep=';', encoding='utf-8')
+            # Быстрая запись, совместимая по байтам с df.to_csv(sep=';', index=False);
+            # файл появляется под итоговым именем только после полной записи
+            write_csv(df, filepath, sep=';', encoding='utf-8')
             
             print(f"Данные сохранены в файл: {filepath}")
+            self._finish_dedup(True)
             return filepath
             
         except Exception as e:
             print(f"Ошибка при сохранении файла: {e}")
             self.error_count += 1
+            self._finish_dedup(False)
             return ""
 
+    def save_partitioned(self, df: pd.DataFrame, output_dir: str, file_format: str = 'csv',
+                         columns: Optional[List[str]] = None) -> List[str]:
+        """
+        Сохраняет обработанные данные с разбиением по дате и типу вызова.
+        
+        Раскладка: date=YYYY-MM-DD/call_type=N/part-XXXX.{csv,parquet}; файлы
+        появляются под итоговыми именами только после записи всех частей.
+        
+        Args:
+            df: DataFrame с обработанными данными (с колонками call_date и call_type)
+            output_dir: Корневая директория набора данных
+            file_format: 'csv' или 'parquet' (нужен pyarrow или fastparquet)
+            columns: Выходные колонки, переданные process_data (None — все колонки df);
+                call_date и call_type не пишутся в файлы, если их нет в этом списке
+            
+        Returns:
+            Список путей к созданным файлам
+        """
+        if df.empty:
+            return []
+            
+        try:
+            paths = write_partitioned(df, output_dir, file_format, columns)
+            print(f"Данные сохранены в {len(paths)} партиций в директории: {output_dir}")
+            self._finish_dedup(True)
+            return paths
+            
+        except Exception as e:
+            print(f"Ошибка при сохранении партиций: {e}")
+            self.error_count += 1
+            self._finish_dedup(False)
+            return []
+
+    def save_sharded(self, df: pd.DataFrame, output_dir: str, file_format: str = 'csv',
+                     columns: Optional[List[str]] = None) -> List[str]:
+        """
+        Сохраняет обработанные данные по шардам хеша party_msisdn.
+        
+        Раскладка: shard=NNN/part-XXXX.{csv,parquet}; все записи абонента попадают
+        в один шард, поэтому шарды можно обрабатывать на разных узлах независимо.
+        
+        Args:
+            df: DataFrame с обработанными данными (с колонкой party_msisdn)
+            output_dir: Корневая директория набора данных
+            file_format: 'csv' или 'parquet' (нужен pyarrow или fastparquet)
+            columns: Выходные колонки, переданные process_data (None — все колонки df);
+                party_msisdn не пишется в файлы, если ее нет в этом списке
+            
+        Returns:
+            Список путей к созданным файлам
+        """
+        if df.empty or not self.shards:
+            return []
+            
+        try:
+            paths = write_sharded(df, output_dir, self.shards, file_format, columns)
+            print(f"Данные сохранены в {len(paths)} шардов в директории: {output_dir}")
+            self._finish_dedup(True)
+            return paths
+            
+        except Exception as e:
+            print(f"Ошибка при сохранении шардов: {e}")
+            self.error_count += 1
+            self._finish_dedup(False)
+            return []
+
+    def save_rollups(self, output_dir: str) -> List[str]:
+        """
+        Сохраняет агрегаты по абонентам и по часам суток в CSV файлы.
+        
+        Args:
+            output_dir: Директория для сохранения
+            
+        Returns:
+            Список путей к созданным файлам (пустой, если агрегаты не включены)
+        """
+        if self.rollup is None:
+            return []
+            
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        frames = {
+            f"usage_rollup_subscriber_{timestamp}.csv": self.rollup.subscriber_frame(),
+            f"usage_rollup_hour_{timestamp}.csv": self.rollup.hourly_frame()
+        }
+        
+        paths = []
+        try:
+            for filename, frame in frames.items():
+                filepath = os.path.join(output_dir, filename)
+                frame.to_csv(filepath, index=False, sep=';', encoding='utf-8')
+                paths.append(filepath)
+                print(f"Агрегаты сохранены в файл: {filepath}")
+        except Exception as e:
+            print(f"Ошибка при сохранении агрегатов: {e}")
+            self.error_count += 1
+        return paths
+
     def print_statistics(self, input_filename: str, output_filename: str, 
                         start_time: datetime, end_time: datetime):
         """
@@ -336,8 +1038,31 @@ class CSVDataProcessor :
         print(f"Суммарная длительность звонков: {self.stats['total_call_duration']} сек")
         print(f"Объем интернет-сессий: {self.stats['total_volume']} байт")
         print(f"Количество SMS: {self.stats['total_sms']}")
+        if self.seen_set is not None:
+            print(f"Отброшено дубликатов: {self.duplicates_dropped}")
         print()
         
+        if self.shards:
+            print("СВОДКА ПО ШАРДАМ (звонки / длительность / объем / SMS):")
+            for shard, stats in enumerate(self.shard_stats):
+                print(f"Шард {shard:03d}: {stats['total_calls']} / {stats['total_call_duration']} / "
+                      f"{stats['total_volume']} / {stats['total_sms']}")
+            print()
+        
+        if self.memory_governor is not None:
+            report = self.memory_governor.report()
+            print("ПАМЯТЬ:")
+            print(f"Бюджет: {report['budget_mb']} МБ, пик RSS: {report['peak_rss_mb']} МБ")
+            print(f"Пачек: {report['batches']}, размер пачки: {report['min_batch_rows']}-"
+                  f"{report['max_batch_rows']} строк, байт на строку: {report['bytes_per_row']}")
+            print(f"Уменьшений пачки из-за нехватки памяти: {report['pressure_events']}")
+            if report['result_in_memory']:
+                print("Результат собран в памяти (process_data): бюджет ограничивает только пачки чтения, "
+                      "пик RSS может превышать бюджет")
+            if report['budget_exceeded']:
+                print("Пик RSS превысил бюджет памяти")
+            print()
+        
         print(f"Количество ошибок при обработке: {self.error_count}")
         print("="*60)
 
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Быстрая запись DataFrame в CSV, совместимая по байтам с DataFrame.to_csv.
+
+Каждая колонка форматируется в строки одним векторным преобразованием,
+строки собираются через str.join, а результат копится в большом буфере и
+пишется в файл редкими вызовами write. Необходимость кавычек проверяется
+сразу по собранному тексту пачки (подсчетом разделителей и переводов строк);
+поштучная проверка полей нужна, только если эта проверка не прошла. Новый файл пишется во временный
+файл рядом с целевым и публикуется атомарным переименованием при закрытии; при дописывании
+данные пишутся прямо в существующий файл, а отмена обрезает его до исходного размера.
+
+Совместимость с to_csv(sep=';', index=False): пустая строка для пропусков,
+перевод строки os.linesep; пачки, где нужны кавычки, пишутся через csv.writer
+с QUOTE_MINIMAL, как это делает сам to_csv.
+"""
+
+import csv
+import io
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def _format_datetimes(series: pd.Series) -> np.ndarray:
+    """Форматирует даты так же, как to_csv: только дата, если у всех значений нет времени."""
+    valid = series.dropna()
+    if len(valid) and ((valid.dt.nanosecond != 0).any() or (valid.dt.microsecond != 0).any()):
+        # Доли секунды встречаются редко, их формат оставляем pandas
+        return series.astype(str).where(series.notna(), '').to_numpy(dtype=object)
+    date_only = bool((valid == valid.dt.normalize()).all())
+    formatted = series.dt.strftime('%Y-%m-%d' if date_only else '%Y-%m-%d %H:%M:%S')
+    return formatted.where(series.notna(), '').to_numpy(dtype=object)
+
+
+def format_column(series: pd.Series) -> np.ndarray:
+    """
+    Переводит колонку в массив строк без кавычек.
+
+    Args:
+        series: Колонка DataFrame
+
+    Returns:
+        np.ndarray строк (object) с пустыми строками вместо пропусков
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+
+    if pd.api.types.is_datetime64_dtype(series.dtype):
+        return _format_datetimes(series)
+
+    if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_integer_dtype(series.dtype) \
+            or pd.api.types.is_float_dtype(series.dtype):
+        if series.dtype.kind in 'biuf' and not series.hasnans:
+            return series.to_numpy().astype(str).astype(object)
+        formatted = series.astype(object).astype(str).to_numpy(dtype=object)
+        formatted[series.isna().to_numpy()] = ''
+        return formatted
+
+    values = series.to_numpy(dtype=object, na_value='', copy=True)
+    if pd.api.types.infer_dtype(values, skipna=False) not in ('string', 'empty'):
+        values = np.array([value if type(value) is str else str(value) for value in values], dtype=object)
+    return values
+
+
+class FastCSVWriter:
+    """
+    Писатель CSV с буферизацией и атомарной публикацией файла.
+
+    При append=True существующий файл не копируется: пачки дописываются в него
+    напрямую, а abort() обрезает файл до размера, который был при открытии.
+
+    Пример:
+        with FastCSVWriter(path) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+
+    Constructor args:
+        path: итоговый путь к файлу
+        sep: разделитель колонок
+        encoding: кодировка файла
+        append: дописывать к существующему файлу (заголовок не повторяется)
+        buffer_size: сколько байт накапливать перед записью в файл
+    """
+
+    def __init__(self, path: str, sep: str = ';', encoding: str = 'utf-8', append: bool = False,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.sep = sep
+        self.encoding = encoding
+        self.buffer_size = buffer_size
+        self.rows = 0
+        self.columns: Optional[List[str]] = None
+
+        self._line_end = os.linesep
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+
+        directory, name = os.path.split(os.path.abspath(path))
+        self._tmp_path = os.path.join(directory, f".{name}.tmp")
+        self._has_header = append and os.path.exists(path) and os.path.getsize(path) > 0
+        # Размер файла до дописывания, к которому abort() возвращает файл
+        self._original_size: Optional[int] = None
+        if self._has_header:
+            self._original_size = os.path.getsize(path)
+            self._file = open(path, 'ab')
+        else:
+            self._file = open(self._tmp_path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _quoted_text(self, rows) -> str:
+        """Собирает текст через csv.writer с кавычками по правилам QUOTE_MINIMAL."""
+        text = io.StringIO()
+        csv.writer(text, delimiter=self.sep, lineterminator=self._line_end,
+                   quoting=csv.QUOTE_MINIMAL).writerows(rows)
+        return text.getvalue()
+
+    def _join(self, columns: List[np.ndarray]) -> str:
+        """Собирает текст пачки из отформатированных колонок."""
+        return self._line_end.join(map(self.sep.join, zip(*columns))) + self._line_end
+
+    def _is_unambiguous(self, text: str, rows: int) -> bool:
+        """Проверяет, что ни одно поле пачки не требует кавычек."""
+        # Единственное пустое поле строки csv.writer заключает в кавычки
+        if len(self.columns) == 1 or '"' in text:
+            return False
+        carriage_returns = rows if self._line_end == '\r\n' else 0
+        return (text.count(self.sep) == rows * (len(self.columns) - 1)
+                and text.count('\n') == rows and text.count('\r') == carriage_returns)
+
+    def _emit(self, text: str):
+        data = text.encode(self.encoding)
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def write(self, df: pd.DataFrame):
+        """
+        Дописывает пачку строк.
+
+        Args:
+            df: DataFrame с теми же колонками, что и первая пачка
+        """
+        if self.columns is None:
+            self.columns = [str(column) for column in df.columns]
+            if not self._has_header:
+                self._emit(self._quoted_text([self.columns]))
+                self._has_header = True
+        elif list(map(str, df.columns)) != self.columns:
+            raise ValueError("колонки пачки не совпадают с колонками файла")
+
+        if df.empty:
+            return
+
+        columns = [format_column(df.iloc[:, position]) for position in range(df.shape[1])]
+        text = self._join(columns)
+        if not self._is_unambiguous(text, len(df)):
+            text = self._quoted_text(zip(*columns))
+        self._emit(text)
+        self.rows += len(df)
+
+    def flush(self):
+        """Записывает накопленный буфер одним вызовом write."""
+        if self._buffer:
+            # Буферизованный файл дописывает все байты или выбрасывает исключение
+            self._file.write(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def close(self):
+        """Дописывает буфер и публикует файл под итоговым именем."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        if self._original_size is None:
+            os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Отменяет запись: итоговый файл остается прежним."""
+        if self._file.closed:
+            return
+        self._buffer = []
+        self._buffered = 0
+        self._file.close()
+        if self._original_size is not None:
+            os.truncate(self.path, self._original_size)
+        elif os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def write_csv(df: pd.DataFrame, path: str, sep: str = ';', encoding: str = 'utf-8') -> int:
+    """
+    Записывает DataFrame в CSV через FastCSVWriter.
+
+    Returns:
+        Количество записанных строк
+    """
+    with FastCSVWriter(path, sep, encoding) as writer:
+        writer.write(df)
+    return writer.rows
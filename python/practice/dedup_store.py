@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Дедупликация записей CDR между файлами.
+
+Идентичность записи (номер абонента, время соединения, длительность/объем,
+номер второй стороны) сворачивается в 64-битный ключ векторным хешированием
+pandas. Ключи хранятся на диске в SQLite-таблице с INTEGER PRIMARY KEY —
+это B-дерево по самому ключу, поэтому проверка точная и не требует держать
+множество в памяти. Ключи старше окна window_days удаляются.
+
+Новые ключи сначала попадают во временную таблицу ожидающих ключей (temp-таблица
+соединения SQLite) и переносятся в постоянную только вызовом commit после того,
+как результат обработки записан. Если запись результата не удалась, rollback
+отбрасывает ожидающие ключи, и повторная обработка файла вернет те же записи.
+"""
+
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Sequence
+
+
+IDENTITY_COLUMNS = ('party_msisdn', 'call_date', 'call_duration', 'total_volume',
+                    'called_party_number', 'calling_party_number')
+
+# Ограничение SQLite на число параметров в одном запросе
+_QUERY_BATCH = 900
+
+# День записи с нераспознанной call_date: не сдвигает окно хранения ключей
+UNKNOWN_DAY = -1
+
+
+def record_keys(df: pd.DataFrame, columns: Sequence[str] = IDENTITY_COLUMNS) -> np.ndarray:
+    """
+    Вычисляет 64-битные ключи идентичности записей.
+
+    Args:
+        df: Трансформированный DataFrame (нормализованные номера, call_date в ISO)
+        columns: Поля идентичности; отсутствующие в df пропускаются
+
+    Returns:
+        np.ndarray int64 с ключом для каждой строки
+    """
+    present = [column for column in columns if column in df.columns]
+    hashed = pd.util.hash_pandas_object(df[present].astype(str), index=False)
+    return hashed.to_numpy(dtype=np.uint64).view(np.int64)
+
+
+def record_days(call_date: pd.Series) -> np.ndarray:
+    """Номер дня (дней от 1970-01-01) по call_date; для нераспознанных дат — UNKNOWN_DAY."""
+    dates = pd.to_datetime(call_date.astype(str).str.slice(0, 10), format='%Y-%m-%d', errors='coerce')
+    days = (dates - pd.Timestamp(0)).dt.days
+    return days.fillna(UNKNOWN_DAY).to_numpy(dtype=np.int64)
+
+
+class SeenSet:
+    """
+    Дисковое множество уже обработанных ключей записей.
+
+    Constructor args:
+        path: путь к файлу SQLite (':memory:' — только в памяти процесса)
+        window_days: сколько дней от самой поздней записи хранить ключи
+    """
+
+    def __init__(self, path: str, window_days: int = 30):
+        self.path = path
+        self.window_days = window_days
+        self._latest_day = None
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute(
+            "create table if not exists seen_records (record_key integer primary key, call_day integer not null)")
+        self._connection.execute("create index if not exists idx_seen_records_call_day on seen_records(call_day)")
+        self._connection.execute(
+            "create temp table if not exists pending_records (record_key integer primary key, call_day integer not null)")
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("select count(*) from seen_records").fetchone()[0]
+
+    @property
+    def pending_count(self) -> int:
+        """Число ключей, ожидающих commit."""
+        return self._connection.execute("select count(*) from pending_records").fetchone()[0]
+
+    def _existing(self, keys: np.ndarray) -> set:
+        """Возвращает ключи, которые уже есть в хранилище или ожидают commit."""
+        found = set()
+        for start in range(0, len(keys), _QUERY_BATCH):
+            batch = keys[start:start + _QUERY_BATCH].tolist()
+            placeholders = ','.join('?' * len(batch))
+            cursor = self._connection.execute(
+                f"select record_key from seen_records where record_key in ({placeholders}) "
+                f"union all select record_key from pending_records where record_key in ({placeholders})",
+                batch + batch)
+            found.update(row[0] for row in cursor)
+        return found
+
+    def check_and_add(self, keys: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """
+        Отмечает дубликаты и добавляет новые ключи в ожидающие commit.
+
+        Args:
+            keys: Ключи записей пачки
+            days: Номер дня каждой записи (UNKNOWN_DAY — дата не распознана)
+
+        Returns:
+            Булев массив: True — запись уже встречалась (в хранилище, в ожидающих
+            ключах или раньше в этой пачке)
+        """
+        duplicated = pd.Series(keys).duplicated().to_numpy(copy=True)
+        first = ~duplicated
+
+        existing = self._existing(np.unique(keys[first]))
+        if existing:
+            duplicated |= np.isin(keys, np.fromiter(existing, dtype=np.int64, count=len(existing))) & first
+
+        new = ~duplicated
+        with self._connection:
+            self._connection.executemany(
+                "insert or ignore into pending_records (record_key, call_day) values (?, ?)",
+                zip(keys[new].tolist(), days[new].tolist()))
+        return duplicated
+
+    def commit(self) -> int:
+        """
+        Переносит ожидающие ключи в хранилище (вызывается после записи результата).
+
+        Ключам с нераспознанной датой присваивается самый поздний известный день,
+        окно хранения отсчитывается только от распознанных дат.
+
+        Returns:
+            Количество перенесенных ключей
+        """
+        latest_day = self._connection.execute(
+            "select max(call_day) from pending_records where call_day <> ?", (UNKNOWN_DAY,)).fetchone()[0]
+        if self._latest_day is not None:
+            latest_day = max(latest_day if latest_day is not None else self._latest_day, self._latest_day)
+
+        with self._connection:
+            if latest_day is not None:
+                self._connection.execute("update pending_records set call_day = ? where call_day = ?",
+                                         (latest_day, UNKNOWN_DAY))
+            committed = self._connection.execute(
+                "insert or ignore into seen_records (record_key, call_day) "
+                "select record_key, call_day from pending_records").rowcount
+            self._connection.execute("delete from pending_records")
+
+        if latest_day is not None:
+            self._prune(latest_day)
+        return committed
+
+    def rollback(self) -> int:
+        """
+        Отбрасывает ожидающие ключи (результат не был записан).
+
+        Returns:
+            Количество отброшенных ключей
+        """
+        with self._connection:
+            return self._connection.execute("delete from pending_records").rowcount
+
+    def _prune(self, latest_day: int):
+        """Удаляет ключи старше окна относительно самой поздней распознанной даты."""
+        if self._latest_day is not None and latest_day <= self._latest_day:
+            return
+        self._latest_day = latest_day
+        with self._connection:
+            self._connection.execute("delete from seen_records where call_day < ?",
+                                     (latest_day - self.window_days,))
@@ -203,6 +203,35 @@ def example_performance_comparison():
     print(f"Обработано записей: {len(processed_df)}")
 
 
+def example_startup_time():
+    """Пример сравнения времени запуска CLI с разными обработчиками."""
+    print("\n=== Время запуска run_processor.py ===")
+
+    import subprocess
+    import sys
+    import tempfile
+    import time
+
+    input_file = "/home/nik/test_a1/Files/usage_data.log"
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_processor.py")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for engine in ['stream', 'pandas']:
+            start_time = time.time()
+            subprocess.run(
+                [sys.executable, script, input_file, output_dir, '--engine', engine],
+                stdout=subprocess.DEVNULL, check=False
+            )
+            print(f"Обработчик {engine}: {time.time() - start_time:.3f} секунд (импорт + обработка)")
+
+        # Чистое время старта интерпретатора с импортами каждого обработчика
+        for module in ['stream_processor', 'csv_data_processor']:
+            start_time = time.time()
+            subprocess.run([sys.executable, '-c', f'import {module}'],
+                           cwd=os.path.dirname(script), check=False)
+            print(f"Импорт {module}: {time.time() - start_time:.3f} секунд")
+
+
 if __name__ == "__main__":
     # Запускаем примеры
     example_basic_usage()
@@ -211,3 +240,4 @@ if __name__ == "__main__":
     example_call_type_detection()
     example_dataframe_operations()
     example_performance_comparison()
+    example_startup_time()
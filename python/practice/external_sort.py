@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Внешняя сортировка обработанных данных при ограниченной памяти.
+
+Пачки трансформированных строк накапливаются до run_rows строк, сортируются
+в памяти и сбрасываются на диск отсортированными сериями (runs). Затем серии
+сливаются k-way слиянием (heapq.merge), которое держит в памяти по одной
+строке из каждой серии. Если серий больше fan_in, слияние идет в несколько проходов.
+"""
+
+import csv
+import heapq
+import os
+import shutil
+import tempfile
+import pandas as pd
+from operator import itemgetter
+from typing import Iterable, List, Optional, Sequence
+
+
+DEFAULT_SORT_KEY = ('party_msisdn', 'call_date')
+
+
+def _write_run(frames: List[pd.DataFrame], key_columns: Sequence[str], run_dir: str, number: int) -> str:
+    """Сортирует накопленные пачки и записывает их в файл серии."""
+    run = pd.concat(frames, ignore_index=True).sort_values(list(key_columns), kind='stable')
+    path = os.path.join(run_dir, f"run-{number:05d}.csv")
+    run.to_csv(path, index=False, sep=';', encoding='utf-8')
+    return path
+
+
+def write_sorted_runs(chunks: Iterable[pd.DataFrame], run_dir: str,
+                      key_columns: Sequence[str] = DEFAULT_SORT_KEY, run_rows: int = 500_000) -> List[str]:
+    """
+    Сбрасывает поток пачек на диск отсортированными сериями.
+
+    Args:
+        chunks: Итератор DataFrame с одинаковым набором колонок
+        run_dir: Директория для файлов серий
+        key_columns: Колонки ключа сортировки
+        run_rows: Максимальное число строк в одной серии (ограничивает память)
+
+    Returns:
+        Список путей к файлам серий в порядке поступления данных
+    """
+    runs = []
+    pending: List[pd.DataFrame] = []
+    pending_rows = 0
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        pending.append(chunk)
+        pending_rows += len(chunk)
+        if pending_rows >= run_rows:
+            runs.append(_write_run(pending, key_columns, run_dir, len(runs)))
+            pending, pending_rows = [], 0
+
+    if pending:
+        runs.append(_write_run(pending, key_columns, run_dir, len(runs)))
+    return runs
+
+
+def merge_runs(run_paths: List[str], output_path: str, key_columns: Sequence[str] = DEFAULT_SORT_KEY,
+               columns: Optional[Sequence[str]] = None) -> int:
+    """
+    Сливает отсортированные серии в один файл.
+
+    Слияние устойчивое: при равных ключах строки идут в порядке серий,
+    то есть в исходном порядке входных данных.
+
+    Args:
+        run_paths: Пути к файлам серий (CSV с разделителем ';' и заголовком)
+        output_path: Путь к результирующему файлу
+        key_columns: Колонки ключа сортировки
+        columns: Колонки результата (None — все колонки серий); ключ сортировки
+            может в них не входить
+
+    Returns:
+        Количество записанных строк
+    """
+    files = [open(path, 'r', encoding='utf-8', newline='') for path in run_paths]
+    try:
+        readers = [csv.reader(file, delimiter=';') for file in files]
+        headers = [next(reader) for reader in readers]
+        header = headers[0]
+        key = itemgetter(*[header.index(column) for column in key_columns])
+        positions = None if columns is None else [header.index(column) for column in columns if column in header]
+
+        rows = 0
+        with open(output_path, 'w', encoding='utf-8', newline='') as target:
+            writer = csv.writer(target, delimiter=';', lineterminator='\n')
+            if positions is None:
+                writer.writerow(header)
+                for row in heapq.merge(*readers, key=key):
+                    writer.writerow(row)
+                    rows += 1
+            else:
+                writer.writerow([header[position] for position in positions])
+                for row in heapq.merge(*readers, key=key):
+                    writer.writerow([row[position] for position in positions])
+                    rows += 1
+        return rows
+    finally:
+        for file in files:
+            file.close()
+
+
+def external_sort(chunks: Iterable[pd.DataFrame], output_path: str,
+                  key_columns: Sequence[str] = DEFAULT_SORT_KEY, run_rows: int = 500_000,
+                  fan_in: int = 64, tmp_dir: Optional[str] = None,
+                  columns: Optional[Sequence[str]] = None) -> int:
+    """
+    Сортирует поток пачек по ключу и записывает результат в CSV.
+
+    Результат сначала пишется во временный файл рядом с output_path и
+    переименовывается после успешного слияния.
+
+    Args:
+        chunks: Итератор трансформированных DataFrame
+        output_path: Путь к результирующему файлу
+        key_columns: Колонки ключа сортировки
+        run_rows: Максимальное число строк, сортируемых в памяти за раз
+        fan_in: Максимальное число серий, сливаемых за один проход
+        tmp_dir: Директория для временных серий (по умолчанию рядом с output_path)
+        columns: Колонки результата (None — все); отбираются при последнем слиянии
+
+    Returns:
+        Количество строк в результате
+    """
+    run_dir = tempfile.mkdtemp(prefix='.sort-runs-', dir=tmp_dir or os.path.dirname(os.path.abspath(output_path)))
+    try:
+        runs = write_sorted_runs(chunks, run_dir, key_columns, run_rows)
+        if not runs:
+            return 0
+
+        # Многопроходное слияние, чтобы не открывать слишком много файлов одновременно
+        generation = 0
+        while len(runs) > fan_in:
+            merged = []
+            for start in range(0, len(runs), fan_in):
+                path = os.path.join(run_dir, f"merge-{generation:03d}-{start // fan_in:05d}.csv")
+                merge_runs(runs[start:start + fan_in], path, key_columns)
+                merged.append(path)
+            for path in runs:
+                os.remove(path)
+            runs = merged
+            generation += 1
+
+        tmp_output = os.path.join(run_dir, 'result.csv')
+        rows = merge_runs(runs, tmp_output, key_columns, columns)
+        os.replace(tmp_output, output_path)
+        return rows
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Быстрый просмотр и профиль больших логов по выборке строк.
+
+Файл не читается целиком:
+    * небольшие файлы (до reservoir_max_bytes) проходятся один раз с резервуарной
+      выборкой — каждая строка попадает в выборку с равной вероятностью;
+    * в больших файлах берутся случайные смещения в байтах; для каждого смещения
+      читается окно вокруг него и выделяется строка, в которую оно попало.
+      Длинные строки попадают под смещение чаще, поэтому строка принимается
+      с вероятностью min_length / length (выборка с отклонением), и выборка
+      остается равномерной по строкам.
+
+По выборке считаются заполненность полей, доли типов вызовов (с погрешностью 95%)
+и шаблоны номеров partyMSISDN (префиксы вида "1.1.", код 375 / 80).
+Используется только стандартная библиотека, как в stream_processor.
+"""
+
+import argparse
+import csv
+import math
+import os
+import random
+import sys
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from stream_processor import _PREFIX_RE, determine_call_type
+
+
+DEFAULT_SAMPLE_SIZE = 5000
+# Файлы до этого размера проходятся целиком резервуарной выборкой
+RESERVOIR_MAX_BYTES = 64 * 1024 * 1024
+# Половина окна чтения вокруг случайного смещения; более длинные строки пропускаются
+SEEK_WINDOW_BYTES = 4096
+# Сколько байт с начала данных читается для оценки минимальной длины строки
+_PILOT_BYTES = 256 * 1024
+_MAX_ATTEMPTS_FACTOR = 20
+# Квантиль нормального распределения для погрешности долей
+_Z_95 = 1.96
+
+
+def msisdn_pattern(value: str) -> str:
+    """
+    Шаблон исходного номера абонента.
+
+    Args:
+        value: Значение partyMSISDN
+
+    Returns:
+        Префикс вида "1.1." (если есть) и начало номера: "375", "80" или "other";
+        "empty" для пустого значения
+    """
+    value = value.strip()
+    if not value:
+        return 'empty'
+
+    prefix = ''
+    match = _PREFIX_RE.match(value)
+    if match:
+        prefix = match.group(0)
+        value = value[match.end():]
+
+    if value.startswith('375'):
+        return prefix + '375'
+    if value.startswith('80'):
+        return prefix + '80'
+    return prefix + 'other'
+
+
+class LogProfiler:
+    """
+    Выборка строк и профиль полей лога соединений.
+
+    Constructor args:
+        sample_size: размер выборки
+        seed: зерно генератора случайных чисел (для воспроизводимой выборки)
+        reservoir_max_bytes: файлы не больше этого размера проходятся целиком
+        window_bytes: половина окна чтения вокруг случайного смещения
+        encoding: кодировка файла
+    """
+
+    def __init__(self, sample_size: int = DEFAULT_SAMPLE_SIZE, seed: Optional[int] = None,
+                 reservoir_max_bytes: int = RESERVOIR_MAX_BYTES, window_bytes: int = SEEK_WINDOW_BYTES,
+                 encoding: str = 'utf-8'):
+        self.sample_size = sample_size
+        self.reservoir_max_bytes = reservoir_max_bytes
+        self.window_bytes = window_bytes
+        self.encoding = encoding
+        self.error_count = 0
+        self._random = random.Random(seed)
+
+    def _read_header(self, file) -> Tuple[List[str], str, int]:
+        """Читает заголовок: (колонки, разделитель, смещение начала данных)."""
+        first_line = file.readline().decode(self.encoding)
+        delimiter = ';' if ';' in first_line else ','
+        header = next(csv.reader([first_line.rstrip('\r\n')], delimiter=delimiter), [])
+        return header, delimiter, file.tell()
+
+    def _reservoir(self, file) -> Tuple[List[bytes], int]:
+        """Резервуарная выборка строк за один проход: (строки, число строк в файле)."""
+        sample: List[bytes] = []
+        total = 0
+        for line in file:
+            if not line.strip():
+                continue
+            total += 1
+            if len(sample) < self.sample_size:
+                sample.append(line)
+            else:
+                position = self._random.randrange(total)
+                if position < self.sample_size:
+                    sample[position] = line
+        return sample, total
+
+    def _line_at(self, file, offset: int, data_start: int, size: int) -> Optional[Tuple[int, bytes]]:
+        """
+        Находит строку, в которую попало смещение.
+
+        Returns:
+            (начало строки, строка без перевода строки) или None, если строка не уместилась в окно
+        """
+        block_start = max(data_start, offset - self.window_bytes)
+        file.seek(block_start)
+        block = file.read(offset + self.window_bytes - block_start)
+        relative = offset - block_start
+
+        line_start = block.rfind(b'\n', 0, relative) + 1
+        if line_start == 0 and block_start != data_start:
+            return None
+        line_end = block.find(b'\n', relative)
+        if line_end == -1:
+            if block_start + len(block) < size:
+                return None
+            line_end = len(block)
+        return block_start + line_start, block[line_start:line_end]
+
+    def _min_line_length(self, file, data_start: int) -> int:
+        """Минимальная длина строки (с переводом строки) в начале данных."""
+        file.seek(data_start)
+        lines = file.read(_PILOT_BYTES).split(b'\n')[:-1]
+        lengths = [len(line) + 1 for line in lines if line.strip()]
+        return min(lengths) if lengths else 1
+
+    def _seek_sample(self, file, data_start: int, size: int) -> List[bytes]:
+        """Равномерная выборка строк случайными смещениями с отклонением по длине строки."""
+        min_length = self._min_line_length(file, data_start)
+        sample: List[bytes] = []
+        seen = set()
+
+        for _ in range(self.sample_size * _MAX_ATTEMPTS_FACTOR):
+            if len(sample) >= self.sample_size:
+                break
+            offset = self._random.randrange(data_start, size)
+            found = self._line_at(file, offset, data_start, size)
+            if found is None:
+                self.error_count += 1
+                continue
+
+            line_start, line = found
+            length = len(line) + 1
+            if line_start in seen or not line.strip():
+                continue
+            # Строка попадает под смещение с вероятностью, пропорциональной длине
+            if self._random.random() * length > min_length:
+                continue
+            seen.add(line_start)
+            sample.append(line)
+
+        return sample
+
+    def sample(self, file_path: str) -> Dict[str, Any]:
+        """
+        Берет выборку записей из файла.
+
+        Args:
+            file_path: Путь к логу
+
+        Returns:
+            Словарь: header, records (list[dict]), method ('reservoir' | 'seek'),
+            estimated_rows, malformed (строки с неверным числом полей)
+        """
+        size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as file:
+            header, delimiter, data_start = self._read_header(file)
+            if size <= self.reservoir_max_bytes:
+                method = 'reservoir'
+                lines, estimated_rows = self._reservoir(file)
+            else:
+                method = 'seek'
+                lines = self._seek_sample(file, data_start, size)
+                estimated_rows = 0
+                if lines:
+                    mean_length = sum(len(line.rstrip(b'\r\n')) + 1 for line in lines) / len(lines)
+                    estimated_rows = int((size - data_start) / mean_length)
+
+        records, malformed = [], 0
+        for line in lines:
+            values = next(csv.reader([line.decode(self.encoding, errors='replace').rstrip('\r\n')],
+                                     delimiter=delimiter), [])
+            if len(values) != len(header):
+                malformed += 1
+                continue
+            records.append(dict(zip(header, values)))
+
+        return {'header': header, 'records': records, 'method': method,
+                'estimated_rows': estimated_rows, 'malformed': malformed}
+
+    def profile(self, file_path: str, preview_rows: int = 10) -> Dict[str, Any]:
+        """
+        Строит профиль полей лога по выборке.
+
+        Args:
+            file_path: Путь к логу
+            preview_rows: Сколько записей выборки вернуть для просмотра
+
+        Returns:
+            Словарь с размером выборки, оценкой числа строк, заполненностью полей,
+            долями типов вызовов и шаблонами partyMSISDN
+        """
+        sample = self.sample(file_path)
+        records = sample['records']
+        count = len(records)
+
+        fill_rates = {
+            column: round(sum(1 for record in records if record[column].strip()) / count, 4) if count else 0.0
+            for column in sample['header']
+        }
+
+        call_types = Counter(str(determine_call_type(record)) for record in records)
+        call_type_shares = {}
+        for call_type, hits in sorted(call_types.items()):
+            share = hits / count
+            call_type_shares[call_type] = {
+                'count': hits,
+                'share': round(share, 4),
+                'margin': round(_Z_95 * math.sqrt(share * (1 - share) / count), 4)
+            }
+
+        patterns = Counter(msisdn_pattern(record.get('partyMSISDN', '')) for record in records)
+
+        return {
+            'file': file_path,
+            'method': sample['method'],
+            'sample_rows': count,
+            'malformed_rows': sample['malformed'],
+            'estimated_rows': sample['estimated_rows'],
+            'fill_rates': fill_rates,
+            'call_types': call_type_shares,
+            'msisdn_patterns': {pattern: round(hits / count, 4) for pattern, hits in patterns.most_common()},
+            'preview': records[:preview_rows]
+        }
+
+
+def print_profile(profile: Dict[str, Any]):
+    """Выводит профиль в читаемом виде."""
+    print(f"Файл: {profile['file']}")
+    print(f"Выборка: {profile['sample_rows']} строк ({profile['method']}), "
+          f"некорректных строк: {profile['malformed_rows']}, оценка числа строк: {profile['estimated_rows']}")
+
+    print("\nЗаполненность полей:")
+    for column, rate in profile['fill_rates'].items():
+        print(f"- {column}: {rate:.1%}")
+
+    print("\nТипы вызовов:")
+    for call_type, share in profile['call_types'].items():
+        print(f"- {call_type}: {share['share']:.1%} ± {share['margin']:.1%} ({share['count']})")
+
+    print("\nШаблоны partyMSISDN:")
+    for pattern, share in profile['msisdn_patterns'].items():
+        print(f"- {pattern}: {share:.1%}")
+
+    if profile['preview']:
+        print("\nПример записей:")
+        for record in profile['preview']:
+            print(';'.join(record.values()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Просмотр и профиль лога соединений по выборке")
+    parser.add_argument('input_file', nargs='?', default="/home/nik/test_a1/Files/usage_data.log")
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE)
+    parser.add_argument('--preview-rows', type=int, default=10)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input_file):
+        print(f"Ошибка: файл {args.input_file} не найден")
+        return 1
+
+    profiler = LogProfiler(sample_size=args.sample_size, seed=args.seed)
+    print_profile(profiler.profile(args.input_file, args.preview_rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Подбор размера пачки чтения под бюджет памяти.
+
+Перед каждой пачкой MemoryGovernor смотрит на текущий RSS процесса
+(/proc/self/statm) и на измеренный размер строки разобранных пачек
+(DataFrame.memory_usage(deep=True)) и выбирает, сколько строк читать:
+    * при давлении (RSS выше PRESSURE_RATIO бюджета) размер пачки уменьшается вдвое;
+    * иначе размер рассчитывается по свободной части бюджета, но растет
+      не более чем вдвое за шаг.
+
+Бюджет ограничивает только пачки чтения. Если результат всех пачек собирается
+в памяти (CSVDataProcessor.process_data), пик RSS может превысить бюджет;
+это отмечается в report() полями result_in_memory и budget_exceeded.
+"""
+
+import os
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+
+MB = 1024 * 1024
+
+# Во время трансформации одновременно живут исходная пачка, результат и промежуточные Series
+WORKING_SET_FACTOR = 4
+# Доля свободного бюджета, которую может занять одна пачка
+HEADROOM_SHARE = 0.5
+PRESSURE_RATIO = 0.9
+
+
+def current_rss() -> int:
+    """Текущий RSS процесса в байтах (0, если /proc недоступен)."""
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            resident_pages = int(file.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class MemoryGovernor:
+    """
+    Адаптивный размер пачки под бюджет памяти.
+
+    Constructor args:
+        budget_bytes: бюджет памяти процесса в байтах
+        initial_rows: размер первой пачки
+        min_rows: минимальный размер пачки
+        max_rows: максимальный размер пачки
+    """
+
+    def __init__(self, budget_bytes: int, initial_rows: int = 50_000, min_rows: int = 1_000,
+                 max_rows: int = 2_000_000):
+        self.budget_bytes = budget_bytes
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.bytes_per_row: Optional[float] = None
+        self.batch_sizes: List[int] = []
+        self.pressure_events = 0
+        self.peak_rss = current_rss()
+        # Результат пачек собирается в памяти: бюджет не ограничивает пик RSS
+        self.result_in_memory = False
+        self._next_rows = max(min_rows, min(initial_rows, max_rows))
+
+    def _sample_rss(self) -> int:
+        rss = current_rss()
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def next_batch_rows(self) -> int:
+        """Выбирает размер следующей пачки."""
+        rss = self._sample_rss()
+        rows = self._next_rows
+
+        if rss and rss >= self.budget_bytes * PRESSURE_RATIO:
+            self.pressure_events += 1
+            rows = max(self.min_rows, rows // 2)
+        elif self.bytes_per_row:
+            headroom = max(self.budget_bytes - rss, 0) * HEADROOM_SHARE
+            fitting = int(headroom / (self.bytes_per_row * WORKING_SET_FACTOR))
+            rows = max(self.min_rows, min(fitting, rows * 2, self.max_rows))
+
+        self._next_rows = rows
+        return rows
+
+    def observe(self, df: pd.DataFrame):
+        """
+        Учитывает размер разобранной пачки.
+
+        Args:
+            df: Пачка, прочитанная из файла
+        """
+        self._sample_rss()
+        if len(df) == 0:
+            return
+        self.batch_sizes.append(self._next_rows)
+        measured = df.memory_usage(index=False, deep=True).sum() / len(df)
+        # Скользящее среднее сглаживает пачки с разной "грязностью" строк
+        self.bytes_per_row = measured if self.bytes_per_row is None else 0.5 * self.bytes_per_row + 0.5 * measured
+
+    def report(self) -> Dict[str, Any]:
+        """Статистика подбора пачек для вывода в итогах обработки."""
+        self._sample_rss()
+        return {
+            'budget_mb': round(self.budget_bytes / MB, 1),
+            'peak_rss_mb': round(self.peak_rss / MB, 1),
+            'batches': len(self.batch_sizes),
+            'min_batch_rows': min(self.batch_sizes, default=0),
+            'max_batch_rows': max(self.batch_sizes, default=0),
+            'bytes_per_row': round(float(self.bytes_per_row or 0), 1),
+            'pressure_events': self.pressure_events,
+            'result_in_memory': self.result_in_memory,
+            'budget_exceeded': self.peak_rss > self.budget_bytes
+        }
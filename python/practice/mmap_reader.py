@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Чтение логов соединений через memory-mapping без промежуточных строк Python.
+
+Лог — это ASCII-текст с разделителем ';' и фиксированным порядком колонок,
+поэтому границы строк и полей можно найти разом по байтовому буферу с помощью
+NumPy, а числовые поля (callDuration, totalVolume, totalQuantity) разобрать
+в целые числа прямо из буфера.
+
+Строковый DataFrame собирается одним декодированием и одним str.split по всему
+блоку строк: число полей каждой строки уже проверено по смещениям, поэтому
+i-я колонка — это каждое n-е поле списка. Поштучное декодирование полей нужно,
+только если строки идут в буфере не подряд (пропущены некорректные строки
+или выбрана часть строк).
+"""
+
+import mmap
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+
+_NEWLINE = ord('\n')
+_CARRIAGE_RETURN = ord('\r')
+_QUOTE = ord('"')
+_ZERO = ord('0')
+
+
+class UsageColumns:
+    """
+    Результат разбора файла: буфер и смещения полей каждой строки.
+
+    Attributes:
+        columns: Имена колонок из заголовка файла
+        starts: Массив (n_rows, n_cols) со смещениями начала полей в буфере
+        ends: Массив (n_rows, n_cols) со смещениями конца полей (не включительно)
+        malformed_lines: Количество строк с неверным числом полей (пропущены)
+        delimiter: Разделитель колонок
+    """
+
+    def __init__(self, mm: Optional[mmap.mmap], buffer: np.ndarray, columns: List[str],
+                 starts: np.ndarray, ends: np.ndarray, malformed_lines: int = 0,
+                 encoding: str = 'utf-8', delimiter: str = ';'):
+        self._mmap = mm
+        self.buffer = buffer
+        self.columns = columns
+        self.starts = starts
+        self.ends = ends
+        self.malformed_lines = malformed_lines
+        self.encoding = encoding
+        self.delimiter = delimiter
+
+    def __len__(self) -> int:
+        return self.starts.shape[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Освобождает отображение файла в память."""
+        self.buffer = np.empty(0, dtype=np.uint8)
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def select_rows(self, mask: np.ndarray) -> 'UsageColumns':
+        """
+        Возвращает выборку строк без копирования буфера.
+
+        Выборка использует отображение исходного объекта и действительна до его закрытия.
+
+        Args:
+            mask: Булев массив длины len(self)
+
+        Returns:
+            UsageColumns с отобранными строками
+        """
+        return UsageColumns(None, self.buffer, self.columns, self.starts[mask], self.ends[mask],
+                            0, self.encoding, self.delimiter)
+
+    def _field_bytes(self, name: str):
+        """Возвращает матрицу байтов поля (n_rows, max_width) и длины значений."""
+        col = self.columns.index(name)
+        starts = self.starts[:, col]
+        widths = self.ends[:, col] - starts
+        max_width = int(widths.max()) if len(widths) else 0
+        if max_width == 0:
+            return np.zeros((len(starts), 0), dtype=np.uint8), widths
+
+        positions = np.arange(max_width)
+        valid = positions < widths[:, None]
+        index = np.where(valid, starts[:, None] + positions, 0)
+        matrix = np.where(valid, self.buffer[index], 0).astype(np.uint8)
+        return matrix, widths
+
+    def bytes_column(self, name: str) -> np.ndarray:
+        """
+        Возвращает колонку как массив байтовых строк фиксированной ширины.
+
+        Args:
+            name: Имя колонки
+
+        Returns:
+            np.ndarray с dtype 'S<ширина>'
+        """
+        matrix, _ = self._field_bytes(name)
+        width = max(matrix.shape[1], 1)
+        if matrix.shape[1] == 0:
+            matrix = np.zeros((matrix.shape[0], 1), dtype=np.uint8)
+        return np.ascontiguousarray(matrix).view(f'S{width}').reshape(-1)
+
+    def str_column(self, name: str) -> np.ndarray:
+        """
+        Возвращает колонку как массив строк, декодированных одним вызовом.
+
+        Args:
+            name: Имя колонки
+
+        Returns:
+            np.ndarray строк (пустая строка для незаполненных полей)
+        """
+        raw = self.bytes_column(name)
+        if raw.size == 0 or np.frombuffer(raw.tobytes(), dtype=np.uint8).max() < 0x80:
+            return raw.astype(str)
+        return np.char.decode(raw, self.encoding)
+
+    def int_column(self, name: str, missing: int = -1) -> np.ndarray:
+        """
+        Разбирает числовую колонку в int64 прямо из буфера.
+
+        Args:
+            name: Имя колонки
+            missing: Значение для пустых и нечисловых полей
+
+        Returns:
+            np.ndarray int64
+        """
+        matrix, widths = self._field_bytes(name)
+        if matrix.shape[1] == 0:
+            return np.full(len(widths), missing, dtype=np.int64)
+
+        positions = np.arange(matrix.shape[1])
+        valid = positions < widths[:, None]
+        digits = matrix.astype(np.int64) - _ZERO
+        is_digit = (digits >= 0) & (digits <= 9)
+
+        # Степень десяти для каждой позиции зависит от длины значения
+        powers = np.where(valid, widths[:, None] - 1 - positions, 0)
+        values = np.where(valid, digits * (10 ** powers), 0).sum(axis=1)
+
+        ok = (widths > 0) & np.all(is_digit | ~valid, axis=1)
+        return np.where(ok, values, missing)
+
+    def _split_fields(self) -> Optional[List[str]]:
+        """
+        Разбирает все поля строк одним str.split, если строки идут в буфере подряд.
+
+        Returns:
+            Список полей всех строк подряд или None, если между строками есть пропуски
+        """
+        if len(self) == 0:
+            return None
+        line_starts = self.starts[:, 0]
+        line_ends = self.ends[:, -1]
+        gaps = line_starts[1:] - line_ends[:-1]
+        has_cr = gaps == 2
+        has_cr[has_cr] = self.buffer[line_ends[:-1][has_cr]] == _CARRIAGE_RETURN
+        # Между соседними строками только перевод строки (\n или \r\n)
+        if not np.all((gaps == 1) | has_cr):
+            return None
+
+        text = self.buffer[line_starts[0]:line_ends[-1]].tobytes().decode(self.encoding)
+        if has_cr.any():
+            text = text.replace('\r\n', '\n')
+        fields = text.replace('\n', self.delimiter).split(self.delimiter)
+        return fields if len(fields) == len(self) * len(self.columns) else None
+
+    def to_dataframe(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Собирает строковый DataFrame, совместимый с read_csv(dtype=str).
+
+        Args:
+            columns: Колонки результата (None — все)
+        """
+        columns = self.columns if columns is None else columns
+        fields = self._split_fields()
+        if fields is None:
+            data = {name: self.str_column(name) for name in columns}
+        else:
+            # Матрица ссылок на поля: колонка — срез без копирования строк
+            matrix = np.array(fields, dtype=object).reshape(len(self), len(self.columns))
+            data = {name: matrix[:, self.columns.index(name)] for name in columns}
+        return pd.DataFrame(data, columns=columns, dtype=str)
+
+
+def read_usage_columns(file_path: str, delimiter: Optional[str] = None,
+                       encoding: str = 'utf-8') -> UsageColumns:
+    """
+    Отображает файл в память и находит границы строк и полей.
+
+    Args:
+        file_path: Путь к файлу лога
+        delimiter: Разделитель колонок (если None — определяется по заголовку)
+        encoding: Кодировка текстовых полей
+
+    Returns:
+        UsageColumns со смещениями полей
+
+    Raises:
+        ValueError: если файл пустой или содержит кавычки (нужен полноценный CSV-парсер)
+    """
+    with open(file_path, 'rb') as file:
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        buffer = np.frombuffer(mm, dtype=np.uint8)
+
+        if mm.find(b'"') != -1:
+            raise ValueError("файл содержит кавычки, используйте обычный CSV-парсер")
+
+        newlines = np.flatnonzero(buffer == _NEWLINE)
+        line_ends = newlines
+        if buffer[-1] != _NEWLINE:
+            line_ends = np.append(line_ends, len(buffer))
+        line_starts = np.concatenate(([0], newlines + 1))[:len(line_ends)]
+
+        # Отбрасываем \r в конце строк
+        has_cr = line_ends > line_starts
+        has_cr[has_cr] = buffer[line_ends[has_cr] - 1] == _CARRIAGE_RETURN
+        line_ends = line_ends - has_cr
+
+        header = bytes(buffer[line_starts[0]:line_ends[0]]).decode(encoding)
+        if delimiter is None:
+            delimiter = ';' if ';' in header else ','
+        columns = header.split(delimiter)
+        if len(columns) < 2:
+            raise ValueError("в заголовке не найден разделитель колонок")
+
+        line_starts = line_starts[1:]
+        line_ends = line_ends[1:]
+        non_blank = line_ends > line_starts
+        line_starts = line_starts[non_blank]
+        line_ends = line_ends[non_blank]
+
+        data_start = line_starts[0] if len(line_starts) else len(buffer)
+        delims = np.flatnonzero(buffer == ord(delimiter))
+        delims = delims[np.searchsorted(delims, data_start):]
+
+        # Разделители отсортированы, поэтому число полей строки — разность позиций
+        # ее начала и конца среди разделителей (поиск по строкам, а не по разделителям)
+        per_line = np.searchsorted(delims, line_ends) - np.searchsorted(delims, line_starts)
+        good = per_line == len(columns) - 1
+        malformed = int((~good).sum())
+
+        inner = delims[np.repeat(good, per_line)] if malformed else delims
+        inner = inner.reshape(-1, len(columns) - 1)
+        starts = np.hstack((line_starts[good][:, None], inner + 1))
+        ends = np.hstack((inner, line_ends[good][:, None]))
+
+        return UsageColumns(mm, buffer, columns, starts, ends, malformed, encoding, delimiter)
+
+    except Exception:
+        buffer = None
+        mm.close()
+        raise
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кеш разобранных входных файлов в колоночном формате.
+
+После первого чтения колонки файла сохраняются в каталог записи кеша
+(файлы .npy и meta.json с именами и типами колонок). Тип колонки выбирается
+по числу различных значений:
+    * dict  — коды int32 и словарь значений; загрузка — выборка из словаря по кодам
+              без создания новых строк (типы вызовов, смещения, длительности);
+    * text  — значения в UTF-8 через разделитель \\x00, загрузка — один split.
+Повторное чтение того же файла загружает колонки через np.load(mmap_mode='r')
+без разбора CSV.
+
+Ключ записи — путь, размер, mtime, хеш начала и конца файла и параметры чтения
+(набор колонок схемы, разделитель). Общий размер кеша ограничен max_bytes:
+при превышении удаляются записи, к которым дольше всего не обращались
+(время обращения — mtime файла meta.json).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Сколько байт с начала и с конца файла входит в хеш содержимого
+_HASH_SAMPLE_BYTES = 1024 * 1024
+_META_FILE = 'meta.json'
+_SEPARATOR = '\x00'
+
+# Колонка хранится словарем, если различных значений не больше этой доли строк
+_DICT_MAX_RATIO = 0.25
+
+
+def _encode_text(values) -> np.ndarray:
+    """Упаковывает строки в массив байтов UTF-8 с разделителем."""
+    text = _SEPARATOR.join(values)
+    if text.count(_SEPARATOR) != max(len(values) - 1, 0):
+        raise ValueError("значения содержат символ-разделитель \\x00")
+    return np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+
+
+def _decode_text(blob: np.ndarray, count: int) -> np.ndarray:
+    """Распаковывает строки, сохраненные _encode_text."""
+    if count == 0:
+        return np.empty(0, dtype=object)
+    return np.array(blob.tobytes().decode('utf-8').split(_SEPARATOR), dtype=object)
+
+
+def file_fingerprint(file_path: str) -> str:
+    """
+    Вычисляет хеш файла по размеру, mtime и содержимому начала и конца файла.
+
+    Args:
+        file_path: Путь к файлу
+
+    Returns:
+        Шестнадцатеричная строка хеша
+    """
+    stat = os.stat(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8'))
+    with open(file_path, 'rb') as file:
+        digest.update(file.read(_HASH_SAMPLE_BYTES))
+        if stat.st_size > 2 * _HASH_SAMPLE_BYTES:
+            file.seek(-_HASH_SAMPLE_BYTES, os.SEEK_END)
+            digest.update(file.read(_HASH_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Каталог с разобранными колонками входных файлов.
+
+    Constructor args:
+        directory: каталог кеша
+        max_bytes: предельный общий размер записей кеша
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_key(self, file_path: str, read_options: str = '') -> str:
+        """Ключ записи для файла и параметров чтения."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(file_fingerprint(file_path).encode('ascii'))
+        digest.update(read_options.encode('utf-8'))
+        return digest.hexdigest()
+
+    def load(self, file_path: str, read_options: str = '') -> Optional[pd.DataFrame]:
+        """
+        Загружает колонки файла из кеша.
+
+        Args:
+            file_path: Путь к входному файлу
+            read_options: Строка с параметрами чтения, входящая в ключ
+
+        Returns:
+            Строковый DataFrame или None, если записи нет
+        """
+        entry = os.path.join(self.directory, self.entry_key(file_path, read_options))
+        meta_path = os.path.join(entry, _META_FILE)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            data = {}
+            for position, (name, kind) in enumerate(zip(meta['columns'], meta['kinds'])):
+                base = os.path.join(entry, f"{position:04d}")
+                if kind == 'dict':
+                    codes = np.load(f"{base}.codes.npy", mmap_mode='r')
+                    uniques = _decode_text(np.load(f"{base}.values.npy", mmap_mode='r'), meta['uniques'][position])
+                    data[name] = uniques[codes]
+                else:
+                    data[name] = _decode_text(np.load(f"{base}.npy", mmap_mode='r'), meta['rows'])
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        # Время обращения для вытеснения давно неиспользуемых записей
+        os.utime(meta_path)
+        self.hits += 1
+        return pd.DataFrame(data, columns=meta['columns'], dtype=str)
+
+    def store(self, file_path: str, df: pd.DataFrame, read_options: str = '') -> str:
+        """
+        Сохраняет колонки файла в кеш и вытесняет старые записи.
+
+        Args:
+            file_path: Путь к входному файлу
+            df: Строковый DataFrame, прочитанный из файла
+            read_options: Строка с параметрами чтения, входящая в ключ
+
+        Returns:
+            Путь к каталогу записи
+        """
+        key = self.entry_key(file_path, read_options)
+        entry = os.path.join(self.directory, key)
+        tmp_entry = os.path.join(self.directory, f".tmp-{key}-{os.getpid()}")
+        os.makedirs(tmp_entry, exist_ok=True)
+
+        try:
+            kinds, unique_counts = [], []
+            for position, name in enumerate(df.columns):
+                base = os.path.join(tmp_entry, f"{position:04d}")
+                values = df[name].astype(str).to_numpy(dtype=object)
+                codes, uniques = pd.factorize(values)
+                if len(uniques) <= len(values) * _DICT_MAX_RATIO:
+                    np.save(f"{base}.codes.npy", codes.astype(np.int32))
+                    np.save(f"{base}.values.npy", _encode_text(uniques.tolist()))
+                    kinds.append('dict')
+                else:
+                    np.save(f"{base}.npy", _encode_text(values.tolist()))
+                    kinds.append('text')
+                unique_counts.append(len(uniques))
+
+            with open(os.path.join(tmp_entry, _META_FILE), 'w', encoding='utf-8') as file:
+                json.dump({'source': os.path.abspath(file_path), 'columns': [str(c) for c in df.columns],
+                           'kinds': kinds, 'uniques': unique_counts, 'rows': len(df)}, file, ensure_ascii=False)
+
+            # Запись появляется в кеше целиком; если ее уже сохранил другой процесс, оставляем ту
+            try:
+                os.rename(tmp_entry, entry)
+            except OSError:
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            raise
+
+        self.evict(keep=key)
+        return entry
+
+    def _entries(self) -> List[tuple]:
+        """Записи кеша: (время обращения, размер, ключ)."""
+        entries = []
+        for key in os.listdir(self.directory):
+            entry = os.path.join(self.directory, key)
+            meta_path = os.path.join(entry, _META_FILE)
+            if key.startswith('.') or not os.path.exists(meta_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+            entries.append((os.path.getmtime(meta_path), size, key))
+        return entries
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Удаляет давно неиспользуемые записи, пока размер кеша больше max_bytes.
+
+        Args:
+            keep: Ключ записи, которую нельзя удалять (только что сохраненная)
+
+        Returns:
+            Количество удаленных записей
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
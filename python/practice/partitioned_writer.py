@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Запись обработанных данных с разбиением на партиции по дате и типу вызова
+или на шарды по хешу номера абонента.
+
+Раскладка каталогов:
+    <output_dir>/date=YYYY-MM-DD/call_type=N/part-XXXX.csv|parquet
+    <output_dir>/shard=NNN/part-XXXX.csv|parquet
+
+Шард — FNV-1a (64 бита) от нормализованного party_msisdn по модулю числа шардов.
+Хеш не зависит от процесса и версии библиотек, поэтому все узлы одинаково
+распределяют абонентов и все записи абонента попадают в один шард.
+
+Каждая часть сначала пишется во временный файл с точкой в начале имени,
+а после записи всех частей переименовывается (os.replace), поэтому читатели
+никогда не видят недописанные файлы.
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+
+
+DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+# Выходные колонки, по которым вычисляются ключи партиций
+PARTITION_COLUMNS = ('call_date', 'call_type')
+FILE_FORMATS = ('csv', 'parquet')
+
+_PART_RE = re.compile(r'^part-(\d+)\.')
+
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+
+def partition_path(output_dir: str, call_date: str, call_type: str) -> str:
+    """Возвращает каталог партиции для даты (YYYY-MM-DD) и типа вызова."""
+    return os.path.join(output_dir, f"date={call_date}", f"call_type={call_type}")
+
+
+def _next_part_number(directory: str) -> int:
+    """Находит следующий свободный номер части в каталоге партиции."""
+    numbers = [int(match.group(1)) for match in map(_PART_RE.match, os.listdir(directory)) if match]
+    return max(numbers, default=-1) + 1
+
+
+def shard_ids(msisdn: pd.Series, shards: int) -> np.ndarray:
+    """
+    Вычисляет номер шарда для каждого номера абонента.
+
+    Args:
+        msisdn: Series с нормализованными номерами
+        shards: Число шардов
+
+    Returns:
+        np.ndarray int64 с номерами шардов от 0 до shards - 1
+    """
+    raw = np.array(msisdn.astype(str).str.encode('utf-8').tolist(), dtype='S')
+    if raw.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    width = raw.dtype.itemsize
+    matrix = np.frombuffer(raw.tobytes(), dtype=np.uint8).reshape(-1, width)
+    lengths = np.char.str_len(raw)
+
+    # FNV-1a по байтам, столбец за столбцом; переполнение uint64 — часть алгоритма
+    hashes = np.full(len(raw), _FNV_OFFSET, dtype=np.uint64)
+    for position in range(width):
+        active = position < lengths
+        mixed = (hashes ^ matrix[:, position].astype(np.uint64)) * _FNV_PRIME
+        hashes = np.where(active, mixed, hashes)
+    return (hashes % np.uint64(shards)).astype(np.int64)
+
+
+def merge_stats(stats_list: Iterable[Dict[str, float]]) -> Dict[str, float]:
+    """Складывает статистику шардов (или узлов) в общую."""
+    merged: Dict[str, float] = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def partition_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Вычисляет ключи партиций для каждой строки.
+
+    Args:
+        df: Трансформированный DataFrame с колонками call_date (ISO) и call_type
+
+    Returns:
+        DataFrame с колонками date и call_type
+    """
+    call_date = df['call_date'].astype(str)
+    dates = call_date.str.slice(0, 10).where(call_date.str.match(r'^\d{4}-\d{2}-\d{2}'), DEFAULT_PARTITION)
+    call_types = df['call_type'].astype(str).replace('', DEFAULT_PARTITION)
+    return pd.DataFrame({'date': dates, 'call_type': call_types}, index=df.index)
+
+
+def write_partitioned(df: pd.DataFrame, output_dir: str, file_format: str = 'csv',
+                      columns: Optional[List[str]] = None) -> List[str]:
+    """
+    Раскладывает строки по партициям и атомарно публикует файлы частей.
+
+    Args:
+        df: Трансформированный DataFrame с колонками PARTITION_COLUMNS
+        output_dir: Корневой каталог набора данных
+        file_format: 'csv' (разделитель ';') или 'parquet'
+        columns: Колонки, которые пишутся в файлы (None — все); call_date и call_type
+            нужны для ключей партиций, даже если в файлы не пишутся
+
+    Returns:
+        Список путей к созданным файлам
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"неизвестный формат {file_format}, ожидается один из {FILE_FORMATS}")
+
+    keys = partition_keys(df)
+    if columns is not None:
+        df = df[[column for column in columns if column in df.columns]]
+    groups = ((partition_path(output_dir, call_date, call_type), part)
+              for (call_date, call_type), part in df.groupby([keys['date'], keys['call_type']], sort=True))
+    return _write_parts(groups, file_format)
+
+
+def write_sharded(df: pd.DataFrame, output_dir: str, shards: int, file_format: str = 'csv',
+                  columns: Optional[List[str]] = None) -> List[str]:
+    """
+    Раскладывает строки по шардам party_msisdn и атомарно публикует файлы частей.
+
+    Args:
+        df: Трансформированный DataFrame с колонкой party_msisdn
+        output_dir: Корневой каталог набора данных
+        shards: Число шардов
+        file_format: 'csv' (разделитель ';') или 'parquet'
+        columns: Колонки, которые пишутся в файлы (None — все); party_msisdn нужна
+            для шардирования, даже если в файлы не пишется
+
+    Returns:
+        Список путей к созданным файлам (пустые шарды не пишутся)
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"неизвестный формат {file_format}, ожидается один из {FILE_FORMATS}")
+
+    ids = shard_ids(df['party_msisdn'], shards)
+    if columns is not None:
+        df = df[[column for column in columns if column in df.columns]]
+    groups = ((os.path.join(output_dir, f"shard={shard:03d}"), part)
+              for shard, part in df.groupby(ids, sort=True))
+    return _write_parts(groups, file_format)
+
+
+def _write_parts(groups, file_format: str) -> List[str]:
+    """Пишет части во временные файлы и публикует их после записи всех частей."""
+    pending = []
+
+    try:
+        for directory, part in groups:
+            os.makedirs(directory, exist_ok=True)
+
+            filename = f"part-{_next_part_number(directory):04d}.{file_format}"
+            tmp_path = os.path.join(directory, f".{filename}.tmp")
+            pending.append((tmp_path, os.path.join(directory, filename)))
+            if file_format == 'csv':
+                part.to_csv(tmp_path, index=False, sep=';', encoding='utf-8')
+            else:
+                part.to_parquet(tmp_path, index=False)
+
+    except Exception:
+        for tmp_path, _ in pending:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    # Публикуем части только после успешной записи всех партиций
+    for tmp_path, final_path in pending:
+        os.replace(tmp_path, final_path)
+    return [final_path for _, final_path in pending]
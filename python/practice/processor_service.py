@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Долгоживущий сервис обработки логов через Unix socket.
+
+Сервис держит пул "прогретых" экземпляров CSVDataProcessor, принимает задания
+"обработать файл в директорию" и выполняет их с ограниченной параллельностью,
+поэтому каждое задание не платит за запуск интерпретатора и импорт pandas.
+
+Протокол: клиент открывает соединение, отправляет одну строку JSON и получает
+одну строку JSON в ответ.
+    {"input_file": "...", "output_dir": "..."} -> статистика задания
+    {"command": "status"}                      -> счетчики сервиса
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+
+DEFAULT_SOCKET_PATH = "/tmp/usage_processor.sock"
+
+
+def _to_builtin(value):
+    """Приводит числа numpy к встроенным типам для JSON."""
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+class ProcessorService:
+    """
+    Сервис с пулом процессоров и ограниченной очередью заданий.
+
+    Constructor args:
+        socket_path: путь к Unix socket
+        workers: число одновременно выполняемых заданий (и размер пула процессоров)
+        queue_size: сколько заданий может ждать в очереди сверх выполняемых
+        processor_factory: фабрика процессоров (по умолчанию CSVDataProcessor)
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, workers: int = 2,
+                 queue_size: int = 100, processor_factory: Optional[Callable[[], Any]] = None):
+        if processor_factory is None:
+            from csv_data_processor import CSVDataProcessor
+            processor_factory = CSVDataProcessor
+
+        self.socket_path = socket_path
+        self.workers = workers
+        self.queue_size = queue_size
+
+        self._pool: "queue.Queue" = queue.Queue()
+        for _ in range(workers):
+            self._pool.put(processor_factory())
+
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._job_seq = 0
+        self.counters = {'completed': 0, 'failed': 0, 'rejected': 0, 'in_flight': 0}
+        self._server: Optional[socketserver.BaseServer] = None
+
+    def submit(self, input_file: str, output_dir: str) -> Dict[str, Any]:
+        """
+        Ставит задание в очередь и ждет его завершения.
+
+        Args:
+            input_file: Путь к входному файлу
+            output_dir: Директория для результата
+
+        Returns:
+            Словарь со статусом и статистикой задания
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.counters['rejected'] += 1
+            return {'status': 'rejected', 'message': 'очередь заданий переполнена'}
+
+        with self._lock:
+            self._job_seq += 1
+            job_id = self._job_seq
+            self.counters['in_flight'] += 1
+
+        try:
+            future = self._executor.submit(self._run_job, job_id, input_file, output_dir, time.time())
+            return future.result()
+        finally:
+            with self._lock:
+                self.counters['in_flight'] -= 1
+            self._slots.release()
+
+    def _run_job(self, job_id: int, input_file: str, output_dir: str, queued_at: float) -> Dict[str, Any]:
+        """Выполняет задание на свободном процессоре из пула."""
+        processor = self._pool.get()
+        started_at = time.time()
+        try:
+            if not os.path.exists(input_file):
+                raise FileNotFoundError(f"файл {input_file} не найден")
+            os.makedirs(output_dir, exist_ok=True)
+
+            processor.reset_stats()
+            processed_df = processor.process_data(input_file)
+
+            output_file = ""
+            if not processed_df.empty:
+                # Имя включает номер задания: несколько заданий могут завершиться в одну секунду
+                base_name = os.path.splitext(os.path.basename(input_file))[0]
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                filename = f"processed_{base_name}_{timestamp}_{job_id}.csv"
+                output_file = processor.save_to_csv(processed_df, output_dir, filename=filename)
+
+            status = 'ok' if output_file else 'error'
+            result = {
+                'status': status,
+                'job_id': job_id,
+                'input_file': input_file,
+                'output_file': output_file,
+                'records': processor.processed_records,
+                'errors': processor.error_count,
+                'duplicates_dropped': getattr(processor, 'duplicates_dropped', 0),
+                'stats': {key: _to_builtin(value) for key, value in processor.stats.items()},
+                'queued_seconds': round(started_at - queued_at, 6),
+                'processing_seconds': round(time.time() - started_at, 6)
+            }
+            if getattr(processor, 'memory_governor', None) is not None:
+                result['memory'] = processor.memory_governor.report()
+
+        except Exception as e:
+            status = 'error'
+            result = {'status': status, 'job_id': job_id, 'input_file': input_file, 'message': str(e)}
+
+        finally:
+            self._pool.put(processor)
+
+        with self._lock:
+            self.counters['completed' if status == 'ok' else 'failed'] += 1
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        """Возвращает счетчики сервиса."""
+        with self._lock:
+            return dict(self.counters, workers=self.workers, queue_size=self.queue_size)
+
+    def handle_request(self, request: Any) -> Dict[str, Any]:
+        """Обрабатывает один запрос протокола (декодированный JSON любого типа)."""
+        if not isinstance(request, dict):
+            return {'status': 'error', 'message': 'запрос должен быть JSON-объектом'}
+        if request.get('command') == 'status':
+            return self.status()
+        if 'input_file' not in request or 'output_dir' not in request:
+            return {'status': 'error', 'message': 'ожидаются поля input_file и output_dir'}
+        return self.submit(request['input_file'], request['output_dir'])
+
+    def serve_forever(self):
+        """Запускает сервер на Unix socket до остановки."""
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        service = self
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                try:
+                    response = service.handle_request(json.loads(line))
+                except ValueError as e:
+                    response = {'status': 'error', 'message': f'некорректный запрос: {e}'}
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        self._server = _Server(self.socket_path, _Handler)
+        print(f"Сервис обработки запущен: socket={self.socket_path}, workers={self.workers}, "
+              f"queue_size={self.queue_size}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._executor.shutdown(wait=True)
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        """Останавливает сервер, запущенный через serve_forever."""
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def send_request(request: Dict[str, Any], socket_path: str = DEFAULT_SOCKET_PATH,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Отправляет запрос сервису и возвращает ответ.
+
+    Args:
+        request: Словарь запроса
+        socket_path: Путь к Unix socket сервиса
+        timeout: Таймаут ожидания ответа в секундах
+
+    Returns:
+        Словарь ответа
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        with client.makefile('rb') as response:
+            return json.loads(response.readline())
+
+
+def submit_job(input_file: str, output_dir: str, socket_path: str = DEFAULT_SOCKET_PATH,
+               timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Отправляет задание на обработку файла."""
+    return send_request({'input_file': os.path.abspath(input_file),
+                         'output_dir': os.path.abspath(output_dir)}, socket_path, timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервис обработки логов соединений")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help="запустить сервис")
+    serve.add_argument('--workers', type=int, default=2)
+    serve.add_argument('--queue-size', type=int, default=100)
+
+    submit = subparsers.add_parser('submit', help="отправить задание")
+    submit.add_argument('input_file')
+    submit.add_argument('output_dir')
+
+    subparsers.add_parser('status', help="показать счетчики сервиса")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        service = ProcessorService(args.socket, workers=args.workers, queue_size=args.queue_size)
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            print("Сервис остановлен")
+        return 0
+
+    if args.command == 'submit':
+        response = submit_job(args.input_file, args.output_dir, args.socket)
+    else:
+        response = send_request({'command': 'status'}, args.socket)
+
+    print(json.dumps(response, ensure_ascii=False, indent=2))
+    return 0 if response.get('status', 'ok') == 'ok' else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
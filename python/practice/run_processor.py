@@ -1,50 +1,233 @@
+import argparse
 import sys
 import os
-from csv_data_processor import CSVDataProcessor 
-
-
-def main():
-    input_file = "/home/nik/test_a1/Files/usage_data.log"
-    output_dir = "/home/nik/test_a1/python/practice/processed_usage"
-    
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-    if len(sys.argv) > 2:
-        output_dir = sys.argv[2]
-    
+from typing import Any, Dict, List, Optional
+
+
+# Файлы меньше этого порога обрабатываются потоково без импорта pandas
+FAST_PATH_MAX_BYTES = 8 * 1024 * 1024
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Обработка логов соединений")
+    parser.add_argument('input_file', nargs='?', default="/home/nik/test_a1/Files/usage_data.log")
+    parser.add_argument('output_dir', nargs='?', default="/home/nik/test_a1/python/practice/processed_usage")
+    parser.add_argument('--engine', choices=['auto', 'pandas', 'stream'], default='auto',
+                        help="auto — stream для файлов меньше --fast-path-max-bytes, иначе pandas")
+    parser.add_argument('--fast-path-max-bytes', type=int, default=FAST_PATH_MAX_BYTES)
+    parser.add_argument('--partitioned', choices=['csv', 'parquet'],
+                        help="писать партиции date=YYYY-MM-DD/call_type=N вместо одного файла (только pandas)")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="писать шарды shard=NNN по хешу party_msisdn вместо одного файла; "
+                             "формат файлов задает --partitioned (только pandas)")
+    parser.add_argument('--sorted', action='store_true',
+                        help="отсортировать результат по party_msisdn, call_date внешней сортировкой (только pandas)")
+    parser.add_argument('--run-rows', type=int, default=500_000,
+                        help="сколько строк сортировать в памяти за раз при --sorted")
+    parser.add_argument('--dedup-db',
+                        help="файл SQLite с ключами обработанных записей для отбрасывания дубликатов (только pandas)")
+    parser.add_argument('--dedup-window-days', type=int, default=30)
+    parser.add_argument('--schema',
+                        help="JSON-файл схемы входного формата другого коммутатора (только pandas)")
+    parser.add_argument('--columns', help="выходные колонки через запятую (только pandas)")
+    parser.add_argument('--call-types', help="коды типов вызова через запятую, например 5 (только pandas)")
+    parser.add_argument('--msisdn-prefix', help="префикс нормализованного номера абонента (только pandas)")
+    parser.add_argument('--date-from', help="начало периода YYYY-MM-DD, включительно (только pandas)")
+    parser.add_argument('--date-to', help="конец периода YYYY-MM-DD, не включительно (только pandas)")
+    parser.add_argument('--target-timezone',
+                        help="пояс IANA для времени соединений, например Europe/Minsk (только pandas)")
+    parser.add_argument('--parse-cache-dir',
+                        help="каталог кеша разобранных входных файлов (только pandas)")
+    parser.add_argument('--memory-budget-mb', type=float,
+                        help="бюджет памяти в МБ: файл читается пачками адаптивного размера (только pandas)")
+    parser.add_argument('--rollups', action='store_true',
+                        help="сохранить агрегаты по абонентам и часам (только pandas)")
+    args = parser.parse_args(argv)
+
+    # Явно выбранный stream не подменяется pandas молча
+    unsupported = pandas_only_options(args)
+    if args.engine == 'stream' and unsupported:
+        parser.error(f"--engine stream не поддерживает {', '.join(unsupported)}; используйте --engine pandas")
+    return args
+
+
+def pandas_only_options(args: argparse.Namespace) -> List[str]:
+    """Возвращает заданные опции, которые поддерживает только обработчик pandas."""
+    options = [('--rollups', args.rollups), ('--partitioned', args.partitioned), ('--shards', args.shards),
+               ('--sorted', args.sorted), ('--dedup-db', args.dedup_db), ('--schema', args.schema),
+               ('--target-timezone', args.target_timezone), ('--parse-cache-dir', args.parse_cache_dir),
+               ('--memory-budget-mb', args.memory_budget_mb), ('--columns', args.columns),
+               ('--call-types', args.call_types), ('--msisdn-prefix', args.msisdn_prefix),
+               ('--date-from', args.date_from), ('--date-to', args.date_to)]
+    return [flag for flag, value in options if value]
+
+
+def choose_engine(input_file: str, engine: str, fast_path_max_bytes: int) -> str:
+    """Выбирает обработчик по размеру входного файла."""
+    if engine != 'auto':
+        return engine
+    return 'stream' if os.path.getsize(input_file) < fast_path_max_bytes else 'pandas'
+
+
+def run_stream(input_file: str, output_dir: str) -> int:
+    from stream_processor import StreamUsageProcessor
+
+    processor = StreamUsageProcessor()
+    output_file = processor.process_file(input_file, output_dir)
+    if not output_file:
+        print("Не удалось обработать данные")
+        return 1
+
+    print(f"\nОбработка завершена успешно!")
+    print(f"Результат сохранен в: {output_file}")
+
+    call_types = dict(sorted(processor.call_type_counts.items(), key=lambda item: -item[1]))
+    print(f"\nКраткая статистика:")
+    print(f"- Обработано записей: {processor.processed_records}")
+    print(f"- Типы вызовов: {call_types}")
+    return 0
+
+
+def run_sorted(input_file: str, output_dir: str, run_rows: int, columns: Optional[List[str]] = None,
+               filters: Optional[Dict[str, Any]] = None, **processor_options) -> int:
+    from csv_data_processor import CSVDataProcessor
+
+    # Файл обрабатывается пачками и сортируется внешней сортировкой
+    processor = CSVDataProcessor (**processor_options)
+    output_file = processor.save_sorted_csv(input_file, output_dir, run_rows=run_rows,
+                                            columns=columns, filters=filters)
+    if not output_file:
+        print("Не удалось обработать данные")
+        return 1
+
+    print(f"\nОбработка завершена успешно!")
+    print(f"Результат сохранен в: {output_file}")
+    for rollup_file in processor.save_rollups(output_dir):
+        print(f"Агрегаты сохранены в: {rollup_file}")
+
+    print(f"\nКраткая статистика:")
+    print(f"- Обработано записей: {processor.processed_records}")
+    return 0
+
+
+def run_batches(processor, input_file: str, output_dir: str, partitioned: Optional[str] = None,
+                columns: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None) -> int:
+    # С бюджетом памяти каждая пачка пишется сразу, весь результат в памяти не собирается
+    paths = processor.save_in_batches(input_file, output_dir, partitioned, columns, filters)
+    if not paths:
+        print("Не удалось обработать данные")
+        return 1
+
+    print(f"\nОбработка завершена успешно!")
+    print(f"Результат сохранен в: {output_dir if processor.shards or partitioned else paths[0]}")
+    for rollup_file in processor.save_rollups(output_dir):
+        print(f"Агрегаты сохранены в: {rollup_file}")
+
+    print(f"\nКраткая статистика:")
+    print(f"- Обработано записей: {processor.processed_records}")
+    print(f"- Память: {processor.memory_governor.report()}")
+    return 0
+
+
+def run_pandas(input_file: str, output_dir: str, partitioned: Optional[str] = None,
+               columns: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None,
+               **processor_options) -> int:
+    # Импортируем pandas только когда он действительно нужен
+    from csv_data_processor import CSVDataProcessor
+
+    # Создаем процессор и обрабатываем данные; ключи партиций остаются в результате
+    # до записи, даже если не входят в columns
+    processor = CSVDataProcessor (partitioned=bool(partitioned) and not processor_options.get('shards'),
+                                  **processor_options)
+    if processor.memory_governor is not None:
+        return run_batches(processor, input_file, output_dir, partitioned, columns, filters)
+    processed_df = processor.process_data(input_file, columns=columns, filters=filters)
+
+    if not processed_df.empty:
+        if processor.shards:
+            output_file = output_dir if processor.save_sharded(processed_df, output_dir, partitioned or 'csv', columns) else ""
+        elif partitioned:
+            output_file = output_dir if processor.save_partitioned(processed_df, output_dir, partitioned, columns) else ""
+        else:
+            output_file = processor.save_to_csv(processed_df, output_dir)
+        if output_file:
+            print(f"\nОбработка завершена успешно!")
+            print(f"Результат сохранен в: {output_file}")
+            for rollup_file in processor.save_rollups(output_dir):
+                print(f"Агрегаты сохранены в: {rollup_file}")
+
+            print(f"\nКраткая статистика:")
+            print(f"- Обработано записей: {len(processed_df)}")
+            if 'call_type' in processed_df.columns:
+                print(f"- Типы вызовов: {processed_df['call_type'].value_counts().to_dict()}")
+
+            return 0
+        else:
+            print("Ошибка при сохранении результата")
+            return 1
+    else:
+        print("Не удалось обработать данные")
+        return 1
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    input_file = args.input_file
+    output_dir = args.output_dir
+
     print(f"Входной файл: {input_file}")
     print(f"Выходная директория: {output_dir}")
-    
+
     if not os.path.exists(input_file):
         print(f"Ошибка: файл {input_file} не найден")
-        print("Использование: python run_processor_ .py [input_file] [output_dir]")
+        print("Использование: python run_processor_ .py [input_file] [output_dir] [--engine auto|pandas|stream]")
+        return 1
+
+    # Бюджет памяти ограничивает пачки pandas; mmap и кеш разбора читают файл целиком
+    if args.memory_budget_mb and args.parse_cache_dir:
+        print("Ошибка: --memory-budget-mb нельзя сочетать с --parse-cache-dir")
         return 1
-    
+
+    # Сортированный результат пишется одним файлом из пачек pandas
+    if args.sorted:
+        conflicting = [flag for flag, value in (('--partitioned', args.partitioned), ('--shards', args.shards),
+                                                ('--parse-cache-dir', args.parse_cache_dir)) if value]
+        if conflicting:
+            print(f"Ошибка: --sorted нельзя сочетать с {', '.join(conflicting)}")
+            return 1
+
     os.makedirs(output_dir, exist_ok=True)
-    
+
     try:
-        # Создаем процессор и обрабатываем данные
-        processor = CSVDataProcessor ()
-        processed_df = processor.process_data(input_file)
-        
-        if not processed_df.empty:
-            output_file = processor.save_to_csv(processed_df, output_dir)
-            if output_file:
-                print(f"\nОбработка завершена успешно!")
-                print(f"Результат сохранен в: {output_file}")
-                
-                print(f"\nКраткая статистика:")
-                print(f"- Обработано записей: {len(processed_df)}")
-                print(f"- Типы вызовов: {processed_df['call_type'].value_counts().to_dict()}")
-                
-                return 0
-            else:
-                print("Ошибка при сохранении результата")
-                return 1
-        else:
-            print("Не удалось обработать данные")
-            return 1
-            
+        processor_options = {
+            'rollups': args.rollups,
+            'dedup_path': args.dedup_db,
+            'dedup_window_days': args.dedup_window_days,
+            'schema_path': args.schema,
+            'shards': args.shards,
+            'target_timezone': args.target_timezone,
+            'parse_cache_dir': args.parse_cache_dir,
+            'memory_budget_mb': args.memory_budget_mb
+        }
+        columns = args.columns.split(',') if args.columns else None
+        filters = {
+            'call_types': [int(code) for code in args.call_types.split(',')] if args.call_types else None,
+            'msisdn_prefix': args.msisdn_prefix,
+            'date_from': args.date_from,
+            'date_to': args.date_to
+        }
+        filters = {key: value for key, value in filters.items() if value}
+        engine = 'pandas' if pandas_only_options(args) else choose_engine(input_file, args.engine, args.fast_path_max_bytes)
+        print(f"Обработчик: {engine}")
+
+        if engine == 'stream':
+            return run_stream(input_file, output_dir)
+        if args.sorted:
+            return run_sorted(input_file, output_dir, args.run_rows, columns=columns, filters=filters,
+                              **processor_options)
+        return run_pandas(input_file, output_dir, partitioned=args.partitioned, columns=columns,
+                          filters=filters, **processor_options)
+
     except Exception as e:
         print(f"Ошибка при обработке: {e}")
         return 1
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Потоковая обработка небольших логов без pandas и numpy.
+
+Повторяет трансформации CSVDataProcessor построчно на стандартной библиотеке,
+чтобы короткие запуски на маленьких файлах не платили за импорт тяжелых модулей.
+"""
+
+import csv
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+
+_PREFIX_RE = re.compile(r'^\d+\.\d+\.')
+_NON_DIGIT_RE = re.compile(r'[^\d]')
+
+TARGET_COLUMNS = [
+    'party_msisdn', 'party_imsi', 'called_party_number',
+    'calling_party_number', 'call_date', 'call_duration',
+    'total_volume', 'total_quantity', 'call_type'
+]
+
+
+def normalize_phone(phone: str) -> str:
+    """Нормализует один номер по тем же правилам, что и CSVDataProcessor."""
+    if not phone:
+        return ''
+
+    phone = _NON_DIGIT_RE.sub('', _PREFIX_RE.sub('', phone))
+    if phone == '':
+        return ''
+
+    if phone.startswith('375'):
+        return phone
+
+    if phone.startswith('80') and len(phone) >= 11:
+        return '375' + phone[2:]
+
+    if len(phone) >= 9:
+        return '375' + phone
+
+    return phone
+
+
+def determine_call_type(record: Dict[str, str]) -> int:
+    """Определяет тип вызова (1-5) для одной записи исходного формата."""
+    has_duration = record.get('callDuration', '').strip() != ''
+    has_volume = record.get('totalVolume', '').strip() != ''
+    has_quantity = record.get('totalQuantity', '').strip() != ''
+    has_called_party = record.get('calledPartyNumber', '').strip() != ''
+    has_calling_party = record.get('callingPartyNumber', '').strip() != ''
+
+    if has_duration:
+        return 2 if has_calling_party and not has_called_party else 1
+    if has_volume:
+        return 5
+    if has_quantity:
+        return 4 if has_calling_party and not has_called_party else 3
+    if has_called_party:
+        return 1
+    if has_calling_party:
+        return 2
+    return 5
+
+
+def _to_number(value: str):
+    """Аналог pd.to_numeric(errors='coerce').fillna(0) для одного значения."""
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return 0
+
+
+class StreamUsageProcessor:
+    """
+    Построчный процессор логов соединений на стандартной библиотеке.
+
+    Формат результата и статистика совпадают с CSVDataProcessor.
+    """
+
+    def __init__(self):
+        self.processed_records = 0
+        self.error_count = 0
+        self.call_type_counts: Dict[str, int] = {}
+        self.stats = {
+            'total_calls': 0,
+            'total_call_duration': 0,
+            'total_volume': 0,
+            'total_sms': 0
+        }
+
+    def convert_time(self, call_date: str, timezone_offset: str) -> str:
+        """Преобразует время "HH:MM:SS DD/MM/YYYY" со смещением "+03:00" в ISO."""
+        if call_date == '' or timezone_offset == '':
+            return call_date
+
+        try:
+            time_part, date_part = call_date.split(' ')
+            hour, minute, second = map(int, time_part.split(':'))
+            day, month, year = map(int, date_part.split('/'))
+            dt = datetime(year, month, day, hour, minute, second)
+
+            offset = timedelta(hours=int(timezone_offset[1:3]), minutes=int(timezone_offset[4:6]))
+            dt = dt + offset if timezone_offset[0] == '+' else dt - offset
+            return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+        except Exception as e:
+            print(f"Ошибка при преобразовании времени '{call_date}': {e}")
+            self.error_count += 1
+            return call_date
+
+    def transform_record(self, record: Dict[str, str]) -> List[str]:
+        """
+        Трансформирует одну запись в строку целевого формата.
+
+        Args:
+            record: Словарь с полями исходного формата
+
+        Returns:
+            Список значений в порядке TARGET_COLUMNS
+        """
+        call_type = determine_call_type(record)
+        self._update_stats(record, call_type)
+
+        return [
+            normalize_phone(record.get('partyMSISDN', '')),
+            record.get('partyIMSI', ''),
+            normalize_phone(record.get('calledPartyNumber', '')),
+            normalize_phone(record.get('callingPartyNumber', '')),
+            self.convert_time(record.get('callDate', ''), record.get('timeZoneOffset', '')),
+            record.get('callDuration', ''),
+            record.get('totalVolume', ''),
+            record.get('totalQuantity', ''),
+            str(call_type)
+        ]
+
+    def _update_stats(self, record: Dict[str, str], call_type: int):
+        """Обновляет статистику обработки."""
+        key = str(call_type)
+        self.call_type_counts[key] = self.call_type_counts.get(key, 0) + 1
+
+        if call_type in (1, 2):
+            self.stats['total_calls'] += 1
+            self.stats['total_call_duration'] += _to_number(record.get('callDuration', ''))
+        elif call_type == 5:
+            self.stats['total_volume'] += _to_number(record.get('totalVolume', ''))
+        else:
+            self.stats['total_sms'] += _to_number(record.get('totalQuantity', ''))
+
+    def process_file(self, input_file: str, output_dir: str) -> str:
+        """
+        Читает файл, трансформирует записи и сразу пишет результат.
+
+        Args:
+            input_file: Путь к входному файлу
+            output_dir: Директория для сохранения
+
+        Returns:
+            Путь к созданному файлу или пустая строка, если данных нет
+        """
+        print(f"Начинаем потоковую обработку файла: {input_file}")
+        start_time = datetime.now()
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filepath = os.path.join(output_dir, f"processed_usage_data_ _{timestamp}.csv")
+
+        try:
+            with open(input_file, 'r', encoding='utf-8', newline='') as source:
+                first_line = source.readline()
+                delimiter = ';' if ';' in first_line else ','
+                header = next(csv.reader([first_line], delimiter=delimiter))
+
+                with open(filepath, 'w', encoding='utf-8', newline='') as target:
+                    writer = csv.writer(target, delimiter=';', lineterminator='\n')
+                    writer.writerow(TARGET_COLUMNS)
+
+                    for values in csv.reader(source, delimiter=delimiter):
+                        if not values:
+                            continue
+                        writer.writerow(self.transform_record(dict(zip(header, values))))
+                        self.processed_records += 1
+
+        except Exception as e:
+            print(f"Ошибка при обработке файла {input_file}: {e}")
+            self.error_count += 1
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return ""
+
+        if self.processed_records == 0:
+            os.remove(filepath)
+            print("Не удалось прочитать данные из файла")
+            return ""
+
+        print(f"Обработка завершена за {datetime.now() - start_time}")
+        print(f"Данные сохранены в файл: {filepath}")
+        return filepath
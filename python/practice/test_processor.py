@@ -4,10 +4,78 @@
 Тесты для CSVDataProcessor 
 """
 
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
 import unittest
+from unittest import mock
 import pandas as pd
 import numpy as np
 from csv_data_processor import CSVDataProcessor 
+from csv_writer import FastCSVWriter
+from dedup_store import UNKNOWN_DAY, SeenSet, record_days, record_keys
+from log_profiler import LogProfiler, msisdn_pattern
+from memory_governor import MB, MemoryGovernor
+from mmap_reader import read_usage_columns
+from stream_processor import StreamUsageProcessor
+from processor_service import ProcessorService, send_request, submit_job
+from partitioned_writer import merge_stats, shard_ids
+from run_processor import main as run_processor_main
+from usage_rollup import UsageRollup
+from usage_analytics import UsageAnalytics
+from usage_filters import RowFilter
+
+
+SAMPLE_LOG = (
+    "partyMSISDN;partyIMSI;calledPartyNumber;callingPartyNumber;callDate;"
+    "timeZoneOffset;callDuration;totalVolume;totalQuantity\n"
+    "1.1.375291234567;257012345678901;375291234568;;10:30:45 15/12/2024;+03:00;120;;\n"
+    "375291234567;257012345678902;;;11:00:00 15/12/2024;+03:00;;2048;\n"
+    "80291234567;257012345678903;;375291234569;23:15:00 15/12/2024;+03:00;;;1\n"
+)
+
+
+def write_sample_log(directory: str, content: str = SAMPLE_LOG, name: str = "usage_data.log") -> str:
+    """Записывает тестовый лог во временную директорию."""
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write(content)
+    return path
+
+
+# Нагрузочные тесты запускаются только с RUN_PERF_TESTS=1; с UPDATE_PERF_BASELINES=1 они
+# перезаписывают эталоны в perf_baselines.json измеренными значениями
+RUN_PERF_TESTS = os.environ.get('RUN_PERF_TESTS') == '1'
+UPDATE_PERF_BASELINES = os.environ.get('UPDATE_PERF_BASELINES') == '1'
+PERF_BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perf_baselines.json')
+
+
+def calibration_seconds(repeats: int = 5) -> float:
+    """
+    Лучшее время эталонной нагрузки (строковые операции pandas и цикл Python).
+
+    Скорость transform_dataframe делится на скорость машины, измеренную этой
+    нагрузкой, поэтому эталон не зависит от машины, на которой его записали.
+    """
+    values = pd.Series([f"1.1.80{i:09d}" for i in range(100_000)])
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        digits = values.str.replace(r'^\d+\.\d+\.', '', regex=True)
+        sum(len(value) for value in digits if value.startswith('80'))
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def generate_raw_frame(rows: int) -> pd.DataFrame:
+    """Строит исходный DataFrame из повторяющихся строк SAMPLE_LOG."""
+    lines = SAMPLE_LOG.splitlines(keepends=True)
+    text = lines[0] + "".join(lines[1 + i % (len(lines) - 1)] for i in range(rows))
+    return pd.read_csv(io.StringIO(text), sep=';', dtype=str, keep_default_na=False)
 
 
 class TestCSVDataProcessor (unittest.TestCase):
@@ -73,6 +141,19 @@ class TestCSVDataProcessor (unittest.TestCase):
         
         pd.testing.assert_series_equal(result, expected)
     
+    def test_convert_time_to_target_zone(self):
+        """Тест перевода в пояс IANA с учетом летнего времени и разных смещений записей."""
+        processor = CSVDataProcessor(target_timezone='Europe/Minsk')
+        call_dates = pd.Series(["10:00:00 15/07/2010", "10:00:00 15/12/2010", "10:00:00 15/12/2024", "", "bad"])
+        offsets = pd.Series(["+02:00", "-05:00", "+03:00", "+03:00", "+03:00"])
+
+        result = processor.convert_time_to_local(call_dates, offsets)
+
+        self.assertEqual(result.tolist(), [
+            "2010-07-15 13:00:00", "2010-12-15 12:00:00", "2024-12-15 13:00:00", "", "bad"
+        ])
+        self.assertEqual(processor.error_count, 1)
+    
     def test_determine_call_type(self):
         """Тест определения типа вызова."""
         # Создаем тестовый DataFrame
@@ -158,5 +239,798 @@ class TestCSVDataProcessor (unittest.TestCase):
         self.assertEqual(result, "")
 
 
+class TestFastCSVWriter(unittest.TestCase):
+    """Тесты для быстрой записи CSV"""
+
+    def test_output_matches_to_csv(self):
+        """Тест побайтовой совместимости с to_csv при записи пачками."""
+        df = pd.DataFrame({
+            'party_msisdn': ['375291234567', '375291234568', None, 'a;b'],
+            'call_date': ['2024-12-15 13:30:45', '', '2024-12-15 14:00:00', 'say "hi"'],
+            'call_duration': pd.array([120, None, 5, 0], dtype='Int64'),
+            'total_volume': [1.5, np.nan, 2048.0, 0.1]
+        })
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "out.csv")
+            with FastCSVWriter(path) as writer:
+                writer.write(df.iloc[:2])
+            with FastCSVWriter(path, append=True) as writer:
+                writer.write(df.iloc[2:3])
+                writer.write(df.iloc[3:])
+
+            with open(path, 'rb') as file:
+                self.assertEqual(file.read(), df.to_csv(sep=';', index=False).encode('utf-8'))
+            self.assertEqual(os.listdir(tmp_dir), ["out.csv"])
+
+    def test_append_writes_in_place_and_abort_restores_file(self):
+        """Тест: дописывание не копирует файл, а отмена возвращает его к исходному размеру."""
+        df = pd.DataFrame({'party_msisdn': ['375291234567', '375291234568'], 'call_duration': [120, 5]})
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "out.csv")
+            with FastCSVWriter(path) as writer:
+                writer.write(df.iloc[:1])
+            with open(path, 'rb') as file:
+                original = file.read()
+
+            with mock.patch('shutil.copyfile') as copyfile:
+                with self.assertRaises(RuntimeError):
+                    with FastCSVWriter(path, append=True, buffer_size=1) as writer:
+                        writer.write(df.iloc[1:])
+                        raise RuntimeError("сбой записи")
+                with FastCSVWriter(path, append=True) as writer:
+                    writer.write(df.iloc[1:])
+            copyfile.assert_not_called()
+
+            with open(path, 'rb') as file:
+                content = file.read()
+            self.assertTrue(content.startswith(original))
+            self.assertEqual(content, df.to_csv(sep=';', index=False).encode('utf-8'))
+            self.assertEqual(os.listdir(tmp_dir), ["out.csv"])
+
+
+class TestUsageRollup(unittest.TestCase):
+    """Тесты для агрегатов по абонентам и часам"""
+
+    def test_rollup_in_transform_pass(self):
+        """Тест агрегатов, посчитанных при трансформации, и их слияния."""
+        input_df = pd.DataFrame({
+            'partyMSISDN': ['1.1.375291234567', '375291234567', '80291111111'],
+            'partyIMSI': ['1', '2', '3'],
+            'calledPartyNumber': ['375291234568', '', ''],
+            'callingPartyNumber': ['', '', '375291234569'],
+            'callDate': ['10:30:45 15/12/2024', '11:00:00 15/12/2024', '23:15:00 15/12/2024'],
+            'timeZoneOffset': ['+03:00', '+03:00', '+03:00'],
+            'callDuration': ['120', '', ''],
+            'totalVolume': ['', '2097152', ''],
+            'totalQuantity': ['', '', '2']
+        })
+
+        processor = CSVDataProcessor(rollups=True)
+        processor.transform_dataframe(input_df)
+
+        merged = UsageRollup().merge(processor.rollup).merge(processor.rollup)
+        subscribers = merged.subscriber_frame().set_index('party_msisdn')
+
+        self.assertEqual(subscribers.loc['375291234567', 'events'], 4)
+        self.assertEqual(subscribers.loc['375291234567', 'calls'], 2)
+        self.assertEqual(subscribers.loc['375291234567', 'call_minutes'], 4.0)
+        self.assertEqual(subscribers.loc['375291234567', 'volume_mb'], 4.0)
+        self.assertEqual(subscribers.loc['375291111111', 'sms'], 4)
+
+        hours = processor.rollup.hourly_frame().set_index('hour')
+        self.assertEqual(hours.loc[13, 'calls'], 1)
+        self.assertEqual(hours.loc[2, 'sms'], 2)
+        self.assertEqual(hours['events'].sum(), 3)
+
+    def test_chunked_updates_match_single_update(self):
+        """Тест: агрегаты по пачкам (со сворачиванием списка) совпадают с агрегатами одной пачки."""
+        rng = np.random.default_rng(7)
+        df = pd.DataFrame({
+            'party_msisdn': rng.integers(0, 50, 400).astype(str).astype(object),
+            'call_date': '2024-12-15 10:00:00',
+            'call_duration': rng.integers(0, 300, 400).astype(str),
+            'total_volume': '',
+            'total_quantity': ''
+        })
+        call_types = pd.Series(rng.integers(1, 6, 400))
+
+        single = UsageRollup()
+        single.update(df, call_types)
+        chunked = UsageRollup()
+        with mock.patch('usage_rollup._COMPACT_MIN_ROWS', 60):
+            for start in range(0, len(df), 25):
+                chunked.update(df.iloc[start:start + 25].reset_index(drop=True),
+                               call_types.iloc[start:start + 25].reset_index(drop=True))
+
+        pd.testing.assert_frame_equal(chunked.subscriber_frame(), single.subscriber_frame())
+        pd.testing.assert_frame_equal(chunked.hourly_frame(), single.hourly_frame())
+
+
+class TestPartitionedOutput(unittest.TestCase):
+    """Тесты для записи с разбиением по дате и типу вызова"""
+
+    def test_partition_layout(self):
+        """Тест раскладки по каталогам и нумерации частей при повторной записи."""
+        df = pd.DataFrame({
+            'party_msisdn': ['375291234567', '375291234568', '375291234569'],
+            'call_date': ['2024-12-15 13:30:45', '2024-12-15 14:00:00', '2024-12-16 02:15:00'],
+            'call_type': ['1', '5', '1']
+        })
+        processor = CSVDataProcessor()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first = processor.save_partitioned(df, tmp_dir)
+            second = processor.save_partitioned(df, tmp_dir)
+
+            relative = sorted(os.path.relpath(path, tmp_dir) for path in first + second)
+            self.assertEqual(relative, [
+                os.path.join('date=2024-12-15', 'call_type=1', 'part-0000.csv'),
+                os.path.join('date=2024-12-15', 'call_type=1', 'part-0001.csv'),
+                os.path.join('date=2024-12-15', 'call_type=5', 'part-0000.csv'),
+                os.path.join('date=2024-12-15', 'call_type=5', 'part-0001.csv'),
+                os.path.join('date=2024-12-16', 'call_type=1', 'part-0000.csv'),
+                os.path.join('date=2024-12-16', 'call_type=1', 'part-0001.csv'),
+            ])
+
+            part = pd.read_csv(first[0], sep=';', dtype=str)
+            self.assertEqual(part['party_msisdn'].tolist(), ['375291234567'])
+
+
+class TestShardedOutput(unittest.TestCase):
+    """Тесты для шардирования по хешу party_msisdn"""
+
+    def test_shards_and_stats_merge(self):
+        """Тест раскладки абонентов по шардам и сложения статистики шардов."""
+        content = SAMPLE_LOG + "".join(
+            f"37529{index:07d};2570123456789{index:02d};375290000000;;12:00:00 15/12/2024;+03:00;{index};;\n"
+            for index in range(20)
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = write_sample_log(tmp_dir, content)
+            processor = CSVDataProcessor(shards=4)
+            result = processor.process_data(input_file)
+            paths = processor.save_sharded(result, tmp_dir)
+
+            parts = {os.path.basename(os.path.dirname(path)): pd.read_csv(path, sep=';', dtype=str)
+                     for path in paths}
+            self.assertEqual(sum(len(part) for part in parts.values()), len(result))
+
+            # Абонент целиком находится в одном шарде
+            owners = {}
+            for shard, part in parts.items():
+                for msisdn in part['party_msisdn']:
+                    self.assertEqual(owners.setdefault(msisdn, shard), shard)
+
+            self.assertEqual(merge_stats(processor.shard_stats), processor.stats)
+            self.assertEqual(processor.shard_stats[shard_ids(pd.Series(['375291234567']), 4)[0]]['total_volume'], 2048)
+
+    def test_shards_with_column_projection(self):
+        """Тест шардирования, когда party_msisdn не входит в выходные колонки."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = write_sample_log(tmp_dir)
+            processor = CSVDataProcessor(shards=4)
+            result = processor.process_data(input_file, columns=['call_type'])
+            paths = processor.save_sharded(result, os.path.join(tmp_dir, 'out'), columns=['call_type'])
+
+            self.assertTrue(paths)
+            parts = [pd.read_csv(path, sep=';', dtype=str) for path in paths]
+            self.assertTrue(all(list(part.columns) == ['call_type'] for part in parts))
+            self.assertEqual(sum(len(part) for part in parts), 3)
+            self.assertEqual(merge_stats(processor.shard_stats), processor.stats)
+            self.assertEqual(processor.shard_stats[shard_ids(pd.Series(['375291234567']), 4)[0]]['total_volume'], 2048)
+
+
+class TestUsageAnalytics(unittest.TestCase):
+    """Тесты для отчетов по обработанным файлам без БД"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        content = SAMPLE_LOG + "375291234567;257012345678902;;;09:00:00 15/12/2024;+03:00;;1048576;\n"
+        processor = CSVDataProcessor()
+        processed_df = processor.process_data(write_sample_log(self.tmp_dir.name, content))
+        self.dataset = os.path.join(self.tmp_dir.name, "dataset")
+        processor.save_partitioned(processed_df, self.dataset)
+        self.analytics = UsageAnalytics({'call_tariff': 1.0, 'sms_tariff': 0.5, 'internet_tariff': 2.0})
+
+    def test_ranking_and_cost_share(self):
+        """Тест ранжирования событий и доли стоимости в разрезе абонента."""
+        ranked = self.analytics.run('ranking', self.dataset, '2024-12-15')
+        subscriber = ranked[ranked['party_msisdn'] == '375291234567']
+        self.assertEqual(subscriber['call_date'].tolist(),
+                         ['2024-12-15 12:00:00', '2024-12-15 13:30:45', '2024-12-15 14:00:00'])
+        self.assertEqual(subscriber['event_rank'].tolist(), [3, 2, 1])
+
+        shares = self.analytics.run('cost_share', self.dataset, '2024-12-15')
+        subscriber = shares[shares['party_msisdn'] == '375291234567']
+        self.assertEqual(subscriber['cost_percentage'].tolist(), [49.95, 49.95, 0.1])
+
+    def test_partition_pruning_by_day(self):
+        """Тест чтения только партиций указанного дня."""
+        stats = self.analytics.run('file_stats', self.dataset, '2024-12-16')
+        self.assertEqual(stats['total_events'].sum(), 1)
+        self.assertEqual(stats['total_sms'].sum(), 1)
+        self.assertEqual(stats['total_charges'].sum(), 0.5)
+
+    def test_file_stats_per_part_file(self):
+        """Тест: в партициях и шардах статистика строится по файлам частей."""
+        stats = self.analytics.run('file_stats', self.dataset)
+        self.assertEqual(stats['source_file'].tolist(), [
+            os.path.join('date=2024-12-15', 'call_type=1', 'part-0000.csv'),
+            os.path.join('date=2024-12-15', 'call_type=5', 'part-0000.csv'),
+            os.path.join('date=2024-12-16', 'call_type=4', 'part-0000.csv')])
+        self.assertEqual(stats['total_events'].tolist(), [1, 2, 1])
+
+        processor = CSVDataProcessor(shards=2)
+        processed_df = processor.process_data(os.path.join(self.tmp_dir.name, "usage_data.log"))
+        sharded = os.path.join(self.tmp_dir.name, "sharded")
+        processor.save_sharded(processed_df, sharded)
+        stats = self.analytics.run('file_stats', sharded)
+        self.assertTrue(all(name.startswith('shard=') for name in stats['source_file']))
+        self.assertEqual(stats['total_events'].sum(), 4)
+
+    def test_cost_share_per_day(self):
+        """Тест: итог стоимости абонента считается отдельно за каждый день."""
+        df = pd.DataFrame({
+            'party_msisdn': ['375291234567'] * 3,
+            'call_date': ['2024-12-15 10:00:00', '2024-12-15 11:00:00', '2024-12-16 10:00:00'],
+            'call_duration': [60, 180, 120],
+            'total_volume': [0, 0, 0],
+            'total_quantity': [0, 0, 0],
+            'call_type': [1, 1, 1]
+        })
+        shares = self.analytics.cost_share(df)
+        self.assertEqual(shares['total_daily_cost'].tolist(), [4.0, 4.0, 2.0])
+        self.assertEqual(shares['cost_percentage'].tolist(), [25.0, 75.0, 100.0])
+
+
+class TestExternalSort(unittest.TestCase):
+    """Тесты для внешней сортировки результата"""
+
+    def test_sorted_output_matches_in_memory_sort(self):
+        """Тест совпадения внешней сортировки малыми сериями с сортировкой в памяти."""
+        lines = [SAMPLE_LOG.splitlines()[0]]
+        for i in range(40):
+            lines.append(f"37529{i % 7:07d};2570;;;{i % 24:02d}:{i % 60:02d}:00 15/12/2024;+03:00;;{i};")
+        content = "\n".join(lines) + "\n"
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_sample_log(tmp_dir, content)
+            expected = CSVDataProcessor().process_data(path).sort_values(
+                ['party_msisdn', 'call_date'], kind='stable').reset_index(drop=True)
+
+            processor = CSVDataProcessor()
+            output_file = processor.save_sorted_csv(path, tmp_dir, run_rows=5, chunk_size=3)
+            result = pd.read_csv(output_file, sep=';', dtype=str, na_filter=False)
+
+            pd.testing.assert_frame_equal(result, expected)
+            self.assertEqual(processor.processed_records, 40)
+            self.assertEqual(sorted(os.listdir(tmp_dir)), sorted([os.path.basename(output_file), 'usage_data.log']))
+
+            # Выбор колонок и фильтры применяются и при сортировке; ключ сортировки в файл не пишется
+            columns, filters = ['call_date', 'total_volume'], {'msisdn_prefix': '375290000003'}
+            expected = CSVDataProcessor().process_data(path, columns=columns + ['party_msisdn'], filters=filters) \
+                .sort_values(['party_msisdn', 'call_date'], kind='stable')[columns].reset_index(drop=True)
+            output_file = CSVDataProcessor().save_sorted_csv(path, tmp_dir, run_rows=2, chunk_size=3,
+                                                             filename='sorted.csv', columns=columns,
+                                                             filters=filters)
+            result = pd.read_csv(output_file, sep=';', dtype=str, na_filter=False)
+            pd.testing.assert_frame_equal(result, expected.astype(str))
+            self.assertEqual(len(result), 6)
+
+            self.assertEqual(CSVDataProcessor(shards=2).save_sorted_csv(path, tmp_dir), "")
+
+
+class TestDeduplication(unittest.TestCase):
+    """Тесты для дедупликации записей между файлами"""
+
+    def test_duplicates_dropped_across_files(self):
+        """Тест отбрасывания повторно переданных записей и учета в статистике."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first = write_sample_log(tmp_dir, name="usage_data1.log")
+            lines = SAMPLE_LOG.splitlines()
+            retransmitted = "\n".join(lines + [lines[1]] + [
+                "375291234599;257012345678909;;;12:00:00 15/12/2024;+03:00;;4096;"
+            ]) + "\n"
+            second = write_sample_log(tmp_dir, retransmitted, name="usage_data2.log")
+
+            dedup_path = os.path.join(tmp_dir, "seen.sqlite")
+            processor = CSVDataProcessor(dedup_path=dedup_path)
+            self.assertTrue(processor.save_to_csv(processor.process_data(first), tmp_dir, filename="out1.csv"))
+
+            processor.reset_stats()
+            result = processor.process_data(second)
+
+            self.assertEqual(result['party_msisdn'].tolist(), ['375291234599'])
+            self.assertEqual(processor.duplicates_dropped, 4)
+            self.assertEqual(processor.stats['total_calls'], 0)
+            self.assertEqual(processor.stats['total_volume'], 4096)
+
+            # Хранилище ключей переживает перезапуск процесса
+            self.assertTrue(CSVDataProcessor(dedup_path=dedup_path).process_data(first).empty)
+
+    def test_failed_save_keeps_records_for_retry(self):
+        """Тест: ключи запоминаются только после записи результата."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = write_sample_log(tmp_dir)
+            dedup_path = os.path.join(tmp_dir, "seen.sqlite")
+            processor = CSVDataProcessor(dedup_path=dedup_path)
+
+            # Повторная обработка без записи результата возвращает те же записи
+            self.assertEqual(len(processor.process_data(input_file)), 3)
+            self.assertEqual(len(processor.process_data(input_file)), 3)
+
+            # Запись в несуществующую директорию не удается — ключи не сохраняются
+            missing_dir = os.path.join(tmp_dir, "missing")
+            self.assertEqual(processor.save_to_csv(processor.process_data(input_file), missing_dir), "")
+            self.assertEqual(len(processor.seen_set), 0)
+
+            processor.reset_stats()
+            retried = processor.process_data(input_file)
+            self.assertEqual(len(retried), 3)
+            self.assertTrue(processor.save_to_csv(retried, tmp_dir, filename="out.csv"))
+            self.assertEqual(len(processor.seen_set), 3)
+            self.assertTrue(processor.process_data(input_file).empty)
+
+    def test_invalid_date_does_not_prune_history(self):
+        """Тест: нераспознанная дата не сдвигает окно хранения ключей к текущему дню."""
+        seen = SeenSet(':memory:', window_days=30)
+        frame = pd.DataFrame({'party_msisdn': ['375291234567', '375291234568'],
+                              'call_date': ['2020-01-10 10:00:00', 'bad date']})
+        days = record_days(frame['call_date'])
+        self.assertEqual(days[1], UNKNOWN_DAY)
+        seen.check_and_add(record_keys(frame), days)
+        seen.commit()
+        self.assertEqual(len(seen), 2)
+
+        later = pd.DataFrame({'party_msisdn': ['375291234569'], 'call_date': ['oops']})
+        seen.check_and_add(record_keys(later), record_days(later['call_date']))
+        seen.commit()
+        self.assertEqual(len(seen), 3)
+        seen.close()
+
+
+class TestUsageSchema(unittest.TestCase):
+    """Тесты для схемы входного формата"""
+
+    def test_custom_vendor_schema(self):
+        """Тест обработки файла другого формата по схеме из JSON."""
+        schema = {
+            "name": "vendor_b",
+            "delimiter": ",",
+            "columns": {
+                "party_msisdn": {"source": "A_NUMBER", "transform": "phone"},
+                "call_date": {"source": "START", "transform": "local_time", "offset_source": "TZ"},
+                "call_duration": {"source": "DUR", "type": "int"}
+            },
+            "call_type": {"duration": "DUR", "volume": "BYTES", "quantity": "SMS_CNT",
+                          "called_party": "B_NUMBER", "calling_party": "C_NUMBER"}
+        }
+        content = (
+            "A_NUMBER,B_NUMBER,C_NUMBER,START,TZ,DUR,BYTES,SMS_CNT,CELL_ID\n"
+            "80291234567,375291234568,,10:30:45 15/12/2024,+03:00,120,,,1001\n"
+            "291234567,,,11:00:00 15/12/2024,+03:00,,2048,,1002\n"
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            schema_path = os.path.join(tmp_dir, "vendor_b.json")
+            with open(schema_path, 'w', encoding='utf-8') as file:
+                json.dump(schema, file)
+            input_file = write_sample_log(tmp_dir, content, name="vendor_b.csv")
+
+            processor = CSVDataProcessor(schema_path=schema_path)
+            self.assertNotIn('CELL_ID', processor.read_csv_file(input_file).columns)
+
+            result = processor.process_data(input_file)
+
+        self.assertEqual(list(result.columns), ['party_msisdn', 'call_date', 'call_duration', 'call_type'])
+        self.assertEqual(result['party_msisdn'].tolist(), ['375291234567', '375291234567'])
+        self.assertEqual(result['call_date'].tolist(), ['2024-12-15 13:30:45', '2024-12-15 14:00:00'])
+        self.assertEqual(result['call_duration'].iloc[0], 120)
+        self.assertEqual(result['call_type'].tolist(), ['1', '5'])
+        self.assertEqual(processor.stats['total_volume'], 2048)
+        self.assertEqual(processor.column_mapping['A_NUMBER'], 'party_msisdn')
+
+
+class TestPredicatePushdown(unittest.TestCase):
+    """Тесты для выбора колонок и фильтров при чтении"""
+
+    def test_columns_and_filters(self):
+        """Тест выбора колонок и отбора строк для обоих способов чтения."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = write_sample_log(tmp_dir)
+
+            for reader in ('pandas', 'mmap'):
+                processor = CSVDataProcessor(reader=reader)
+                result = processor.process_data(input_file, columns=['party_msisdn', 'total_volume'],
+                                                filters={'call_types': [5]})
+                self.assertEqual(list(result.columns), ['party_msisdn', 'total_volume'])
+                self.assertEqual(result.values.tolist(), [['375291234567', '2048']])
+                self.assertEqual(processor.stats['total_calls'], 0)
+                self.assertEqual(processor.stats['total_volume'], 2048)
+
+                # 23:15 15/12 со смещением +03:00 — это уже 16/12 по местному времени
+                result = CSVDataProcessor(reader=reader).process_data(
+                    input_file, filters={'date_from': '2024-12-16', 'date_to': '2024-12-17'})
+                self.assertEqual(result['call_date'].tolist(), ['2024-12-16 02:15:00'])
+
+                result = CSVDataProcessor(reader=reader).process_data(
+                    input_file, filters={'msisdn_prefix': '37529', 'call_types': [3, 4]})
+                self.assertEqual(result['call_type'].tolist(), ['4'])
+                self.assertTrue(CSVDataProcessor(reader=reader).process_data(
+                    input_file, filters={'msisdn_prefix': '37544'}).empty)
+
+
+class TestParseCache(unittest.TestCase):
+    """Тесты для кеша разобранных входных файлов"""
+
+    def test_second_read_comes_from_cache(self):
+        """Тест повторной обработки из кеша, инвалидации и вытеснения."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = write_sample_log(tmp_dir)
+            cache_dir = os.path.join(tmp_dir, "cache")
+
+            expected = CSVDataProcessor().process_data(input_file)
+            processor = CSVDataProcessor(parse_cache_dir=cache_dir)
+            processor.process_data(input_file)
+            cached = processor.process_data(input_file)
+
+            pd.testing.assert_frame_equal(cached, expected)
+            self.assertEqual((processor.parse_cache.hits, processor.parse_cache.misses), (1, 1))
+
+            # Изменение файла дает новый ключ; старая запись вытесняется по размеру
+            write_sample_log(tmp_dir, SAMPLE_LOG + SAMPLE_LOG.splitlines(keepends=True)[1])
+            processor.parse_cache.max_bytes = 1
+            self.assertEqual(len(processor.process_data(input_file)), 4)
+            self.assertEqual(processor.parse_cache.misses, 2)
+            self.assertEqual(len([name for name in os.listdir(cache_dir) if not name.startswith('.')]), 1)
+
+
+class TestMemoryGovernor(unittest.TestCase):
+    """Тесты для подбора размера пачки под бюджет памяти"""
+
+    def test_batch_size_adapts_to_rss(self):
+        """Тест роста пачки при запасе памяти и уменьшения при давлении."""
+        governor = MemoryGovernor(100 * MB, initial_rows=10_000)
+        frame = pd.DataFrame({'party_msisdn': ['375291234567'] * 100})
+
+        with mock.patch('memory_governor.current_rss', return_value=20 * MB):
+            self.assertEqual(governor.next_batch_rows(), 10_000)
+            governor.observe(frame)
+            self.assertEqual(governor.next_batch_rows(), 20_000)
+            governor.observe(frame)
+
+        with mock.patch('memory_governor.current_rss', return_value=95 * MB):
+            self.assertEqual(governor.next_batch_rows(), 10_000)
+            governor.observe(frame)
+
+        report = governor.report()
+        self.assertEqual((report['batches'], report['pressure_events']), (3, 1))
+        self.assertEqual((report['min_batch_rows'], report['max_batch_rows']), (10_000, 20_000))
+        self.assertEqual(report['peak_rss_mb'], 95.0)
+
+    def test_process_data_with_budget(self):
+        """Тест обработки пачками под бюджет памяти."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = write_sample_log(tmp_dir)
+            expected = CSVDataProcessor().process_data(input_file)
+            processor = CSVDataProcessor(memory_budget_mb=512)
+            result = processor.process_data(input_file)
+
+        pd.testing.assert_frame_equal(result, expected)
+        report = processor.memory_governor.report()
+        self.assertEqual(report['batches'], 1)
+        self.assertGreater(report['bytes_per_row'], 0)
+        # process_data собирает результат в памяти, и отчет об этом сообщает
+        self.assertTrue(report['result_in_memory'])
+        self.assertEqual(report['budget_exceeded'], report['peak_rss_mb'] > report['budget_mb'])
+
+    def test_save_in_batches_writes_each_batch(self):
+        """Тест записи пачками: файл совпадает с обычной записью, пачки не собираются в памяти."""
+        content = SAMPLE_LOG + "".join(SAMPLE_LOG.splitlines(keepends=True)[1:]) * 5
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = write_sample_log(tmp_dir, content)
+            expected_path = CSVDataProcessor().save_to_csv(
+                CSVDataProcessor().process_data(input_file), tmp_dir, filename="expected.csv")
+
+            processor = CSVDataProcessor(memory_budget_mb=512)
+            processor.memory_governor = MemoryGovernor(512 * MB, initial_rows=4, min_rows=4, max_rows=4)
+            with mock.patch.object(FastCSVWriter, 'write', autospec=True,
+                                   side_effect=FastCSVWriter.write) as write:
+                paths = processor.save_in_batches(input_file, tmp_dir, filename="batched.csv")
+
+            self.assertEqual(paths, [os.path.join(tmp_dir, "batched.csv")])
+            self.assertEqual(write.call_count, 5)
+            with open(paths[0], 'rb') as result, open(expected_path, 'rb') as expected:
+                self.assertEqual(result.read(), expected.read())
+            self.assertEqual(processor.processed_records, 18)
+            self.assertFalse(processor.memory_governor.report()['result_in_memory'])
+
+        with self.assertRaises(ValueError):
+            CSVDataProcessor(reader='mmap', memory_budget_mb=512)
+
+
+class TestLogProfiler(unittest.TestCase):
+    """Тесты для профиля лога по выборке"""
+
+    def test_profile_matches_file_mix(self):
+        """Тест долей типов вызовов по выборке при длинных и коротких строках."""
+        header = SAMPLE_LOG.splitlines(keepends=True)[0]
+        # Каждая четвертая строка (тип 5) намного длиннее: без поправки на длину ее доля была бы завышена
+        lines = [
+            f"1.1.37529{i:07d};{'2' * 400};;;11:00:00 15/12/2024;+03:00;;2048;\n" if i % 4 == 0
+            else f"8029{i:07d};2570;375291234568;;10:30:45 15/12/2024;+03:00;120;;\n"
+            for i in range(20000)
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_file = write_sample_log(tmp_dir, header + "".join(lines))
+            seek_profile = LogProfiler(sample_size=2000, seed=1, reservoir_max_bytes=0).profile(input_file)
+            full_profile = LogProfiler(sample_size=2000, seed=1).profile(input_file, preview_rows=3)
+
+        self.assertEqual((seek_profile['method'], full_profile['method']), ('seek', 'reservoir'))
+        self.assertEqual(full_profile['estimated_rows'], 20000)
+        self.assertAlmostEqual(seek_profile['estimated_rows'], 20000, delta=2000)
+        for profile in (seek_profile, full_profile):
+            self.assertEqual(profile['sample_rows'], 2000)
+            self.assertAlmostEqual(profile['call_types']['5']['share'], 0.25, delta=0.04)
+            self.assertAlmostEqual(profile['msisdn_patterns']['1.1.375'], 0.25, delta=0.04)
+            self.assertEqual(profile['fill_rates']['partyMSISDN'], 1.0)
+            self.assertEqual(profile['fill_rates']['callingPartyNumber'], 0.0)
+        self.assertEqual(len(full_profile['preview']), 3)
+        self.assertEqual([msisdn_pattern(value) for value in ('', '375291234567', '2.5.80291234567')],
+                         ['empty', '375', '2.5.80'])
+
+
+class TestMmapReader(unittest.TestCase):
+    """Тесты для чтения лога через memory-mapping"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_mmap_matches_pandas_reader(self):
+        """Тест совпадения результата mmap-чтения с pandas."""
+        path = write_sample_log(self.tmp_dir.name, SAMPLE_LOG.replace("\n", "\r\n"))
+
+        expected = CSVDataProcessor().read_csv_file(path)
+        result = CSVDataProcessor(reader='mmap').read_csv_file(path)
+
+        pd.testing.assert_frame_equal(result, expected)
+
+        # Фильтр применяется к разобранному кадру так же, как при чтении pandas
+        row_filter = RowFilter.from_dict({'call_types': [5]})
+        pd.testing.assert_frame_equal(CSVDataProcessor(reader='mmap').read_csv_file(path, row_filter=row_filter),
+                                      CSVDataProcessor().read_csv_file(path, row_filter=row_filter))
+
+    def test_int_column_and_malformed_lines(self):
+        """Тест разбора чисел из буфера и пропуска некорректных строк."""
+        path = write_sample_log(self.tmp_dir.name, SAMPLE_LOG + "\nbroken;line\n")
+
+        with read_usage_columns(path) as columns:
+            self.assertEqual(len(columns), 3)
+            self.assertEqual(columns.malformed_lines, 1)
+            np.testing.assert_array_equal(columns.int_column('callDuration'), [120, -1, -1])
+            np.testing.assert_array_equal(columns.int_column('totalVolume'), [-1, 2048, -1])
+
+
+class TestStreamUsageProcessor(unittest.TestCase):
+    """Тесты для потоковой обработки без pandas"""
+
+    def test_output_matches_pandas_processor(self):
+        """Тест совпадения результата и статистики с CSVDataProcessor."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_sample_log(tmp_dir)
+
+            processor = CSVDataProcessor()
+            expected = processor.process_data(path)
+
+            stream = StreamUsageProcessor()
+            output_file = stream.process_file(path, tmp_dir)
+            result = pd.read_csv(output_file, sep=';', dtype=str, na_filter=False)
+
+            pd.testing.assert_frame_equal(result, expected)
+            self.assertEqual(stream.stats, {k: int(v) for k, v in processor.stats.items()})
+
+
+class TestProcessorService(unittest.TestCase):
+    """Тесты для сервиса с пулом прогретых процессоров"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.socket_path = os.path.join(self.tmp_dir.name, "service.sock")
+
+        self.service = ProcessorService(self.socket_path, workers=2, queue_size=4)
+        thread = threading.Thread(target=self.service.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(self.service.shutdown)
+
+        for _ in range(100):
+            if os.path.exists(self.socket_path):
+                break
+            threading.Event().wait(0.05)
+
+    def test_jobs_return_per_job_stats(self):
+        """Тест обработки нескольких заданий одним прогретым пулом."""
+        path = write_sample_log(self.tmp_dir.name)
+        output_dir = os.path.join(self.tmp_dir.name, "out")
+
+        results = [submit_job(path, output_dir, self.socket_path, timeout=30) for _ in range(3)]
+
+        for result in results:
+            self.assertEqual(result['status'], 'ok')
+            self.assertEqual(result['records'], 3)
+            self.assertEqual(result['stats']['total_calls'], 1)
+            self.assertTrue(os.path.exists(result['output_file']))
+
+        self.assertEqual(len({result['output_file'] for result in results}), 3)
+        self.assertEqual(send_request({'command': 'status'}, self.socket_path)['completed'], 3)
+
+    def test_missing_input_reports_error(self):
+        """Тест ответа сервиса на отсутствующий входной файл."""
+        result = submit_job("/nonexistent/usage.log", self.tmp_dir.name, self.socket_path, timeout=30)
+        self.assertEqual(result['status'], 'error')
+
+    def test_non_object_request_reports_error(self):
+        """Тест ответа сервиса на JSON, который не является объектом."""
+        for request in (['input_file', 'output_dir'], "status", 42):
+            result = send_request(request, self.socket_path)
+            self.assertEqual(result['status'], 'error')
+        self.assertIn('completed', send_request({'command': 'status'}, self.socket_path))
+
+
+class TestRunProcessor(unittest.TestCase):
+    """Тесты командной строки run_processor"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.input_file = write_sample_log(self.tmp_dir.name)
+
+    def test_partitioned_with_columns(self):
+        """Тест: партиции пишутся, даже если call_date не входит в --columns."""
+        for extra in ([], ['--memory-budget-mb', '256']):
+            output_dir = os.path.join(self.tmp_dir.name, f"out{len(extra)}")
+            code = run_processor_main([self.input_file, output_dir, '--partitioned', 'csv',
+                                       '--columns', 'party_msisdn,call_type'] + extra)
+            self.assertEqual(code, 0)
+
+            parts = sorted(os.path.relpath(os.path.join(root, name), output_dir)
+                           for root, _, names in os.walk(output_dir) for name in names)
+            self.assertEqual(parts, [os.path.join('date=2024-12-15', 'call_type=1', 'part-0000.csv'),
+                                     os.path.join('date=2024-12-15', 'call_type=5', 'part-0000.csv'),
+                                     os.path.join('date=2024-12-16', 'call_type=4', 'part-0000.csv')])
+            part = pd.read_csv(os.path.join(output_dir, parts[0]), sep=';', dtype=str)
+            self.assertEqual(list(part.columns), ['party_msisdn', 'call_type'])
+
+    def test_stream_engine_rejects_pandas_options(self):
+        """Тест: явный --engine stream с опцией pandas завершается ошибкой, а не подменяется pandas."""
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            with self.assertRaises(SystemExit) as raised:
+                run_processor_main([self.input_file, self.tmp_dir.name, '--engine', 'stream', '--columns', 'party_msisdn'])
+        self.assertEqual(raised.exception.code, 2)
+        self.assertIn('--columns', stderr.getvalue())
+
+    def test_rollups_with_columns(self):
+        """Тест: агрегаты считаются по всем нужным колонкам, даже если их нет в --columns."""
+        output_dir = os.path.join(self.tmp_dir.name, "out")
+        code = run_processor_main([self.input_file, output_dir, '--rollups', '--columns', 'party_msisdn,call_type'])
+        self.assertEqual(code, 0)
+
+        names = os.listdir(output_dir)
+        hourly = pd.read_csv(os.path.join(output_dir, next(name for name in names if 'rollup_hour' in name)), sep=';')
+        subscribers = pd.read_csv(os.path.join(output_dir, next(name for name in names if 'rollup_subscriber' in name)),
+                                  sep=';', dtype={'party_msisdn': str})
+        self.assertEqual(hourly['events'].sum(), 3)
+        self.assertEqual(hourly.loc[hourly['hour'] == 13, 'call_seconds'].item(), 120)
+        self.assertEqual(subscribers['volume_bytes'].sum(), 2048)
+
+        data_file = next(name for name in names if name.startswith('processed_usage_data'))
+        result = pd.read_csv(os.path.join(output_dir, data_file), sep=';', dtype=str)
+        self.assertEqual(list(result.columns), ['party_msisdn', 'call_type'])
+
+
+# Первый запуск на новой машине или после намеренного изменения скорости:
+#     RUN_PERF_TESTS=1 UPDATE_PERF_BASELINES=1 python -m pytest -k Performance
+# записывает эталоны в perf_baselines.json; затем тесты запускаются с RUN_PERF_TESTS=1
+@unittest.skipUnless(RUN_PERF_TESTS, "нагрузочные тесты: RUN_PERF_TESTS=1")
+class TestTransformPerformance(unittest.TestCase):
+    """Нагрузочные тесты transform_dataframe: масштабирование, скорость и пик памяти"""
+
+    @classmethod
+    def setUpClass(cls):
+        with open(PERF_BASELINES_PATH, 'r', encoding='utf-8') as file:
+            cls.baselines = json.load(file)
+        cls.baseline = cls.baselines['transform_dataframe']
+        cls.processor = CSVDataProcessor()
+        cls.calibration = calibration_seconds()
+
+        # Для каждого размера — лучшее время из нескольких повторов и пик памяти по tracemalloc
+        cls.seconds, cls.peak_bytes = {}, {}
+        for rows in cls.baseline['sizes']:
+            df = generate_raw_frame(rows)
+            timings = []
+            for _ in range(cls.baseline['repeats']):
+                started = time.perf_counter()
+                cls.processor.transform_dataframe(df)
+                timings.append(time.perf_counter() - started)
+            cls.seconds[rows] = min(timings)
+
+            tracemalloc.start()
+            try:
+                cls.processor.transform_dataframe(df)
+                cls.peak_bytes[rows] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        largest = max(cls.baseline['sizes'])
+        cls.rows_per_sec = largest / cls.seconds[largest]
+        # Строк за время эталонной нагрузки: не зависит от скорости машины
+        cls.rows_per_calibration = cls.rows_per_sec * cls.calibration
+        cls.peak_bytes_per_row = cls.peak_bytes[largest] / largest
+        print(f"\ntransform_dataframe: {cls.rows_per_sec:.0f} строк/с, {cls.rows_per_calibration:.0f} строк "
+              f"за эталонную нагрузку ({cls.calibration:.3f} с), пик памяти {cls.peak_bytes_per_row:.0f} байт/строку")
+
+        if UPDATE_PERF_BASELINES:
+            cls.baseline['rows_per_calibration'] = round(cls.rows_per_calibration)
+            cls.baseline['peak_bytes_per_row'] = round(cls.peak_bytes_per_row)
+            with open(PERF_BASELINES_PATH, 'w', encoding='utf-8') as file:
+                json.dump(cls.baselines, file, indent=2)
+                file.write('\n')
+
+    def test_scaling_is_linear(self):
+        """Тест: время на строку почти не растет с размером входа."""
+        sizes = sorted(self.baseline['sizes'])
+        for smaller, larger in zip(sizes, sizes[1:]):
+            ratio = (self.seconds[larger] / larger) / (self.seconds[smaller] / smaller)
+            self.assertLessEqual(ratio, self.baseline['max_scaling_ratio'],
+                                 f"время на строку выросло в {ratio:.2f} раза ({smaller} -> {larger} строк)")
+
+    def test_throughput_within_baseline(self):
+        """Тест: скорость относительно эталонной нагрузки не ниже эталона с учетом допуска."""
+        minimum = self.baseline['rows_per_calibration'] * (1 - self.baseline['rows_per_calibration_tolerance'])
+        self.assertGreaterEqual(self.rows_per_calibration, minimum,
+                                f"{self.rows_per_calibration:.0f} строк за эталонную нагрузку "
+                                f"({self.rows_per_sec:.0f} строк/с) при эталоне {self.baseline['rows_per_calibration']}")
+
+    def test_peak_memory_within_baseline(self):
+        """Тест: пик памяти на строку не выше эталона с учетом допуска."""
+        maximum = self.baseline['peak_bytes_per_row'] * (1 + self.baseline['peak_bytes_per_row_tolerance'])
+        self.assertLessEqual(self.peak_bytes_per_row, maximum,
+                             f"{self.peak_bytes_per_row:.0f} байт/строку при эталоне "
+                             f"{self.baseline['peak_bytes_per_row']}")
+
+
+
+@unittest.skipUnless(RUN_PERF_TESTS, "нагрузочные тесты: RUN_PERF_TESTS=1")
+class TestReaderPerformance(unittest.TestCase):
+    """Нагрузочный тест: mmap-чтение всех колонок быстрее pandas.read_csv"""
+
+    ROWS = 300_000
+
+    def test_mmap_reader_beats_pandas(self):
+        """Тест: лучшее время mmap-чтения меньше лучшего времени pandas на том же файле."""
+        lines = SAMPLE_LOG.splitlines(keepends=True)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_sample_log(tmp_dir, lines[0] + "".join(
+                lines[1 + i % (len(lines) - 1)].replace("1234567", f"{i:07d}") for i in range(self.ROWS)))
+
+            seconds = {}
+            for reader in ('pandas', 'mmap'):
+                processor = CSVDataProcessor(reader=reader)
+                timings = []
+                for _ in range(3):
+                    started = time.perf_counter()
+                    processor.read_csv_file(path)
+                    timings.append(time.perf_counter() - started)
+                seconds[reader] = min(timings)
+
+        print(f"\nчтение {self.ROWS} строк: pandas {seconds['pandas']:.2f} с, mmap {seconds['mmap']:.2f} с")
+        self.assertLess(seconds['mmap'], seconds['pandas'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Перевод времени UTC в часовой пояс IANA по таблице переходов.
+
+Таблица переходов строится один раз на пояс: смещение zoneinfo проверяется
+с шагом в сутки, а точный момент каждого изменения находится бинарным поиском
+по секундам (пояса с двумя переходами в одни сутки не поддерживаются).
+После этого время целой колонки переводится векторно:
+np.searchsorted находит действующий переход для каждой записи.
+"""
+
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Tuple
+from zoneinfo import ZoneInfo
+
+
+FIRST_YEAR = 1900
+LAST_YEAR = 2037
+
+_DAY = 86400
+
+
+def _offset_seconds(zone: ZoneInfo, utc_seconds: int) -> int:
+    """Смещение пояса от UTC в секундах в заданный момент."""
+    moment = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=utc_seconds)
+    return int(moment.astimezone(zone).utcoffset().total_seconds())
+
+
+@lru_cache(maxsize=None)
+def transition_table(zone_name: str, last_year: int = LAST_YEAR) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Строит таблицу переходов пояса между FIRST_YEAR и last_year.
+
+    Args:
+        zone_name: Имя пояса IANA, например 'Europe/Minsk'
+        last_year: Последний год таблицы
+
+    Returns:
+        (starts, offsets): starts — моменты UTC в секундах от эпохи, с которых действует
+        смещение offsets[i]; starts[0] — начало таблицы
+
+    Raises:
+        zoneinfo.ZoneInfoNotFoundError: если пояс не найден
+    """
+    zone = ZoneInfo(zone_name)
+    start = int((datetime(FIRST_YEAR, 1, 1, tzinfo=timezone.utc) - datetime(1970, 1, 1, tzinfo=timezone.utc))
+                .total_seconds())
+    end = int((datetime(last_year + 1, 1, 1, tzinfo=timezone.utc) - datetime(1970, 1, 1, tzinfo=timezone.utc))
+              .total_seconds())
+
+    starts = [start]
+    offsets = [_offset_seconds(zone, start)]
+    for day_start in range(start + _DAY, end + 1, _DAY):
+        offset = _offset_seconds(zone, day_start)
+        if offset == offsets[-1]:
+            continue
+
+        # Переход внутри прошедших суток: ищем первую секунду с новым смещением
+        low, high = day_start - _DAY, day_start
+        while high - low > 1:
+            middle = (low + high) // 2
+            if _offset_seconds(zone, middle) == offsets[-1]:
+                low = middle
+            else:
+                high = middle
+        starts.append(high)
+        offsets.append(offset)
+
+    return np.array(starts, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+
+def utc_to_zone(utc_seconds: np.ndarray, zone_name: str) -> np.ndarray:
+    """
+    Переводит моменты UTC в местное время пояса.
+
+    Args:
+        utc_seconds: Секунды от эпохи (int64)
+        zone_name: Имя пояса IANA
+
+    Returns:
+        np.ndarray int64 с местным временем в секундах от эпохи
+    """
+    last_year = LAST_YEAR
+    if len(utc_seconds):
+        last_year = max(LAST_YEAR, int(utc_seconds.max() // (365.2425 * _DAY)) + 1971)
+    starts, offsets = transition_table(zone_name, last_year)
+    index = np.searchsorted(starts, utc_seconds, side='right') - 1
+    return utc_seconds + offsets[np.clip(index, 0, None)]
+
+
+def convert_column(call_dates: pd.Series, zone_name: str,
+                   source_format: str = '%H:%M:%S %d/%m/%Y') -> Tuple[pd.Series, np.ndarray]:
+    """
+    Переводит колонку времени UTC в формат ISO местного времени пояса.
+
+    Args:
+        call_dates: Series со временем UTC в формате source_format
+        zone_name: Имя пояса IANA
+        source_format: Формат исходного времени
+
+    Returns:
+        (result, invalid): Series в формате YYYY-MM-DD HH24:MI:SS (нераспознанные и пустые
+        значения остаются как есть) и булев массив непустых нераспознанных значений
+    """
+    raw = call_dates.astype(str)
+    parsed = pd.to_datetime(raw, format=source_format, errors='coerce')
+    valid = parsed.notna().to_numpy()
+
+    result = raw.to_numpy(dtype=object, copy=True)
+    if valid.any():
+        utc_seconds = parsed[valid].to_numpy(dtype='datetime64[s]').astype(np.int64)
+        local = utc_to_zone(utc_seconds, zone_name).astype('datetime64[s]')
+        result[valid] = np.char.replace(np.datetime_as_string(local, unit='s'), 'T', ' ')
+
+    invalid = ~valid & (raw.str.strip() != '').to_numpy()
+    return pd.Series(result, dtype=object), invalid
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Отчеты query3/query4/query5 поверх результатов CSVDataProcessor без загрузки в БД.
+
+Читает обработанные файлы (processed_*.csv, партиции date=.../call_type=.../part-*,
+шарды shard=.../part-*) и строит отчеты векторными group-by и оконными операциями pandas:
+    * file_stats  — статистика по файлам (аналог query3.sql)
+    * ranking     — ранжирование событий абонента по времени (аналог query4.sql)
+    * cost_share  — доля стоимости события в разрезе абонента (аналог query5.sql)
+
+Стоимость событий в обработанных файлах отсутствует, поэтому она считается по тарифу
+с полями REF_TARIFF: call_tariff (за минуту), sms_tariff (за SMS), internet_tariff (за МБ).
+"""
+
+import argparse
+import glob
+import os
+import sys
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+
+REPORTS = ('file_stats', 'ranking', 'cost_share')
+CALL_TYPES = (1, 2)
+SMS_TYPES = (3, 4)
+INTERNET_TYPE = 5
+
+_NUMERIC_COLUMNS = ['call_duration', 'total_volume', 'total_quantity', 'call_type']
+
+
+def find_processed_files(path: str, day: Optional[str] = None) -> List[str]:
+    """
+    Находит обработанные файлы, отсекая партиции других дней.
+
+    Args:
+        path: Файл, директория с processed_*.csv, корень партиций date=YYYY-MM-DD
+            или корень шардов shard=NNN
+        day: Дата YYYY-MM-DD для отсечения партиций (None — все); шарды не отсекаются,
+            строки других дней отбрасывает load
+
+    Returns:
+        Отсортированный список путей к файлам
+    """
+    if os.path.isfile(path):
+        return [path]
+
+    date_dirs = glob.glob(os.path.join(path, 'date=*'))
+    if date_dirs:
+        if day is not None:
+            date_dirs = [d for d in date_dirs if os.path.basename(d) == f"date={day}"]
+        files = []
+        for date_dir in date_dirs:
+            files += glob.glob(os.path.join(date_dir, 'call_type=*', 'part-*'))
+        return sorted(files)
+
+    shard_files = glob.glob(os.path.join(path, 'shard=*', 'part-*'))
+    if shard_files:
+        return sorted(shard_files)
+
+    return sorted(glob.glob(os.path.join(path, 'processed_*.csv')) +
+                  glob.glob(os.path.join(path, 'processed_*.parquet')))
+
+
+class UsageAnalytics:
+    """
+    Встроенный аналитический режим над обработанными файлами.
+
+    Constructor args:
+        tariff: тариф для расчета стоимости (call_tariff, sms_tariff, internet_tariff)
+    """
+
+    def __init__(self, tariff: Optional[Dict[str, float]] = None):
+        self.tariff = {'call_tariff': 0.0, 'sms_tariff': 0.0, 'internet_tariff': 0.0}
+        self.tariff.update(tariff or {})
+
+    def load(self, path: str, day: Optional[str] = None) -> pd.DataFrame:
+        """
+        Читает обработанные файлы в один DataFrame с колонкой source_file.
+
+        Args:
+            path: Файл или директория с результатами обработки
+            day: Дата YYYY-MM-DD; читаются только партиции и строки этого дня
+
+        Returns:
+            DataFrame с числовыми call_duration, total_volume, total_quantity, call_type
+        """
+        frames = []
+        for file_path in find_processed_files(path, day):
+            if file_path.endswith('.parquet'):
+                frame = pd.read_parquet(file_path)
+            else:
+                frame = pd.read_csv(file_path, sep=';', dtype=str, na_filter=False)
+            frame['source_file'] = os.path.relpath(file_path, path) if os.path.isdir(path) else os.path.basename(file_path)
+            frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame()
+
+        df = pd.concat(frames, ignore_index=True)
+        df['call_date'] = df['call_date'].astype(str)
+        for column in _NUMERIC_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0)
+
+        if day is not None:
+            df = df[df['call_date'].str.startswith(day)].reset_index(drop=True)
+        return df
+
+    def event_cost(self, df: pd.DataFrame) -> pd.Series:
+        """Стоимость каждого события по тарифу."""
+        call_type = df['call_type'].to_numpy()
+        cost = np.select(
+            [np.isin(call_type, CALL_TYPES), np.isin(call_type, SMS_TYPES), call_type == INTERNET_TYPE],
+            [df['call_duration'].to_numpy() / 60.0 * self.tariff['call_tariff'],
+             np.maximum(df['total_quantity'].to_numpy(), 1) * self.tariff['sms_tariff'],
+             df['total_volume'].to_numpy() / (1024 * 1024) * self.tariff['internet_tariff']],
+            default=0.0
+        )
+        return pd.Series(cost, index=df.index)
+
+    def file_stats(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Статистика по файлам (аналог query3.sql).
+
+        Строка отчета соответствует прочитанному файлу (source_file). Для результатов
+        save_to_csv это обработанный входной файл, как в query3; в партициях и шардах
+        исходный файл строк не сохраняется, поэтому отчет строится по файлам частей
+        (date=.../call_type=.../part-NNNN, shard=.../part-NNNN): один входной файл
+        дает несколько строк отчета, а части разных входных файлов не складываются.
+
+        Args:
+            df: Результат load()
+
+        Returns:
+            DataFrame с одной строкой на source_file
+        """
+        is_call = df['call_type'].isin(CALL_TYPES)
+        work = pd.DataFrame({
+            'source_file': df['source_file'],
+            'party_msisdn': df['party_msisdn'],
+            'is_call': is_call,
+            'call_seconds': df['call_duration'].where(is_call, 0),
+            'is_sms': df['call_type'].isin(SMS_TYPES),
+            'volume': df['total_volume'].where(df['call_type'] == INTERNET_TYPE, 0),
+            'cost': self.event_cost(df)
+        })
+
+        stats = work.groupby('source_file', sort=True).agg(
+            distinct_subscribers=('party_msisdn', 'nunique'),
+            total_events=('party_msisdn', 'size'),
+            total_calls=('is_call', 'sum'),
+            total_call_seconds=('call_seconds', 'sum'),
+            total_sms=('is_sms', 'sum'),
+            total_internet_volume=('volume', 'sum'),
+            total_charges=('cost', 'sum')
+        )
+        stats['total_call_duration_minutes'] = stats.pop('total_call_seconds') / 60.0
+        stats['total_internet_volume_mib'] = stats.pop('total_internet_volume') / (1024 * 1024)
+        return stats.reset_index()
+
+    def rank_events(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Ранжирование событий абонента по времени (аналог query4.sql).
+
+        Args:
+            df: Результат load()
+
+        Returns:
+            DataFrame с колонкой event_rank (1 — последнее событие абонента),
+            отсортированный по party_msisdn, call_date
+        """
+        ranked = df.sort_values(['party_msisdn', 'call_date'], ascending=[True, False], kind='stable')
+        ranked = ranked.assign(event_rank=ranked.groupby('party_msisdn', sort=False).cumcount() + 1)
+        return ranked.sort_values(['party_msisdn', 'call_date'], kind='stable').reset_index(drop=True)
+
+    def cost_share(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Доля стоимости каждого события в разрезе абонента и дня (аналог query5.sql).
+
+        Args:
+            df: Результат load()
+
+        Returns:
+            DataFrame с колонками event_cost, total_daily_cost, cost_percentage
+        """
+        result = df.assign(event_cost=self.event_cost(df))
+        # Итог считается за день события, как в query5, даже если загружено несколько дней
+        day = result['call_date'].str.slice(0, 10)
+        result['total_daily_cost'] = result.groupby([result['party_msisdn'], day], sort=False)['event_cost'].transform('sum')
+        share = np.where(result['total_daily_cost'] > 0,
+                         result['event_cost'] / result['total_daily_cost'].where(result['total_daily_cost'] > 0, 1) * 100,
+                         0.0)
+        result['cost_percentage'] = np.round(share, 2)
+        return result.sort_values(['party_msisdn', 'call_date'], kind='stable').reset_index(drop=True)
+
+    def run(self, report: str, path: str, day: Optional[str] = None) -> pd.DataFrame:
+        """Загружает данные и строит отчет по имени из REPORTS."""
+        if report not in REPORTS:
+            raise ValueError(f"неизвестный отчет {report}, ожидается один из {REPORTS}")
+        df = self.load(path, day)
+        if df.empty:
+            return df
+        return getattr(self, {'ranking': 'rank_events'}.get(report, report))(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Отчеты по обработанным логам без загрузки в БД")
+    parser.add_argument('path', help="файл, директория processed_*.csv или корень партиций")
+    parser.add_argument('--report', choices=REPORTS, default='file_stats')
+    parser.add_argument('--date', help="день отчета YYYY-MM-DD")
+    parser.add_argument('--call-tariff', type=float, default=0.0)
+    parser.add_argument('--sms-tariff', type=float, default=0.0)
+    parser.add_argument('--internet-tariff', type=float, default=0.0)
+    parser.add_argument('--output', help="сохранить отчет в CSV вместо вывода в терминал")
+    args = parser.parse_args(argv)
+
+    analytics = UsageAnalytics({'call_tariff': args.call_tariff, 'sms_tariff': args.sms_tariff,
+                                'internet_tariff': args.internet_tariff})
+    report = analytics.run(args.report, args.path, args.date)
+
+    if report.empty:
+        print("Нет данных для отчета")
+        return 1
+    if args.output:
+        report.to_csv(args.output, index=False, sep=';', encoding='utf-8')
+        print(f"Отчет сохранен в файл: {args.output}")
+    else:
+        print(report.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
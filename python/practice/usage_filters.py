@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Фильтры строк, проталкиваемые в чтение лога.
+
+Фильтр проверяется в два этапа:
+    * raw_mask   — по сырым колонкам прямо при чтении, до трансформации: тип вызова
+                   и префикс MSISDN проверяются точно, дата — с запасом в сутки,
+                   так как смещение часового пояса еще не применено;
+    * exact_mask — по call_date после перевода в местное время.
+Диапазон дат полуоткрытый: date_from <= call_date < date_to.
+"""
+
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Optional, Set
+
+from usage_schema import UsageSchema
+
+
+FILTER_KEYS = ('call_types', 'msisdn_prefix', 'date_from', 'date_to')
+
+
+def normalize_msisdn(phone_series: pd.Series) -> pd.Series:
+    """
+    Векторная нормализация номеров, совпадающая с CSVDataProcessor.normalize_phone_number.
+
+    Args:
+        phone_series: Series с исходными номерами
+
+    Returns:
+        Series с нормализованными номерами
+    """
+    digits = phone_series.astype(str).str.replace(r'^\d+\.\d+\.', '', regex=True)
+    digits = digits.str.replace(r'[^\d]', '', regex=True)
+    lengths = digits.str.len()
+    normalized = np.select(
+        [digits.str.startswith('375'),
+         digits.str.startswith('80') & (lengths >= 11),
+         lengths >= 9],
+        [digits, '375' + digits.str.slice(2), '375' + digits],
+        default=digits
+    )
+    return pd.Series(normalized, index=phone_series.index, dtype=object)
+
+
+class RowFilter:
+    """
+    Условия отбора записей.
+
+    Constructor args:
+        call_types: допустимые коды типов вызова (1-5)
+        msisdn_prefix: префикс нормализованного номера абонента (например, '37529')
+        date_from: начало периода YYYY-MM-DD (включительно)
+        date_to: конец периода YYYY-MM-DD (не включительно)
+    """
+
+    def __init__(self, call_types: Optional[Iterable[int]] = None, msisdn_prefix: Optional[str] = None,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None):
+        self.call_types = sorted(int(code) for code in call_types) if call_types else None
+        self.msisdn_prefix = msisdn_prefix or None
+        self.date_from = date.fromisoformat(date_from) if date_from else None
+        self.date_to = date.fromisoformat(date_to) if date_to else None
+
+    @classmethod
+    def from_dict(cls, filters: Optional[Dict[str, Any]]) -> Optional['RowFilter']:
+        """Создает фильтр из словаря с ключами FILTER_KEYS; пустой словарь — без фильтра."""
+        if not filters:
+            return None
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"неизвестные условия фильтра: {', '.join(sorted(unknown))}")
+        return cls(**filters)
+
+    @property
+    def has_date_range(self) -> bool:
+        return self.date_from is not None or self.date_to is not None
+
+    def source_columns(self, schema: UsageSchema) -> Set[str]:
+        """Исходные колонки, нужные для проверки при чтении."""
+        columns = set()
+        if self.call_types is not None:
+            columns.update(schema.call_type_sources.values())
+        for step in schema.steps:
+            if step.output == 'party_msisdn' and self.msisdn_prefix is not None:
+                columns.add(step.source)
+            if step.output == 'call_date' and self.has_date_range:
+                columns.add(step.source)
+        return columns
+
+    def raw_mask(self, df: pd.DataFrame, schema: UsageSchema,
+                 call_types: Optional[pd.Series] = None) -> np.ndarray:
+        """
+        Отбор по сырым колонкам до трансформации.
+
+        Args:
+            df: DataFrame с исходными колонками
+            schema: Схема входного формата
+            call_types: Коды типов вызова тех же строк (нужны, если задан call_types)
+
+        Returns:
+            Булев массив: True — строку нужно обработать
+        """
+        mask = np.ones(len(df), dtype=bool)
+        sources = {step.output: step.source for step in schema.steps}
+
+        if self.call_types is not None and call_types is not None:
+            mask &= np.isin(np.asarray(call_types), self.call_types)
+
+        msisdn_source = sources.get('party_msisdn')
+        if self.msisdn_prefix is not None and msisdn_source in df.columns:
+            mask &= normalize_msisdn(df[msisdn_source]).str.startswith(self.msisdn_prefix).to_numpy(dtype=bool)
+
+        date_source = sources.get('call_date')
+        if self.has_date_range and date_source in df.columns:
+            # Исходный формат "HH:MM:SS DD/MM/YYYY"; смещение пояса сдвигает дату не более чем на сутки
+            raw_dates = pd.to_datetime(df[date_source].astype(str).str.split(' ').str[-1],
+                                       format='%d/%m/%Y', errors='coerce')
+            keep = raw_dates.isna().to_numpy()
+            in_range = np.ones(len(df), dtype=bool)
+            if self.date_from is not None:
+                in_range &= (raw_dates >= pd.Timestamp(self.date_from - timedelta(days=1))).to_numpy()
+            if self.date_to is not None:
+                in_range &= (raw_dates < pd.Timestamp(self.date_to + timedelta(days=1))).to_numpy()
+            mask &= keep | in_range
+
+        return mask
+
+    def exact_mask(self, transformed_df: pd.DataFrame) -> np.ndarray:
+        """
+        Точный отбор по call_date после перевода в местное время.
+
+        Args:
+            transformed_df: Трансформированный DataFrame
+
+        Returns:
+            Булев массив: True — строка входит в период
+        """
+        mask = np.ones(len(transformed_df), dtype=bool)
+        if not self.has_date_range or 'call_date' not in transformed_df.columns:
+            return mask
+
+        # call_date в формате ISO, поэтому дни сравниваются как строки
+        days = transformed_df['call_date'].astype(str).str.slice(0, 10)
+        valid = days.str.match(r'^\d{4}-\d{2}-\d{2}$').to_numpy(dtype=bool)
+        mask &= valid
+        if self.date_from is not None:
+            mask &= (days >= self.date_from.isoformat()).to_numpy()
+        if self.date_to is not None:
+            mask &= (days < self.date_to.isoformat()).to_numpy()
+        return mask
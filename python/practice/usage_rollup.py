@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Агрегаты потребления по абонентам и по часам суток.
+
+Агрегаты считаются в том же проходе, что и трансформация: номера кодируются
+словарем (pd.factorize), суммы собираются через np.bincount, а результаты
+отдельных пачек и файлов складываются методом merge.
+
+Агрегаты пачек по абонентам не складываются с накопленными на каждой пачке
+(это перевыравнивало бы растущий индекс абонентов на каждую пачку): они
+копятся списком и сворачиваются одним groupby при чтении by_subscriber или
+когда строк в списке становится больше, чем в уже свернутом результате.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List
+
+
+SUBSCRIBER_METRICS = ['events', 'calls', 'call_seconds', 'sms', 'volume_bytes']
+# Выходные колонки, по которым считаются агрегаты
+ROLLUP_COLUMNS = ['party_msisdn', 'call_date', 'call_duration', 'total_volume', 'total_quantity']
+
+# Несвернутые агрегаты пачек сворачиваются не раньше, чем наберут столько строк
+_COMPACT_MIN_ROWS = 100_000
+
+
+class UsageRollup:
+    """
+    Накопитель агрегатов по party_msisdn и по часу соединения.
+
+    Attributes:
+        by_subscriber: DataFrame с метриками SUBSCRIBER_METRICS, индекс — party_msisdn
+            (свойство: агрегаты пачек сворачиваются при обращении)
+        by_hour: DataFrame с теми же метриками, индекс — час суток (0-23)
+    """
+
+    def __init__(self):
+        self._by_subscriber = self._empty_frame(pd.Index([], name='party_msisdn', dtype=object))
+        self._subscriber_parts: List[pd.DataFrame] = []
+        self._pending_rows = 0
+        self.by_hour = self._empty_frame(pd.RangeIndex(24, name='hour'))
+
+    @property
+    def by_subscriber(self) -> pd.DataFrame:
+        """Агрегаты по абонентам (накопленные пачки сворачиваются при обращении)."""
+        self._compact()
+        return self._by_subscriber
+
+    def _add_subscriber_part(self, part: pd.DataFrame):
+        """Добавляет агрегаты пачки; сворачивает список, когда он перерастает результат."""
+        self._subscriber_parts.append(part)
+        self._pending_rows += len(part)
+        # Сворачивание стоит O(результат + список), поэтому общее время остается линейным
+        if self._pending_rows > max(len(self._by_subscriber), _COMPACT_MIN_ROWS):
+            self._compact()
+
+    def _compact(self):
+        """Сворачивает накопленные агрегаты пачек одним groupby."""
+        if not self._subscriber_parts:
+            return
+        combined = pd.concat([self._by_subscriber] + self._subscriber_parts)
+        self._by_subscriber = combined.groupby(level=0, sort=False).sum()
+        self._subscriber_parts = []
+        self._pending_rows = 0
+
+    @staticmethod
+    def _empty_frame(index: pd.Index) -> pd.DataFrame:
+        return pd.DataFrame(0.0, index=index, columns=SUBSCRIBER_METRICS)
+
+    @staticmethod
+    def _aggregate(codes: np.ndarray, size: int, metrics: dict) -> dict:
+        """Суммирует метрики по кодам групп; отрицательные коды пропускаются."""
+        valid = codes >= 0
+        return {
+            name: np.bincount(codes[valid], weights=values[valid], minlength=size)
+            for name, values in metrics.items()
+        }
+
+    def update(self, df: pd.DataFrame, call_types: pd.Series):
+        """
+        Добавляет к агрегатам пачку трансформированных записей.
+
+        Args:
+            df: Трансформированный DataFrame (party_msisdn, call_date, call_duration, ...)
+            call_types: Series с кодами типов вызова (1-5) для тех же строк
+        """
+        types = np.asarray(call_types)
+        is_call = np.isin(types, [1, 2])
+        is_sms = np.isin(types, [3, 4])
+        is_internet = types == 5
+
+        def numeric(column: str) -> np.ndarray:
+            if column not in df.columns:
+                return np.zeros(len(df))
+            return pd.to_numeric(df[column], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+        metrics = {
+            'events': np.ones(len(df)),
+            'calls': is_call.astype(float),
+            'call_seconds': np.where(is_call, numeric('call_duration'), 0.0),
+            'sms': np.where(is_sms, numeric('total_quantity'), 0.0),
+            'volume_bytes': np.where(is_internet, numeric('total_volume'), 0.0)
+        }
+
+        codes, uniques = pd.factorize(df['party_msisdn'].to_numpy(dtype=object))
+        batch = pd.DataFrame(self._aggregate(codes, len(uniques), metrics),
+                             index=pd.Index(uniques, name='party_msisdn', dtype=object))
+        self._add_subscriber_part(batch)
+
+        if 'call_date' not in df.columns:
+            return
+
+        # Час берется из call_date в формате ISO после перевода в местное время
+        hours = pd.to_numeric(df['call_date'].astype(str).str.slice(11, 13), errors='coerce')
+        hour_codes = hours.fillna(-1).to_numpy(dtype=np.int64, copy=True)
+        hour_codes[(hour_codes < 0) | (hour_codes > 23)] = -1
+        self.by_hour += pd.DataFrame(self._aggregate(hour_codes, 24, metrics), index=self.by_hour.index)
+
+    def merge(self, other: "UsageRollup") -> "UsageRollup":
+        """
+        Добавляет агрегаты другого накопителя (другой пачки, файла или узла).
+
+        Args:
+            other: UsageRollup для слияния
+
+        Returns:
+            self
+        """
+        self._add_subscriber_part(other.by_subscriber)
+        self.by_hour = self.by_hour.add(other.by_hour, fill_value=0)
+        return self
+
+    @staticmethod
+    def _with_units(frame: pd.DataFrame) -> pd.DataFrame:
+        """Приводит счетчики к целым и добавляет минуты и мегабайты."""
+        result = frame.round().astype('int64')
+        result['call_minutes'] = frame['call_seconds'] / 60.0
+        result['volume_mb'] = frame['volume_bytes'] / (1024 * 1024)
+        return result
+
+    def subscriber_frame(self) -> pd.DataFrame:
+        """Возвращает агрегаты по абонентам, отсортированные по номеру."""
+        return self._with_units(self.by_subscriber.sort_index()).reset_index()
+
+    def hourly_frame(self) -> pd.DataFrame:
+        """Возвращает агрегаты по часам суток."""
+        return self._with_units(self.by_hour).reset_index()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Декларативное описание формата входного лога.
+
+Схема в JSON задает выходные колонки (в порядке вывода), для каждой — исходную
+колонку, преобразование и тип, а также исходные колонки, по которым определяется
+тип вызова. Схема компилируется один раз в UsageSchema: список шагов по колонкам
+и набор реально нужных исходных колонок, который передается в read_csv(usecols=...).
+Формат другого коммутатора подключается новым файлом схемы без изменения кода.
+
+Пример колонки:
+    "call_date": {"source": "callDate", "transform": "local_time",
+                  "offset_source": "timeZoneOffset", "type": "str"}
+"""
+
+import json
+import os
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas', 'usage_data.json')
+
+# copy — без изменений, phone — нормализация номера, local_time — перевод в местное время
+TRANSFORMS = ('copy', 'phone', 'local_time')
+TYPES = ('str', 'int', 'float')
+CALL_TYPE_SOURCES = ('duration', 'volume', 'quantity', 'called_party', 'calling_party')
+
+
+class ColumnStep(NamedTuple):
+    """Шаг плана: как получить одну выходную колонку."""
+    output: str
+    source: str
+    transform: str
+    offset_source: Optional[str]
+    type: str
+
+
+class UsageSchema:
+    """
+    Скомпилированная схема входного формата.
+
+    Attributes:
+        name: имя схемы
+        delimiter: разделитель колонок (None — определяется по заголовку)
+        steps: шаги ColumnStep в порядке выходных колонок
+        call_type_output: имя выходной колонки с типом вызова
+        call_type_sources: исходные колонки для определения типа вызова (CALL_TYPE_SOURCES)
+        call_type_map: названия типов вызова по коду
+        required_columns: исходные колонки, которые нужно читать из файла
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.name = config.get('name', 'custom')
+        self.delimiter = config.get('delimiter')
+
+        columns = config.get('columns')
+        if not columns:
+            raise ValueError(f"схема {self.name}: не задан раздел columns")
+
+        self.steps: List[ColumnStep] = []
+        for output, spec in columns.items():
+            step = ColumnStep(output, spec.get('source', output), spec.get('transform', 'copy'),
+                              spec.get('offset_source'), spec.get('type', 'str'))
+            if step.transform not in TRANSFORMS:
+                raise ValueError(f"схема {self.name}: неизвестное преобразование {step.transform} для {output}")
+            if step.type not in TYPES:
+                raise ValueError(f"схема {self.name}: неизвестный тип {step.type} для {output}")
+            if step.transform == 'local_time' and not step.offset_source:
+                raise ValueError(f"схема {self.name}: для {output} не задан offset_source")
+            self.steps.append(step)
+
+        call_type = config.get('call_type', {})
+        missing = [key for key in CALL_TYPE_SOURCES if key not in call_type]
+        if missing:
+            raise ValueError(f"схема {self.name}: в call_type не заданы {', '.join(missing)}")
+        self.call_type_output = call_type.get('output', 'call_type')
+        self.call_type_sources = {key: call_type[key] for key in CALL_TYPE_SOURCES}
+        self.call_type_map = {int(code): name for code, name in call_type.get('names', {}).items()}
+
+        required = set(self.call_type_sources.values())
+        for step in self.steps:
+            required.add(step.source)
+            if step.offset_source:
+                required.add(step.offset_source)
+        self.required_columns = frozenset(required)
+
+    @property
+    def output_columns(self) -> List[str]:
+        """Выходные колонки в порядке вывода, включая тип вызова."""
+        return [step.output for step in self.steps] + [self.call_type_output]
+
+    @property
+    def column_mapping(self) -> Dict[str, str]:
+        """Соответствие исходных колонок выходным."""
+        return {step.source: step.output for step in self.steps}
+
+    def usecols(self, column: str) -> bool:
+        """Фильтр для read_csv(usecols=...): отсутствующие в файле колонки не вызывают ошибку."""
+        return column in self.required_columns
+
+
+def load_schema(path: Optional[str] = None) -> UsageSchema:
+    """
+    Загружает и компилирует схему из JSON-файла.
+
+    Args:
+        path: Путь к файлу схемы (None — стандартный формат usage_data)
+
+    Returns:
+        UsageSchema
+    """
+    with open(path or DEFAULT_SCHEMA_PATH, 'r', encoding='utf-8') as file:
+        return UsageSchema(json.load(file))
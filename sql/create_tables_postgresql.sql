@@ -22,6 +22,8 @@ CREATE TABLE USAGE_FILE_HISTORY (
 );
 
 -- USAGE_DATA_HISTORY
+-- Секционирована по дням по CALL_DATE: отчеты за день читают одну партицию.
+-- Дневные партиции создает fnc_create_usage_data_partitions (pgsql_fnc_create_usage_partitions.sql).
 
 CREATE TABLE USAGE_DATA_HISTORY (
     PARTY_ID VARCHAR(50) NOT NULL,
@@ -35,6 +37,27 @@ CREATE TABLE USAGE_DATA_HISTORY (
     DISCOUNT_AMOUNT DECIMAL(10,2) DEFAULT 0,
     FILE_ID INTEGER,
     FOREIGN KEY (FILE_ID) REFERENCES USAGE_FILE_HISTORY(FILE_ID)
+) PARTITION BY RANGE (CALL_DATE);
+
+-- Партиция по умолчанию для строк, для дня которых еще нет партиции
+CREATE TABLE USAGE_DATA_HISTORY_DEFAULT PARTITION OF USAGE_DATA_HISTORY DEFAULT;
+
+-- USAGE_FILE_STATS
+-- Статистика по файлу, заполняется при загрузке функцией refresh_usage_file_stats
+-- (pgsql_fnc_refresh_usage_file_stats.sql). Длительность и объем хранятся в исходных единицах.
+
+CREATE TABLE USAGE_FILE_STATS (
+    FILE_ID INTEGER PRIMARY KEY,
+    DISTINCT_SUBSCRIBERS INTEGER NOT NULL,
+    TOTAL_EVENTS INTEGER NOT NULL,
+    TOTAL_CALLS INTEGER NOT NULL,
+    TOTAL_CALL_DURATION BIGINT NOT NULL,
+    TOTAL_SMS INTEGER NOT NULL,
+    TOTAL_INTERNET_VOLUME BIGINT NOT NULL,
+    TOTAL_CHARGES_WITHOUT_DISCOUNT DECIMAL(14,2) NOT NULL,
+    TOTAL_CHARGES_WITH_DISCOUNT DECIMAL(14,2) NOT NULL,
+    UPDATED_DATE TIMESTAMP NOT NULL,
+    FOREIGN KEY (FILE_ID) REFERENCES USAGE_FILE_HISTORY(FILE_ID)
 );
 
 -- REF_TARIFF
@@ -69,7 +92,9 @@ CREATE INDEX idx_phone_catalog_installment ON PHONE_CATALOG(INSTALLMENT);
 CREATE INDEX idx_usage_data_history_party_id ON USAGE_DATA_HISTORY(PARTY_ID);
 CREATE INDEX idx_usage_data_history_call_date ON USAGE_DATA_HISTORY(CALL_DATE);
 CREATE INDEX idx_usage_data_history_service_id ON USAGE_DATA_HISTORY(SERVICE_ID);
-CREATE INDEX idx_usage_data_history_file_id ON USAGE_DATA_HISTORY(FILE_ID);
+-- Покрывающий индекс для агрегации по FILE_ID в refresh_usage_file_stats (index-only scan без чтения строк)
+CREATE INDEX idx_usage_data_history_file_id ON USAGE_DATA_HISTORY(FILE_ID)
+    INCLUDE (PARTY_ID, SERVICE_ID, CALL_DURATION, TOTAL_VOLUME, CHARGE_AMOUNT, DISCOUNT_AMOUNT);
 
 CREATE INDEX idx_usage_file_history_file_date ON USAGE_FILE_HISTORY(FILE_DATE);
 
@@ -0,0 +1,136 @@
+--------------------------------------------------------------------------------------------------------------------------------
+/* Обслуживание дневных партиций таблицы USAGE_DATA_HISTORY (секционирование по CALL_DATE)
+Функция:
+1. Создает партиции usage_data_history_pYYYYMMDD на p_days_ahead дней вперед начиная с p_start_date.
+2. Если в партиции по умолчанию уже есть строки за создаваемый день, переносит их в новую партицию.
+3. При заданном p_retention_days удаляет партиции старше p_start_date - p_retention_days.
+4. Записывает информацию об операции в таблицу OPERATION_LOG.
+*/
+-- PostgreSQL
+--------------------------------------------------------------------------------------------------------------------------------
+
+create or replace function fnc_create_usage_data_partitions(
+    p_start_date date default current_date,
+    p_days_ahead integer default 7,
+    p_retention_days integer default null
+)
+returns text
+language plpgsql
+as $$
+declare
+    v_log_id integer;
+    v_start_time timestamp;
+    v_end_time timestamp;
+    v_message text;
+    v_result text;
+    v_day date;
+    v_partition_name text;
+    v_created integer := 0;
+    v_moved integer := 0;
+    v_dropped integer := 0;
+    v_rows integer;
+    v_old record;
+begin
+    -- Время старта
+    v_start_time := current_timestamp;
+    -- Вставка записи в OPERATION_LOG
+    insert into operation_log (
+        operation_type,
+        table_name,
+        start_date,
+        status,
+        message
+    ) values (
+        'PARTITION',
+        'USAGE_DATA_HISTORY',
+        v_start_time,
+        'P',
+        'Начало обслуживания партиций с ' || p_start_date || ' на ' || p_days_ahead || ' дн.'
+    ) returning id into v_log_id;
+
+    begin
+        for i in 0 .. p_days_ahead - 1 loop
+            v_day := p_start_date + i;
+            v_partition_name := 'usage_data_history_p' || to_char(v_day, 'YYYYMMDD');
+
+            if to_regclass(v_partition_name) is null then
+                -- Создаем таблицу отдельно, переносим строки из партиции по умолчанию
+                -- и только потом подключаем: иначе attach упадет на конфликтующих строках
+                execute format(
+                    'create table %I (like usage_data_history including defaults including constraints)',
+                    v_partition_name);
+
+                execute format(
+                    'with moved as (
+                        delete from usage_data_history_default
+                        where call_date >= %L and call_date < %L
+                        returning *
+                    )
+                    insert into %I select * from moved',
+                    v_day, v_day + 1, v_partition_name);
+                get diagnostics v_rows = row_count;
+                v_moved := v_moved + v_rows;
+
+                execute format(
+                    'alter table usage_data_history attach partition %I for values from (%L) to (%L)',
+                    v_partition_name, v_day, v_day + 1);
+
+                v_created := v_created + 1;
+            end if;
+        end loop;
+
+        -- Удаление партиций старше срока хранения
+        if p_retention_days is not null then
+            for v_old in
+                select c.relname
+                from pg_inherits i
+                    join pg_class c on c.oid = i.inhrelid
+                    join pg_class p on p.oid = i.inhparent
+                where p.relname = 'usage_data_history'
+                and c.relname ~ '^usage_data_history_p[0-9]{8}$'
+                and to_date(right(c.relname, 8), 'YYYYMMDD') < p_start_date - p_retention_days
+            loop
+                execute format('drop table %I', v_old.relname);
+                v_dropped := v_dropped + 1;
+            end loop;
+        end if;
+
+        -- Время завершения
+        v_end_time := current_timestamp;
+        v_message := 'Обслуживание партиций выполнено успешно. Создано: ' || v_created ||
+                     ', перенесено строк из партиции по умолчанию: ' || v_moved ||
+                     ', удалено: ' || v_dropped;
+        v_result := 'SUCCESS: ' || v_message;
+
+        -- Обновление записи в OPERATION_LOG
+        update operation_log
+        set
+            end_date = v_end_time,
+            status = 'D',
+            message = v_message
+        where id = v_log_id;
+
+    exception
+        when others then
+            -- Время завершения
+            v_end_time := current_timestamp;
+            v_message := 'Ошибка при обслуживании партиций: ' || sqlerrm;
+            v_result := 'ERROR: ' || v_message;
+
+            -- Обновление записи в OPERATION_LOG
+            update operation_log
+            set
+                end_date = v_end_time,
+                status = 'F',
+                message = v_message
+            where id = v_log_id;
+
+            -- Повторный вызов исключения
+            raise;
+    end;
+
+    -- Возврат результата операции
+    raise notice '%', v_result;
+    return v_result;
+end;
+$$;
@@ -0,0 +1,115 @@
+--------------------------------------------------------------------------------------------------------------------------------
+/* Пакетная вставка тарифов в таблицу REF_TARIFF с одной записью в OPERATION_LOG
+В отличие от insert_tariff_with_logging функция:
+1. Принимает весь каталог тарифов одним аргументом: массив JSON-объектов с полями
+   rate_plan_id, monthly_fee, call_tariff, sms_tariff, internet_tariff, tariff_date.
+2. Вставляет все тарифы одной командой insert ... select.
+3. Записывает одну запись в OPERATION_LOG с количеством строк и временем выполнения.
+
+Пример:
+    select insert_tariffs_batch_with_logging('[
+        {"rate_plan_id": 1, "monthly_fee": 10.50, "call_tariff": 0.05, "sms_tariff": 0.02,
+         "internet_tariff": 0.01, "tariff_date": "2024-12-01"}
+    ]'::jsonb);
+*/
+-- PostgreSQL
+--------------------------------------------------------------------------------------------------------------------------------
+
+create or replace function insert_tariffs_batch_with_logging(
+    p_tariffs jsonb
+)
+returns text
+language plpgsql
+as $$
+declare
+    v_log_id integer;
+    v_start_time timestamp;
+    v_end_time timestamp;
+    v_message text;
+    v_result text;
+    v_expected integer;
+    v_inserted integer;
+begin
+    -- Время старта (clock_timestamp, чтобы время выполнения не зависело от начала транзакции)
+    v_start_time := clock_timestamp();
+    v_expected := jsonb_array_length(p_tariffs);
+    -- Вставка записи в OPERATION_LOG
+    insert into operation_log (
+        operation_type,
+        table_name,
+        start_date,
+        status,
+        message
+    ) values (
+        'BATCH_INSERT',
+        'REF_TARIFF',
+        v_start_time,
+        'P',
+        'Начало пакетной вставки тарифов, количество: ' || v_expected
+    ) returning id into v_log_id;
+
+    begin
+        -- Вставка всех тарифов одной командой
+        insert into ref_tariff (
+            rate_plan_id,
+            monthly_fee,
+            call_tariff,
+            sms_tariff,
+            internet_tariff,
+            tariff_date
+        )
+        select
+            t.rate_plan_id,
+            t.monthly_fee,
+            t.call_tariff,
+            t.sms_tariff,
+            t.internet_tariff,
+            t.tariff_date
+        from jsonb_to_recordset(p_tariffs) as t(
+            rate_plan_id integer,
+            monthly_fee decimal(10,2),
+            call_tariff decimal(10,2),
+            sms_tariff decimal(10,2),
+            internet_tariff decimal(10,2),
+            tariff_date date
+        );
+        get diagnostics v_inserted = row_count;
+
+        -- Время завершения
+        v_end_time := clock_timestamp();
+        v_message := 'Операция выполнена успешно. Добавлено тарифов в таблицу REF_TARIFF: ' || v_inserted ||
+                     ' из ' || v_expected || ', время выполнения: ' ||
+                     round((extract(epoch from (v_end_time - v_start_time)) * 1000)::numeric, 3) || ' мс';
+        v_result := 'SUCCESS: ' || v_message;
+
+        -- Обновление записи в OPERATION_LOG
+        update operation_log
+        set
+            end_date = v_end_time,
+            status = 'D',
+            message = v_message
+        where id = v_log_id;
+
+    exception
+        when others then
+            -- Время завершения
+            v_end_time := clock_timestamp();
+            v_message := 'Ошибка при пакетной вставке тарифов: ' || sqlerrm;
+            v_result := 'ERROR: ' || v_message;
+
+            -- Обновление записи в OPERATION_LOG
+            update operation_log
+            set
+                end_date = v_end_time,
+                status = 'F',
+                message = v_message
+            where id = v_log_id;
+
+            -- Повторный вызов исключения
+            raise;
+    end;
+
+    -- Возврат результата операции
+    return v_result;
+end;
+$$;
@@ -0,0 +1,151 @@
+--------------------------------------------------------------------------------------------------------------------------------
+/* Заполнение статистики по файлу в таблице USAGE_FILE_STATS
+Функция вызывается загрузчиком (TableDataProcessor.load_data) после загрузки строк каждого файла
+в USAGE_DATA_HISTORY и:
+1. Добавляет запись в таблицу OPERATION_LOG в начале и обновляет её в конце.
+2. Считает статистику только по строкам указанного файла (покрывающий индекс idx_usage_data_history_file_id).
+3. Вставляет или обновляет строку USAGE_FILE_STATS, поэтому повторная загрузка файла пересчитывает статистику.
+*/
+-- PostgreSQL
+--------------------------------------------------------------------------------------------------------------------------------
+
+create or replace function refresh_usage_file_stats(
+    p_file_id integer
+)
+returns text
+language plpgsql
+as $$
+declare
+    v_log_id integer;
+    v_start_time timestamp;
+    v_end_time timestamp;
+    v_message text;
+    v_result text;
+    v_total_events integer;
+begin
+    -- Время старта
+    v_start_time := current_timestamp;
+    -- Вставка записи в OPERATION_LOG
+    insert into operation_log (
+        operation_type,
+        table_name,
+        start_date,
+        status,
+        message
+    ) values (
+        'UPSERT',
+        'USAGE_FILE_STATS',
+        v_start_time,
+        'P',
+        'Начало расчета статистики файла с ID: ' || p_file_id
+    ) returning id into v_log_id;
+
+    begin
+        -- Расчет и сохранение статистики файла
+        insert into usage_file_stats (
+            file_id,
+            distinct_subscribers,
+            total_events,
+            total_calls,
+            total_call_duration,
+            total_sms,
+            total_internet_volume,
+            total_charges_without_discount,
+            total_charges_with_discount,
+            updated_date
+        )
+        select
+            p_file_id
+            ,count(distinct udh.party_id)
+            ,count(*)
+            ,count(case when udh.service_id = 1 then 1 end)
+            ,coalesce(sum(case when udh.service_id = 1 then udh.call_duration end), 0)
+            ,count(case when udh.service_id = 2 then 1 end)
+            ,coalesce(sum(case when udh.service_id = 3 then udh.total_volume end), 0)
+            ,coalesce(sum(udh.charge_amount), 0)
+            ,coalesce(sum(udh.charge_amount - udh.discount_amount), 0)
+            ,current_timestamp
+        from usage_data_history udh
+        where udh.file_id = p_file_id
+        on conflict (file_id) do update
+        set
+            distinct_subscribers = excluded.distinct_subscribers,
+            total_events = excluded.total_events,
+            total_calls = excluded.total_calls,
+            total_call_duration = excluded.total_call_duration,
+            total_sms = excluded.total_sms,
+            total_internet_volume = excluded.total_internet_volume,
+            total_charges_without_discount = excluded.total_charges_without_discount,
+            total_charges_with_discount = excluded.total_charges_with_discount,
+            updated_date = excluded.updated_date
+        returning total_events into v_total_events;
+
+        -- Время завершения
+        v_end_time := current_timestamp;
+        v_message := 'Операция выполнена успешно. Статистика файла с ID ' || p_file_id ||
+                     ' обновлена, событий: ' || v_total_events;
+        v_result := 'SUCCESS: ' || v_message;
+
+        -- Обновление записи в OPERATION_LOG
+        update operation_log
+        set
+            end_date = v_end_time,
+            status = 'D',
+            message = v_message
+        where id = v_log_id;
+
+    exception
+        when others then
+            -- Время завершения
+            v_end_time := current_timestamp;
+            v_message := 'Ошибка при расчете статистики файла: ' || sqlerrm;
+            v_result := 'ERROR: ' || v_message;
+
+            -- Обновление записи в OPERATION_LOG
+            update operation_log
+            set
+                end_date = v_end_time,
+                status = 'F',
+                message = v_message
+            where id = v_log_id;
+
+            -- Повторный вызов исключения
+            raise;
+    end;
+
+    -- Возврат результата операции
+    return v_result;
+end;
+$$;
+
+
+--------------------------------------------------------------------------------------------------------------------------------
+/* Разовое заполнение USAGE_FILE_STATS для файлов, загруженных до появления таблицы
+Для каждого файла из USAGE_FILE_HISTORY без строки статистики вызывается refresh_usage_file_stats.
+Повторный запуск безопасен: файлы, для которых статистика уже есть, пропускаются.
+*/
+-- PostgreSQL
+--------------------------------------------------------------------------------------------------------------------------------
+
+do $$
+declare
+    v_file_id integer;
+    v_files integer := 0;
+begin
+    for v_file_id in
+        select ufh.file_id
+        from usage_file_history ufh
+        where not exists (
+            select 1
+            from usage_file_stats ufs
+            where ufs.file_id = ufh.file_id
+        )
+        order by ufh.file_id
+    loop
+        perform refresh_usage_file_stats(v_file_id);
+        v_files := v_files + 1;
+    end loop;
+
+    raise notice 'Статистика досчитана для файлов: %', v_files;
+end;
+$$;
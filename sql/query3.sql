@@ -9,6 +9,11 @@
     * Общий объём всех интернет сессий в мегабайтах.
     * Сумма всех списаний без скидки.
     * Сумма всех списаний со скидкой.
+
+Статистика берется из USAGE_FILE_STATS, которую заполняет refresh_usage_file_stats: загрузчик
+(TableDataProcessor.load_data) вызывает ее после загрузки строк каждого файла, а для файлов, загруженных
+раньше, статистику один раз досчитывает блок в конце pgsql_fnc_refresh_usage_file_stats.sql.
+Поэтому запрос читает по одной строке на файл вместо сканирования USAGE_DATA_HISTORY.
 */
 -------------------------------------------------------------------------------------------------
 
@@ -16,28 +21,18 @@ select
     ufh.file_id
     ,ufh.file_name
     ,ufh.file_date
-    ,count(distinct udh.party_id) as distinct_subscribers
-    ,count(*) as total_events
-    ,count(case 
-            when udh.service_id = 1 then 1 
-        end) as total_calls
-    ,coalesce(
-        sum(
-            case 
-                when udh.service_id = 1 then udh.call_duration 
-            end), 0) / 60.0 as total_call_duration_minutes
-    ,count(case 
-            when udh.service_id = 2 then 1 
-            end) as total_sms
-    ,coalesce(
-        sum(
-            case when udh.service_id = 3 then udh.total_volume 
-            end), 0) / (1024 * 1024) as total_internet_volume_mib
-    ,sum(udh.charge_amount) as total_charges_without_discount
-    ,sum(udh.charge_amount - udh.discount_amount) as total_charges_with_discount
+    ,coalesce(ufs.distinct_subscribers, 0) as distinct_subscribers
+    ,coalesce(ufs.total_events, 0) as total_events
+    ,coalesce(ufs.total_calls, 0) as total_calls
+    ,coalesce(ufs.total_call_duration, 0) / 60.0 as total_call_duration_minutes
+    ,coalesce(ufs.total_sms, 0) as total_sms
+    ,coalesce(ufs.total_internet_volume, 0) / (1024 * 1024.0) as total_internet_volume_mib
+    ,ufs.total_charges_without_discount
+    ,ufs.total_charges_with_discount
 from usage_file_history ufh
-    left join usage_data_history udh 
-        on ufh.file_id = udh.file_id
-where date(ufh.file_date) = current_date - interval '1 day'
-group by 1,2,3
+    left join usage_file_stats ufs 
+        on ufh.file_id = ufs.file_id
+-- Полуинтервал вместо date(...) позволяет использовать idx_usage_file_history_file_date
+where ufh.file_date >= current_date - interval '1 day'
+    and ufh.file_date < current_date
 order by 3 desc;
\ No newline at end of file
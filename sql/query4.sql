@@ -15,5 +15,7 @@ select
     ,file_id
     ,row_number() over (partition by party_id order by call_date desc) as event_rank
 from usage_data_history
-where date(call_date) = date(current_timestamp) - interval '1 day'
+-- Полуинтервал по call_date отсекает все дневные партиции, кроме вчерашней
+where call_date >= current_date - interval '1 day'
+    and call_date < current_date
 order by party_id, call_date;
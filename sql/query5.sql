@@ -8,7 +8,9 @@ daily_totals as (
         party_id
         ,sum(charge_amount - discount_amount) as total_daily_cost
     from usage_data_history
-    where date(call_date) = current_date - interval '1 day'
+    -- Полуинтервал по call_date отсекает все дневные партиции, кроме вчерашней
+    where call_date >= current_date - interval '1 day'
+        and call_date < current_date
     group by party_id
 )
 
@@ -37,5 +39,6 @@ select
 from usage_data_history udh
     join daily_totals dt 
         on udh.party_id = dt.party_id
-    where date(udh.call_date) = current_date - interval '1 day'
+    where udh.call_date >= current_date - interval '1 day'
+        and udh.call_date < current_date
 order by udh.party_id, udh.call_date;